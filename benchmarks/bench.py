@@ -0,0 +1,351 @@
+"""
+Benchmarks for the denoise hot paths.
+
+    python benchmarks/bench.py [--out PATH] [--compare BASELINE]
+
+Times denoise_image at several strengths, the encode step,
+ZipArchive.add_bytes (serial and parallel), and both denoise routes end to
+end through the FastAPI test client, on synthetic frames plus
+examples/palm_pixel_art.png.
+Each case records its median time, throughput and peak RSS growth. With
+--compare the run fails when throughput drops or peak memory grows by more
+than --threshold against a stored baseline, and when there is no baseline.
+Baselines are per machine; store one with `make bench-baseline`.
+
+Peak memory comes from /proc (VmHWM, reset through clear_refs) and is
+skipped where that is unavailable. Routes run with the thread executor so
+that their memory shows up in this process.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from backend.services.denoise import denoise_image
+from backend.services.encoding import encode_image, get_profile
+from backend.utils.zip_archive import ZipArchive
+
+ROOT = Path(__file__).resolve().parent.parent
+EXAMPLE = ROOT / "examples" / "palm_pixel_art.png"
+DEFAULT_OUT = ROOT / "benchmarks" / "results" / "latest.json"
+
+RESOLUTIONS = {"360p": (640, 360), "1080p": (1920, 1080), "2160p": (3840, 2160)}
+STRENGTHS = (0.5, 1.0, 3.0)
+ENCODINGS = ("png", "png-fast")
+SEQUENCE_LENGTHS = (8, 32)
+
+# Peak-memory regressions below this many MB are noise.
+MEMORY_SLACK_MB = 16.0
+
+
+@dataclass
+class Case:
+    name: str
+    fn: Callable[[], Any]
+    # Work done per call, in `unit`; throughput is units per second.
+    units: float
+    unit: str
+
+
+def synthetic_frame(size: tuple[int, int], seed: int = 0) -> Image.Image:
+    """A gradient with per-pixel noise: compresses like a noisy render."""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    noise = rng.normal(0, 12, size=(height, width, 3))
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+
+def _png(img: Image.Image) -> bytes:
+    return encode_image(img, "png")
+
+
+def _megapixels(img: Image.Image) -> float:
+    return img.width * img.height / 1_000_000
+
+
+def _status_kib(field: str) -> int | None:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _release_free_memory() -> None:
+    """
+    Hand freed heap back to the OS so a case's allocations show up as RSS
+    growth instead of reusing pages a previous case left behind.
+    """
+    gc.collect()
+    libc_name = ctypes.util.find_library("c")
+    if libc_name:
+        libc = ctypes.CDLL(libc_name)
+        if hasattr(libc, "malloc_trim"):
+            libc.malloc_trim(0)
+
+
+def _reset_peak_rss() -> bool:
+    _release_free_memory()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure(case: Case, repeat: int) -> dict[str, Any]:
+    tracked = _reset_peak_rss()
+    rss_before = _status_kib("VmRSS")
+    case.fn()  # warm-up
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        case.fn()
+        times.append(time.perf_counter() - t0)
+    peak = _status_kib("VmHWM")
+
+    seconds = statistics.median(times)
+    result: dict[str, Any] = {
+        "seconds": seconds,
+        "throughput": case.units / seconds,
+        "unit": f"{case.unit}/s",
+        "peak_rss_mb": None,
+    }
+    if tracked and peak is not None and rss_before is not None:
+        result["peak_rss_mb"] = max(0, peak - rss_before) / 1024
+    return result
+
+
+def kernel_cases(resolutions: dict[str, tuple[int, int]]) -> list[Case]:
+    cases = []
+    frames = {name: synthetic_frame(size) for name, size in resolutions.items()}
+    frames["palm"] = Image.open(EXAMPLE).convert("RGB")
+
+    for name, img in frames.items():
+        for strength in STRENGTHS:
+            cases.append(
+                Case(
+                    f"denoise/{name}/s{strength:g}",
+                    lambda img=img, s=strength: denoise_image(img, strength=s),
+                    _megapixels(img),
+                    "MP",
+                )
+            )
+        denoised = denoise_image(img, strength=1.0)
+        for encoding in ENCODINGS:
+            cases.append(
+                Case(
+                    f"encode/{name}/{encoding}",
+                    lambda img=denoised, e=encoding: encode_image(img, e),
+                    _megapixels(img),
+                    "MP",
+                )
+            )
+
+    size = resolutions.get("1080p", next(iter(resolutions.values())))
+    payloads = [_png(synthetic_frame(size, seed)) for seed in range(8)]
+    total_mb = sum(len(p) for p in payloads) / 1_000_000
+    for label, compression, workers in (
+        ("stored", get_profile("png").zip_compression, 0),
+        ("deflated", zipfile.ZIP_DEFLATED, 0),
+        ("deflated-parallel", zipfile.ZIP_DEFLATED, os.cpu_count() or 1),
+    ):
+        cases.append(
+            Case(
+                f"zip/{len(payloads)}x{size[1]}p/{label}",
+                lambda c=compression, w=workers: _zip_payloads(payloads, c, w),
+                total_mb,
+                "MB",
+            )
+        )
+    return cases
+
+
+def _zip_payloads(payloads: list[bytes], compression: int, workers: int) -> None:
+    archive = ZipArchive(fileobj=io.BytesIO(), compression=compression, workers=workers)
+    for i, data in enumerate(payloads):
+        archive.add_bytes(f"denoised/frame_{i:04d}.png", data)
+    archive.close()
+
+
+def route_cases(resolutions: dict[str, tuple[int, int]]) -> list[Case]:
+    workdir = tempfile.mkdtemp(prefix="mlps-bench-")
+    # The config is read from the environment only, never from a .env in
+    # the checkout, and with the result cache off, which would turn
+    # repeats into cache hits.
+    os.environ.setdefault("MLPS_AUTH_SESSION_SECRET", "bench")
+    os.environ["MLPS_DB_PATH"] = os.path.join(workdir, "users.db")
+    os.environ["MLPS_CACHE_MEMORY_MB"] = "0"
+    os.environ["MLPS_CACHE_DISK_MB"] = "0"
+    os.environ.setdefault("MLPS_CPU_EXECUTOR", "thread")
+
+    from fastapi.testclient import TestClient
+
+    from backend.database import UserDatabase
+
+    UserDatabase(os.environ["MLPS_DB_PATH"]).create_user("bench", "bench")
+    from backend.app import create_app
+    from backend.config import MLServiceConfig
+
+    client = TestClient(create_app(MLServiceConfig()))
+    client.__enter__()
+    r = client.post("/login", data={"username": "bench", "password": "bench"})
+    r.raise_for_status()
+
+    def post_image(data: bytes) -> None:
+        r = client.post("/denoise/image", files={"file": ("frame.png", data)})
+        r.raise_for_status()
+
+    def post_sequence(frames: list[bytes]) -> None:
+        files = [("files", (f"f{i:04d}.png", d)) for i, d in enumerate(frames)]
+        r = client.post("/denoise/sequence.zip", files=files)
+        r.raise_for_status()
+
+    cases = []
+    for name, size in resolutions.items():
+        data = _png(synthetic_frame(size))
+        cases.append(
+            Case(
+                f"route/image/{name}",
+                lambda d=data: post_image(d),
+                size[0] * size[1] / 1_000_000,
+                "MP",
+            )
+        )
+    size = resolutions.get("360p", next(iter(resolutions.values())))
+    for length in SEQUENCE_LENGTHS:
+        frames = [_png(synthetic_frame(size, seed)) for seed in range(length)]
+        cases.append(
+            Case(
+                f"route/sequence/{length}x{size[1]}p",
+                lambda f=frames: post_sequence(f),
+                length * size[0] * size[1] / 1_000_000,
+                "MP",
+            )
+        )
+    return cases
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    """Returns one message per regressed case."""
+    regressions = []
+    for name, result in current["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        ratio = result["throughput"] / base["throughput"]
+        if ratio < 1.0 - threshold:
+            regressions.append(
+                f"{name}: throughput {result['throughput']:.2f} {result['unit']} "
+                f"is {1 - ratio:.0%} below baseline {base['throughput']:.2f}"
+            )
+        peak, base_peak = result["peak_rss_mb"], base.get("peak_rss_mb")
+        if (
+            peak is not None
+            and base_peak is not None
+            and peak > base_peak * (1.0 + threshold) + MEMORY_SLACK_MB
+        ):
+            regressions.append(
+                f"{name}: peak RSS {peak:.0f} MB, baseline {base_peak:.0f} MB"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--out", default=str(DEFAULT_OUT))
+    parser.add_argument("--compare", help="baseline JSON to check against")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--filter", default="", help="only cases containing this")
+    parser.add_argument(
+        "--quick", action="store_true", help="skip the 2160p resolution"
+    )
+    args = parser.parse_args()
+
+    resolutions = dict(RESOLUTIONS)
+    if args.quick:
+        resolutions.pop("2160p")
+    out_path = Path(args.out).resolve()
+    baseline_path = Path(args.compare).resolve() if args.compare else None
+    if baseline_path is not None and not baseline_path.exists():
+        # Baselines are per machine, so none is committed; comparing
+        # against nothing must not pass.
+        print(
+            f"No baseline at {baseline_path}; store one with make bench-baseline",
+            file=sys.stderr,
+        )
+        return 2
+
+    cases = kernel_cases(resolutions) + route_cases(resolutions)
+    results: dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "cases": {},
+    }
+    for case in cases:
+        if args.filter not in case.name:
+            continue
+        result = measure(case, args.repeat)
+        results["cases"][case.name] = result
+        peak = result["peak_rss_mb"]
+        print(
+            f"{case.name:36} {result['seconds'] * 1000:9.1f} ms "
+            f"{result['throughput']:9.2f} {result['unit']:5} "
+            f"{'-' if peak is None else f'{peak:.0f} MB':>8}",
+            flush=True,
+        )
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"Results written to {out_path}")
+
+    if baseline_path is None:
+        return 0
+    regressions = compare(
+        results, json.loads(baseline_path.read_text()), args.threshold
+    )
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print(
+            f"No regressions against {baseline_path} (threshold {args.threshold:.0%})"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,100 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
 from backend.config import MLServiceConfig
+from backend.profiling import ProfileStore, ProfilingMiddleware
+from backend.resources import Resources
 
+from backend.routers.admin import router as router_admin
 from backend.routers.denoise import router as router_denoise
 from backend.routers.auth import router as router_auth
+from backend.routers.jobs import router as router_jobs
+from backend.routers.results import router as router_results
+from backend.routers.uploads import router as router_uploads
+from backend.services.metrics import render_metrics
+from backend.utils.uploads import RequestSizeMiddleware
 
 from fastapi import FastAPI
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from starlette.formparsers import MultiPartParser
 from starlette.middleware.sessions import SessionMiddleware
 
-app = FastAPI()
 
-config = MLServiceConfig(dotenv=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Runs once per server process: after the fork when pre-forked.
+    config = app.state.config
+    # Starlette only exposes the multipart spool size as a class attribute,
+    # so it is process-wide: this is the one place that sets it, and the
+    # app started last in a process decides it for all of them.
+    MultiPartParser.spool_max_size = config.upload_spool_kb * 1024
+    resources = Resources.open(config)
+    app.state.resources = resources
+    try:
+        yield
+    finally:
+        resources.close()
+
+
+def create_app(config: MLServiceConfig | None = None) -> FastAPI:
+    """
+    Builds the app. Only the config is read here; the database, executors
+    and models are opened by the lifespan.
+    """
+    if config is None:
+        config = MLServiceConfig(dotenv=True)
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.config = config
+
+    app.state.profiles = ProfileStore(
+        config.profile_dir,
+        keep=config.profile_keep,
+        max_bytes=config.profile_max_mb * 1024 * 1024,
+    )
+    # Added first so that it runs inside SessionMiddleware.
+    app.add_middleware(ProfilingMiddleware, store=app.state.profiles)
+    app.add_middleware(
+        SessionMiddleware,
+        secret_key=config.session_secret,
+        same_site="lax",
+        https_only=False,
+        max_age=None,
+    )
+    # Outermost, so an oversized body is refused before anything reads it.
+    app.add_middleware(
+        RequestSizeMiddleware, max_bytes=config.max_request_mb * 1024 * 1024
+    )
+
+    app.include_router(router=router_denoise)
+    app.include_router(router=router_uploads)
+    app.include_router(router=router_auth)
+    app.include_router(router=router_jobs)
+    app.include_router(router=router_admin)
+    app.include_router(router=router_results)
 
-app.add_middleware(
-    SessionMiddleware,
-    secret_key=config.session_secret,
-    same_site="lax",
-    https_only=False,
-    max_age=None,
-)
+    @app.get("/")
+    async def root():
+        return {"message": "ML Processing Service"}
 
-app.include_router(router=router_denoise)
-app.include_router(router=router_auth)
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
 
+    @app.get("/metrics")
+    async def metrics():
+        return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
-@app.get("/")
-async def root():
-    return {"message": "ML Processing Service"}
+    return app
 
 
-@app.get("/health")
-async def health():
-    return {"ok": True}
+def __getattr__(name: str) -> Any:
+    # Keeps `uvicorn backend.app:app` working without building an app, and
+    # reading .env, whenever this module is imported.
+    if name == "app":
+        app = create_app()
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
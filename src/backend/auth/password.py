@@ -4,12 +4,28 @@ from argon2.exceptions import VerifyMismatchError
 password_hasher = PasswordHasher()
 
 
-def hash_password(password: str) -> str:
-    return password_hasher.hash(password)
+def make_password_hasher(
+    time_cost: int, memory_cost: int, parallelism: int
+) -> PasswordHasher:
+    """memory_cost is in KiB."""
+    return PasswordHasher(
+        time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+    )
 
 
-def verify_password(password: str, password_hash: str) -> bool:
+def hash_password(password: str, hasher: PasswordHasher = password_hasher) -> str:
+    return hasher.hash(password)
+
+
+def verify_password(
+    password: str, password_hash: str, hasher: PasswordHasher = password_hasher
+) -> bool:
     try:
-        return password_hasher.verify(password_hash, password)
+        return hasher.verify(password_hash, password)
     except VerifyMismatchError:
         return False
+
+
+def needs_rehash(password_hash: str, hasher: PasswordHasher = password_hasher) -> bool:
+    """True if the hash was made with parameters other than the hasher's."""
+    return hasher.check_needs_rehash(password_hash)
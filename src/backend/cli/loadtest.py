@@ -0,0 +1,487 @@
+"""
+Load test of the service on this machine.
+
+    mlp-loadtest [--server-workers N] [--concurrency C | --rate R]
+                 [--duration S] [--mix image=8,sequence=1,login=1]
+
+Starts the service through backend.main on a free port, with a temporary
+database holding --users test users, and drives a mix of /login,
+/denoise/image and /denoise/sequence.zip requests on synthetic frames:
+either --concurrency requests always in flight (closed loop), or --rate
+requests per second arriving whatever the server does (open loop).
+Reports throughput, latency percentiles and errors per request kind, and
+the server's memory (all its processes) over time. Server settings are
+passed with --env, e.g. --env MLPS_CPU_WORKERS=4, to compare worker
+counts. The result cache is off unless --cache is given, since the same
+synthetic frames are sent over and over.
+
+Needs the `loadtest` extra (httpx).
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from backend.database import UserDatabase
+from backend.utils.memory import memory_usage
+
+PASSWORD = "loadtest"
+KINDS = ("login", "image", "sequence")
+
+
+@dataclass
+class Sample:
+    kind: str
+    start: float
+    seconds: float
+    # HTTP status, or the exception's name when there was no response.
+    status: int | str
+
+
+@dataclass
+class _User:
+    client: Any
+    username: str
+
+
+@dataclass
+class Report:
+    wall: float
+    samples: list[Sample] = field(default_factory=list)
+    # (seconds since start, server pss MB, rss MB, processes)
+    memory: list[tuple[float, float, float, int]] = field(default_factory=list)
+
+
+def _parse_mix(raw: str) -> dict[str, float]:
+    mix = {}
+    for part in raw.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown request kind '{kind}'")
+        try:
+            mix[kind] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Bad weight for '{kind}': {weight}")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("The mix needs a positive weight")
+    return mix
+
+
+def _parse_size(raw: str) -> tuple[int, int]:
+    width, _, height = raw.lower().partition("x")
+    try:
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT, got '{raw}'")
+
+
+def _synthetic_frames(size: tuple[int, int], count: int, seed: int) -> list[bytes]:
+    """Noisy gradients, so the PNGs compress like real renders."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, size[0], dtype=np.float32)[None, :, None]
+    y = np.linspace(0, 255, size[1], dtype=np.float32)[:, None, None]
+    frames = []
+    for i in range(count):
+        base = (x + y) / 2 + np.array([0, 30, -30], dtype=np.float32) + 4 * i
+        noisy = base + rng.normal(0, 12, (size[1], size[0], 3)).astype(np.float32)
+        buf = io.BytesIO()
+        Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8)).save(buf, "PNG")
+        frames.append(buf.getvalue())
+    return frames
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/task/{p}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _server_memory(pid: int) -> tuple[float, float, int]:
+    """PSS and RSS in MB summed over the server's processes, and their count."""
+    pids = _process_tree(pid)
+    usages = [memory_usage(p) for p in pids]
+    pss = sum(u.get("pss_mb", 0.0) for u in usages)
+    rss = sum(u.get("rss_mb", 0.0) for u in usages)
+    return round(pss, 1), round(rss, 1), len(pids)
+
+
+def _start_server(
+    workdir: str, port: int, workers: int, env: dict[str, str]
+) -> subprocess.Popen[bytes]:
+    # Runs in workdir, so no .env from the current directory is read.
+    command = [
+        sys.executable,
+        "-c",
+        "from backend.main import run_app; run_app()",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+    ]
+    return subprocess.Popen(
+        command,
+        cwd=workdir,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def _wait_ready(
+    httpx: Any, url: str, server: subprocess.Popen[bytes], timeout: float
+) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {timeout} s")
+
+
+class _LoadGenerator:
+    def __init__(
+        self,
+        httpx: Any,
+        users: list[_User],
+        args: argparse.Namespace,
+        frames: list[bytes],
+    ) -> None:
+        self.httpx = httpx
+        self.users = users
+        self.args = args
+        self.frames = frames
+        self.rng = random.Random(args.seed)
+        self.kinds = list(args.mix)
+        self.weights = list(args.mix.values())
+        self.samples: list[Sample] = []
+        self.in_flight = 0
+
+    async def login(self, user: _User) -> Any:
+        return await user.client.post(
+            "/login",
+            data={"username": user.username, "password": PASSWORD},
+        )
+
+    async def image(self, user: _User) -> Any:
+        data = self.rng.choice(self.frames)
+        return await user.client.post(
+            "/denoise/image",
+            params={"strength": self.args.strength},
+            files={"file": ("frame.png", data, "image/png")},
+        )
+
+    async def sequence(self, user: _User) -> Any:
+        start = self.rng.randrange(len(self.frames))
+        files = [
+            (
+                "files",
+                (
+                    f"{i:04d}.png",
+                    self.frames[(start + i) % len(self.frames)],
+                    "image/png",
+                ),
+            )
+            for i in range(self.args.sequence_frames)
+        ]
+        return await user.client.post(
+            "/denoise/sequence.zip",
+            params={"strength": self.args.strength},
+            files=files,
+        )
+
+    async def one(self, user: _User) -> None:
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        request: Callable[[_User], Awaitable[Any]] = getattr(self, kind)
+        self.in_flight += 1
+        t0 = time.perf_counter()
+        try:
+            response = await request(user)
+            # A login answers with a redirect; a failed one renders the form.
+            ok = response.status_code == 302 if kind == "login" else True
+            status: int | str = response.status_code if ok else "bad_login"
+        except self.httpx.HTTPError as e:
+            status = type(e).__name__
+        finally:
+            self.in_flight -= 1
+        self.samples.append(Sample(kind, t0, time.perf_counter() - t0, status))
+
+    async def closed_loop(self, deadline: float) -> None:
+        async def loop(index: int) -> None:
+            user = self.users[index % len(self.users)]
+            while time.perf_counter() < deadline:
+                await self.one(user)
+
+        await asyncio.gather(*(loop(i) for i in range(self.args.concurrency)))
+
+    async def open_loop(self, deadline: float) -> None:
+        tasks: set[asyncio.Task[None]] = set()
+        index = 0
+        next_at = time.perf_counter()
+        while next_at < deadline:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            user = self.users[index % len(self.users)]
+            index += 1
+            task = asyncio.create_task(self.one(user))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            # Poisson arrivals.
+            next_at += self.rng.expovariate(self.args.rate)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+
+async def _sample_memory(
+    report: Report, pid: int, t0: float, interval: float, load: _LoadGenerator
+) -> None:
+    while True:
+        pss, rss, procs = await asyncio.to_thread(_server_memory, pid)
+        report.memory.append((round(time.perf_counter() - t0, 1), pss, rss, procs))
+        print(
+            f"  t={time.perf_counter() - t0:6.1f}s  server pss={pss:8.1f} MB"
+            f"  rss={rss:8.1f} MB  processes={procs}  in flight={load.in_flight}"
+            f"  done={len(load.samples)}",
+            flush=True,
+        )
+        await asyncio.sleep(interval)
+
+
+async def _run(httpx: Any, args: argparse.Namespace, workdir: str) -> Report:
+    db_path = os.path.join(workdir, "users.db")
+    database = UserDatabase(db_path)
+    usernames = [f"load{i:03d}" for i in range(args.users)]
+    for username in usernames:
+        database.create_user(username, PASSWORD)
+    database.close()
+
+    env = {
+        "MLPS_DB_PATH": db_path,
+        "MLPS_AUTH_SESSION_SECRET": secrets.token_hex(16),
+    }
+    if not args.cache:
+        env |= {"MLPS_CACHE_MEMORY_MB": "0", "MLPS_CACHE_DISK_MB": "0"}
+    env |= dict(args.env)
+
+    frames = _synthetic_frames(args.frame_size, args.frame_pool, args.seed)
+    port = args.port or _free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = _start_server(workdir, port, args.server_workers, env)
+    try:
+        await _wait_ready(httpx, url, server, args.startup_timeout)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        # One client, and so one session cookie, per user.
+        users = [
+            _User(
+                httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits),
+                username,
+            )
+            for username in usernames
+        ]
+        try:
+            load = _LoadGenerator(httpx, users, args, frames)
+            for user in users:
+                response = await load.login(user)
+                if response.status_code != 302:
+                    raise RuntimeError(f"Login failed for {user.username}")
+
+            t0 = time.perf_counter()
+            report = Report(wall=0.0)
+            sampler = asyncio.create_task(
+                _sample_memory(report, server.pid, t0, args.sample_interval, load)
+            )
+            deadline = t0 + args.warmup + args.duration
+            try:
+                if args.rate:
+                    await load.open_loop(deadline)
+                else:
+                    await load.closed_loop(deadline)
+            finally:
+                sampler.cancel()
+            report.wall = time.perf_counter() - t0 - args.warmup
+            report.samples = [s for s in load.samples if s.start >= t0 + args.warmup]
+            return report
+        finally:
+            for user in users:
+                await user.client.aclose()
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def _percentile(values: list[float], q: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def summarize(report: Report) -> dict[str, Any]:
+    """Per-kind and overall throughput, latency percentiles and errors."""
+    summary: dict[str, Any] = {"wall_seconds": round(report.wall, 2), "kinds": {}}
+    groups = {"all": report.samples}
+    for kind in KINDS:
+        samples = [s for s in report.samples if s.kind == kind]
+        if samples:
+            groups[kind] = samples
+    for kind, samples in groups.items():
+        if not samples:
+            continue
+        ok = [
+            s.seconds for s in samples if isinstance(s.status, int) and s.status < 400
+        ]
+        errors: dict[str, int] = {}
+        for s in samples:
+            if not (isinstance(s.status, int) and s.status < 400):
+                errors[str(s.status)] = errors.get(str(s.status), 0) + 1
+        entry: dict[str, Any] = {
+            "requests": len(samples),
+            "per_second": round(len(ok) / report.wall, 2) if report.wall else 0.0,
+            "error_rate": round(1 - len(ok) / len(samples), 4),
+            "errors": errors,
+        }
+        if ok:
+            entry |= {
+                "p50_ms": round(_percentile(ok, 50) * 1000, 1),
+                "p90_ms": round(_percentile(ok, 90) * 1000, 1),
+                "p99_ms": round(_percentile(ok, 99) * 1000, 1),
+                "max_ms": round(max(ok) * 1000, 1),
+            }
+        summary["kinds"][kind] = entry
+    if report.memory:
+        summary["server_pss_mb_peak"] = max(m[1] for m in report.memory)
+        summary["server_rss_mb_peak"] = max(m[2] for m in report.memory)
+        summary["memory"] = report.memory
+    return summary
+
+
+def _print_summary(summary: dict[str, Any]) -> None:
+    print(f"\nMeasured for {summary['wall_seconds']} s")
+    header = (
+        f"{'kind':<10}{'requests':>10}{'ok/s':>9}{'errors':>8}"
+        f"{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    print(header)
+    for kind, e in summary["kinds"].items():
+        print(
+            f"{kind:<10}{e['requests']:>10}{e['per_second']:>9}"
+            f"{e['error_rate']:>8.1%}{e.get('p50_ms', '-'):>10}"
+            f"{e.get('p90_ms', '-'):>10}{e.get('p99_ms', '-'):>10}"
+            f"{e.get('max_ms', '-'):>10}"
+        )
+        if e["errors"]:
+            print(f"{'':<10}errors: {e['errors']}")
+    if "server_pss_mb_peak" in summary:
+        print(
+            f"Server memory peak: pss {summary['server_pss_mb_peak']} MB,"
+            f" rss {summary['server_rss_mb_peak']} MB"
+        )
+
+
+def _parse_env(raw: str) -> tuple[str, str]:
+    key, sep, value = raw.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"Expected KEY=VALUE, got '{raw}'")
+    return key, value
+
+
+def run_loadtest() -> None:
+    p = argparse.ArgumentParser(description="Load test the service locally.")
+    p.add_argument("--server-workers", type=int, default=1)
+    p.add_argument(
+        "--env",
+        type=_parse_env,
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Server setting, e.g. MLPS_CPU_WORKERS=4; repeatable.",
+    )
+    p.add_argument("--port", type=int, default=0, help="Default: a free port.")
+    load = p.add_mutually_exclusive_group()
+    load.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Requests kept in flight (closed loop).",
+    )
+    load.add_argument(
+        "--rate",
+        type=float,
+        default=0.0,
+        help="Requests per second arriving regardless of responses (open loop).",
+    )
+    p.add_argument("--duration", type=float, default=30.0, help="Seconds measured.")
+    p.add_argument(
+        "--warmup", type=float, default=5.0, help="Seconds run before measuring."
+    )
+    p.add_argument(
+        "--mix",
+        type=_parse_mix,
+        default=_parse_mix("image=8,sequence=1,login=1"),
+        help="Weights of request kinds: login, image, sequence.",
+    )
+    p.add_argument("--users", type=int, default=8)
+    p.add_argument("--frame-size", type=_parse_size, default=(1280, 720))
+    p.add_argument("--frame-pool", type=int, default=8, help="Distinct frames.")
+    p.add_argument("--sequence-frames", type=int, default=8)
+    p.add_argument("--strength", type=float, default=1.0)
+    p.add_argument("--cache", action="store_true", help="Keep the result cache on.")
+    p.add_argument("--timeout", type=float, default=300.0)
+    p.add_argument("--startup-timeout", type=float, default=60.0)
+    p.add_argument("--sample-interval", type=float, default=1.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", help="Also write the summary to this file.")
+    args = p.parse_args()
+
+    try:
+        import httpx
+    except ImportError:
+        sys.exit("mlp-loadtest needs httpx: install the `loadtest` extra.")
+
+    with tempfile.TemporaryDirectory(prefix="mlps-loadtest-") as workdir:
+        report = asyncio.run(_run(httpx, args, workdir))
+    summary = summarize(report)
+    _print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    run_loadtest()
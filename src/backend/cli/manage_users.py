@@ -1,6 +1,7 @@
 import argparse
 import getpass
 
+from backend.auth.password import make_password_hasher
 from backend.database import UserDatabase
 from backend.config import MLServiceConfig
 
@@ -11,7 +12,10 @@ LOGGER = structlog.get_logger()
 
 def manage_users():
     config = MLServiceConfig(dotenv=True)
-    database = UserDatabase(config.db_path)
+    hasher = make_password_hasher(
+        config.argon2_time_cost, config.argon2_memory_kib, config.argon2_parallelism
+    )
+    database = UserDatabase(config.db_path, hasher)
 
     p = argparse.ArgumentParser()
     sub = p.add_subparsers(dest="cmd", required=True)
@@ -1,17 +1,64 @@
 import os
-import secrets
+from collections.abc import Mapping
 
 import structlog
 
 LOGGER = structlog.get_logger()
 
+CPU_EXECUTOR_MODES = ("process", "thread")
+
 
 class MLServiceConfig:
-    def __init__(self, dotenv: bool = False, dotenv_path: str = ".env") -> None:
+    def __init__(
+        self, dotenv: bool = False, dotenv_path: str = ".env", server_workers: int = 1
+    ) -> None:
         self.dotenv: bool = dotenv
         self.dotenv_path = dotenv_path
+        # Pre-forked server processes; each one opens its own CPU executor.
+        self.server_workers = server_workers
         self.session_secret: str
         self.db_path: str
+        self.cpu_executor: str
+        self.cpu_workers: int
+        self.batch_frames: int
+        self.tile_size: int
+        self.tile_threshold_pixels: int
+        self.tile_workers: int
+        self.jobs_db_path: str
+        self.jobs_dir: str
+        self.job_lease_seconds: int
+        self.job_chunk_frames: int
+        self.job_ttl_hours: int
+        self.cache_memory_mb: int
+        self.cache_disk_mb: int
+        self.cache_dir: str
+        self.upload_spool_kb: int
+        self.max_request_mb: int
+        self.max_request_megapixels: int
+        self.admission_megapixels: int
+        self.admission_queue: int
+        self.admission_timeout_seconds: int
+        self.user_megapixels: int
+        self.retry_after_seconds: int
+        self.argon2_time_cost: int
+        self.argon2_memory_kib: int
+        self.argon2_parallelism: int
+        self.auth_threads: int
+        self.onnx_model: str
+        self.onnx_threads: int
+        self.staging_dir: str
+        self.staging_ttl_hours: int
+        self.archive_max_entries: int
+        self.archive_max_entry_mb: int
+        self.archive_max_ratio: int
+        self.zip_workers: int
+        self.profile_dir: str
+        self.profile_keep: int
+        self.profile_max_mb: int
+        self.preview_max_side: int
+        self.result_dir: str
+        self.result_ttl_hours: int
+        self.result_max_mb: int
 
         if self.dotenv:
             if os.path.exists(dotenv_path):
@@ -29,6 +76,8 @@ class MLServiceConfig:
             "Config loaded",
             database_path=self.db_path,
             secret_key=bool(self.session_secret),
+            cpu_executor=self.cpu_executor,
+            cpu_workers=self.cpu_workers,
         )
 
         if not self._is_valid_credentials():
@@ -40,10 +89,10 @@ class MLServiceConfig:
         return is_session_secret and is_db
 
     def _read_from_env(self) -> None:
-        self.session_secret = os.getenv("MLPS_AUTH_SESSION_SECRET", "")
-        self.db_path = os.getenv("MLPS_DB_PATH", "")
+        self._load(os.environ)
 
     def _read_from_dotenv(self) -> None:
+        values: dict[str, str] = {}
         with open(self.dotenv_path, "r") as f:
             for raw in f:
                 line = raw.strip()
@@ -52,10 +101,136 @@ class MLServiceConfig:
                 if "=" not in line:
                     continue
                 key, value = line.split("=", 1)
-                key = key.strip()
-                value = value.strip()
+                values[key.strip()] = value.strip()
+        self._load(values)
+
+    def _load(self, values: Mapping[str, str]) -> None:
+        self.session_secret = values.get("MLPS_AUTH_SESSION_SECRET", "")
+        self.db_path = values.get("MLPS_DB_PATH", "")
+
+        self.cpu_executor = values.get("MLPS_CPU_EXECUTOR", "") or "process"
+        if self.cpu_executor not in CPU_EXECUTOR_MODES:
+            raise RuntimeError(
+                f"MLPS_CPU_EXECUTOR must be one of {CPU_EXECUTOR_MODES}, "
+                f"got '{self.cpu_executor}'"
+            )
+        self.cpu_workers = _get_int(
+            values,
+            "MLPS_CPU_WORKERS",
+            max(1, (os.cpu_count() or 1) // max(1, self.server_workers)),
+        )
+        self.batch_frames = _get_int(values, "MLPS_BATCH_FRAMES", 8)
+
+        # Frames above the pixel threshold are blurred tile by tile. The tile
+        # threads are per process: a server process splits them between its
+        # CPU workers, a standalone job worker uses them all.
+        self.tile_size = _get_int(values, "MLPS_TILE_SIZE", 1024)
+        self.tile_threshold_pixels = _get_int(
+            values, "MLPS_TILE_THRESHOLD_PIXELS", 16_000_000
+        )
+        self.tile_workers = _get_int(
+            values,
+            "MLPS_TILE_WORKERS",
+            max(1, (os.cpu_count() or 1) // max(1, self.server_workers)),
+        )
+
+        # Job queue state lives next to the user database by default.
+        db_dir = os.path.dirname(self.db_path)
+        self.jobs_db_path = values.get("MLPS_JOBS_DB_PATH", "") or os.path.join(
+            db_dir, "jobs.db"
+        )
+        self.jobs_dir = values.get("MLPS_JOBS_DIR", "") or os.path.join(db_dir, "jobs")
+        self.job_lease_seconds = _get_int(values, "MLPS_JOB_LEASE_SECONDS", 60)
+        self.job_chunk_frames = _get_int(values, "MLPS_JOB_CHUNK_FRAMES", 16)
+        # Finished jobs, and their result.zip, are removed after this long.
+        self.job_ttl_hours = _get_int(values, "MLPS_JOB_TTL_HOURS", 24)
+
+        # Set either size to 0 to disable that cache tier.
+        self.cache_memory_mb = _get_int(values, "MLPS_CACHE_MEMORY_MB", 256, minimum=0)
+        self.cache_disk_mb = _get_int(values, "MLPS_CACHE_DISK_MB", 2048, minimum=0)
+        self.cache_dir = values.get("MLPS_CACHE_DIR", "") or os.path.join(
+            db_dir, "cache"
+        )
+
+        # Uploaded files above the spool size go to temp files and are
+        # memory-mapped for decoding; the lifespan applies it to Starlette's
+        # multipart parser, process-wide. The budget caps a single request.
+        self.upload_spool_kb = _get_int(values, "MLPS_UPLOAD_SPOOL_KB", 1024)
+        self.max_request_mb = _get_int(values, "MLPS_MAX_REQUEST_MB", 8192)
+        self.max_request_megapixels = _get_int(
+            values, "MLPS_MAX_REQUEST_MEGAPIXELS", 10_000
+        )
+
+        # Admission control: megapixels denoised at once across requests,
+        # requests allowed to wait for capacity, and the per-user share
+        # (0 disables the per-user cap).
+        self.admission_megapixels = _get_int(values, "MLPS_ADMISSION_MEGAPIXELS", 256)
+        self.admission_queue = _get_int(values, "MLPS_ADMISSION_QUEUE", 64, minimum=0)
+        self.admission_timeout_seconds = _get_int(
+            values, "MLPS_ADMISSION_TIMEOUT_SECONDS", 30
+        )
+        self.user_megapixels = _get_int(values, "MLPS_USER_MEGAPIXELS", 128, minimum=0)
+        self.retry_after_seconds = _get_int(values, "MLPS_RETRY_AFTER_SECONDS", 5)
+
+        # argon2id cost; defaults are argon2-cffi's (RFC 9106, low memory).
+        # Stored hashes with other parameters are rehashed on next login.
+        self.argon2_time_cost = _get_int(values, "MLPS_ARGON2_TIME_COST", 3)
+        self.argon2_memory_kib = _get_int(values, "MLPS_ARGON2_MEMORY_KIB", 65536)
+        self.argon2_parallelism = _get_int(values, "MLPS_ARGON2_PARALLELISM", 4)
+        self.auth_threads = _get_int(values, "MLPS_AUTH_THREADS", 2)
+
+        # ONNX model served as engine=onnx (needs the `onnx` extra). Each CPU
+        # worker loads its own session with this many intra-op threads.
+        self.onnx_model = values.get("MLPS_ONNX_MODEL", "")
+        self.onnx_threads = _get_int(values, "MLPS_ONNX_THREADS", 1)
+
+        # Frame-by-frame upload sessions; unfinished ones are dropped after
+        # the TTL.
+        self.staging_dir = values.get("MLPS_STAGING_DIR", "") or os.path.join(
+            db_dir, "staging"
+        )
+        self.staging_ttl_hours = _get_int(values, "MLPS_STAGING_TTL_HOURS", 24)
+
+        # Zip-bomb limits for ZIP/tar uploads. Uncompressed size is also
+        # capped by MLPS_MAX_REQUEST_MB.
+        self.archive_max_entries = _get_int(values, "MLPS_ARCHIVE_MAX_ENTRIES", 100_000)
+        self.archive_max_entry_mb = _get_int(values, "MLPS_ARCHIVE_MAX_ENTRY_MB", 512)
+        self.archive_max_ratio = _get_int(values, "MLPS_ARCHIVE_MAX_RATIO", 100)
+
+        # Threads compressing ZIP entries in parallel, per archive being
+        # written (0 compresses on the writing thread).
+        self.zip_workers = _get_int(values, "MLPS_ZIP_WORKERS", 0, minimum=0)
+
+        # Profiles of requests admins asked to profile (X-Profile header);
+        # only the newest are kept.
+        self.profile_dir = values.get("MLPS_PROFILE_DIR", "") or os.path.join(
+            db_dir, "profiles"
+        )
+        self.profile_keep = _get_int(values, "MLPS_PROFILE_KEEP", 50)
+        self.profile_max_mb = _get_int(values, "MLPS_PROFILE_MAX_MB", 200)
+
+        # Longer side of preview=true results, in pixels.
+        self.preview_max_side = _get_int(values, "MLPS_PREVIEW_MAX_SIDE", 1024)
+
+        # Outputs of store=true requests, downloadable (and resumable) from
+        # /results until they expire or are evicted for space.
+        self.result_dir = values.get("MLPS_RESULT_DIR", "") or os.path.join(
+            db_dir, "results"
+        )
+        self.result_ttl_hours = _get_int(values, "MLPS_RESULT_TTL_HOURS", 24)
+        self.result_max_mb = _get_int(values, "MLPS_RESULT_MAX_MB", 10240)
+
 
-                if secrets.compare_digest(key, "MLPS_AUTH_SESSION_SECRET"):
-                    self.session_secret = value
-                if secrets.compare_digest(key, "MLPS_DB_PATH"):
-                    self.db_path = value
+def _get_int(
+    values: Mapping[str, str], key: str, default: int, minimum: int = 1
+) -> int:
+    raw = values.get(key, "").strip()
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise RuntimeError(f"{key} must be an integer, got '{raw}'")
+    if value < minimum:
+        raise RuntimeError(f"{key} must be >= {minimum}, got {value}")
+    return value
@@ -1,18 +1,51 @@
+import asyncio
+import os
 import sqlite3
-from typing import Optional, Tuple
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
 
 import structlog
+from argon2 import PasswordHasher
+from starlette.concurrency import run_in_threadpool
 
-from backend.auth.password import hash_password, verify_password
+from backend.auth.password import (
+    hash_password,
+    needs_rehash,
+    password_hasher,
+    verify_password,
+)
 
 LOGGER = structlog.get_logger()
 
+T = TypeVar("T")
+
 
 class UserDatabase:
-    def __init__(self, db_path: str) -> None:
+    """
+    Users table in a SQLite file that job and cache metadata may share.
+
+    Each thread keeps one open connection, so statements stay in the
+    connection's statement cache between calls. The file runs in WAL mode,
+    so logins keep reading while workers write.
+    """
+
+    BUSY_TIMEOUT_SECONDS = 5.0
+    # NORMAL is durable across application crashes in WAL mode; only an OS
+    # crash can lose the last commits.
+    SYNCHRONOUS = "NORMAL"
+    CACHED_STATEMENTS = 64
+
+    def __init__(self, db_path: str, hasher: PasswordHasher = password_hasher) -> None:
         self.db_path = db_path
+        self.hasher = hasher
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
 
         with self._sql_connect() as connect:
+            connect.execute("PRAGMA journal_mode=WAL")
             connect.execute("""
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -23,11 +56,37 @@ class UserDatabase:
             """)
             connect.commit()
 
-    def _sql_connect(self):
-        return sqlite3.connect(self.db_path)
+    def _sql_connect(self) -> sqlite3.Connection:
+        """
+        This thread's connection. Use it as a context manager to wrap a
+        transaction; that does not close it.
+        """
+        connect = getattr(self._local, "connection", None)
+        # Connections must not cross a fork.
+        if connect is None or self._local.pid != os.getpid():
+            connect = sqlite3.connect(
+                self.db_path,
+                timeout=self.BUSY_TIMEOUT_SECONDS,
+                cached_statements=self.CACHED_STATEMENTS,
+                check_same_thread=False,
+            )
+            connect.execute(f"PRAGMA synchronous={self.SYNCHRONOUS}")
+            self._local.connection = connect
+            self._local.pid = os.getpid()
+            with self._lock:
+                self._connections.append(connect)
+        return connect
+
+    def close(self) -> None:
+        """Close every thread's connection."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connect in connections:
+            connect.close()
+        self._local = threading.local()
 
     def create_user(self, username: str, password: str, role: str = "user") -> None:
-        password_hash = hash_password(password)
+        password_hash = hash_password(password, self.hasher)
         try:
             with self._sql_connect() as connect:
                 connect.execute(
@@ -41,11 +100,10 @@ class UserDatabase:
             LOGGER.warning("User already exists", username=username)
             raise ValueError(f"User '{username}' already exists")
 
-    def verify_user(
-        self, username: str, password: str
-    ) -> Optional[Tuple[int, str, str]]:
+    def verify_user(self, username: str, password: str) -> tuple[int, str, str] | None:
         """
-        Returns (id, username, role) if ok, else None.
+        Returns (id, username, role) if ok, else None. A hash made with
+        other argon2 parameters than the configured ones is replaced.
         """
         with self._sql_connect() as con:
             row = con.execute(
@@ -57,18 +115,30 @@ class UserDatabase:
             return None
 
         user_id, uname, password_hash, role = row
-        if verify_password(password, password_hash):
-            return (user_id, uname, role)
-        return None
+        if not verify_password(password, password_hash, self.hasher):
+            return None
+        if needs_rehash(password_hash, self.hasher):
+            self._rehash(user_id, password, password_hash)
+        return (user_id, uname, role)
 
-    def list_users(self) -> list[Tuple[int, str, str]]:
+    def _rehash(self, user_id: int, password: str, old_hash: str) -> None:
+        new_hash = hash_password(password, self.hasher)
+        with self._sql_connect() as connect:
+            # Leave the row alone if the password changed meanwhile.
+            connect.execute(
+                "UPDATE users SET password_hash=? WHERE id=? AND password_hash=?",
+                (new_hash, user_id, old_hash),
+            )
+        LOGGER.info("Password rehashed", user_id=user_id)
+
+    def list_users(self) -> list[tuple[int, str, str]]:
         with self._sql_connect() as connect:
             rows = connect.execute(
                 "SELECT id, username, role FROM users ORDER BY username"
             ).fetchall()
         return [(int(user[0]), str(user[1]), str(user[2])) for user in rows]
 
-    def get_user_by_id(self, user_id: int) -> Optional[Tuple[int, str, str]]:
+    def get_user_by_id(self, user_id: int) -> tuple[int, str, str] | None:
         with self._sql_connect() as connect:
             row = connect.execute(
                 "SELECT id, username, role FROM users WHERE id=?", (user_id,)
@@ -92,7 +162,7 @@ class UserDatabase:
             LOGGER.info("Set role", user_id=user_id, role=new_role)
 
     def set_password(self, user_id: int, new_password: str) -> None:
-        pw_hash = hash_password(new_password)
+        pw_hash = hash_password(new_password, self.hasher)
         with self._sql_connect() as connect:
             connect.execute(
                 "UPDATE users SET password_hash=? WHERE id=?", (pw_hash, user_id)
@@ -105,3 +175,55 @@ class UserDatabase:
             connect.execute("DELETE FROM users WHERE id=?", (user_id,))
             connect.commit()
             LOGGER.info("Delete user", user_id=user_id)
+
+
+class AsyncUserDatabase:
+    """
+    Awaitable facade over UserDatabase for async routes, so SQLite I/O and
+    password hashing stay off the event loop.
+
+    Calls that hash or verify a password run in a small dedicated pool:
+    each argon2 call holds memory_cost KiB and a CPU, so a burst of logins
+    queues there instead of taking over the shared threadpool.
+    """
+
+    def __init__(self, database: UserDatabase, hash_workers: int = 2) -> None:
+        self.database = database
+        self._hash_pool = ThreadPoolExecutor(
+            max_workers=hash_workers, thread_name_prefix="mlps-auth"
+        )
+
+    async def _hashing(self, fn: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._hash_pool, fn, *args)
+
+    async def create_user(
+        self, username: str, password: str, role: str = "user"
+    ) -> None:
+        await self._hashing(self.database.create_user, username, password, role)
+
+    async def verify_user(
+        self, username: str, password: str
+    ) -> tuple[int, str, str] | None:
+        return await self._hashing(self.database.verify_user, username, password)
+
+    async def list_users(self) -> list[tuple[int, str, str]]:
+        return await run_in_threadpool(self.database.list_users)
+
+    async def get_user_by_id(self, user_id: int) -> tuple[int, str, str] | None:
+        return await run_in_threadpool(self.database.get_user_by_id, user_id)
+
+    async def set_username(self, user_id: int, new_username: str) -> None:
+        await run_in_threadpool(self.database.set_username, user_id, new_username)
+
+    async def set_role(self, user_id: int, new_role: str) -> None:
+        await run_in_threadpool(self.database.set_role, user_id, new_role)
+
+    async def set_password(self, user_id: int, new_password: str) -> None:
+        await self._hashing(self.database.set_password, user_id, new_password)
+
+    async def delete_user(self, user_id: int) -> None:
+        await run_in_threadpool(self.database.delete_user, user_id)
+
+    def shutdown(self) -> None:
+        self._hash_pool.shutdown(wait=True)
@@ -1,11 +1,55 @@
+import argparse
+import os
+import shutil
+import tempfile
+
 import uvicorn
 
 
 def run_app() -> None:
-    uvicorn.run(
-        "backend.app:app",
-        host="127.0.0.1",
-        port=8000,
-        reload=True,
-        log_level="debug",
+    p = argparse.ArgumentParser(description="Run the ML processing service.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Pre-forked server processes sharing the preloaded app.",
     )
+    p.add_argument("--reload", action="store_true", help="Development mode.")
+    p.add_argument("--log-level", default="info")
+    args = p.parse_args()
+
+    if args.reload:
+        uvicorn.run(
+            "backend.app:create_app",
+            factory=True,
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level=args.log_level,
+        )
+        return
+
+    metrics_dir = None
+    if args.workers > 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # Must be set before prometheus_client is first imported.
+        metrics_dir = tempfile.mkdtemp(prefix="mlps-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+    from backend.app import create_app
+    from backend.config import MLServiceConfig
+
+    app = create_app(MLServiceConfig(dotenv=True, server_workers=args.workers))
+    if args.workers <= 1:
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+        return
+
+    from backend.prefork import serve_prefork
+
+    try:
+        serve_prefork(app, args.host, args.port, args.workers, args.log_level)
+    finally:
+        # Only a directory made here; workers never get this far.
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -0,0 +1,124 @@
+import gc
+import os
+import signal
+import socket
+import time
+from types import FrameType
+
+import structlog
+import uvicorn
+from fastapi import FastAPI
+from PIL import Image
+from uvicorn.config import STARTUP_FAILURE
+
+from backend.resources import load_engines
+from backend.utils.memory import memory_usage
+
+LOGGER = structlog.get_logger()
+
+# uvicorn exits with this status when the app fails to start; the
+# supervisor then stops instead of respawning workers in a loop.
+WORKER_BOOT_ERROR = STARTUP_FAILURE
+
+
+def preload(app: FastAPI) -> None:
+    """
+    Load what every worker needs before forking, so the pages are shared
+    copy-on-write: image codecs, and the models, with one warm-up run each.
+    Nothing that owns threads may be created here; those live in the
+    per-worker lifespan.
+    """
+    t0 = time.perf_counter()
+    Image.init()
+    for engine in load_engines(app.state.config):
+        engine.warm_up()
+    # Objects that exist now are never collected, so the collector does not
+    # write to (and unshare) their pages in the workers.
+    gc.collect()
+    gc.freeze()
+    LOGGER.info(
+        "Preloaded",
+        seconds=round(time.perf_counter() - t0, 3),
+        **memory_usage(),
+    )
+
+
+def _spawn(app: FastAPI, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+
+    status = 0
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        server = uvicorn.Server(uvicorn.Config(app, lifespan="on", log_level=log_level))
+        server.run(sockets=[sock])
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        LOGGER.exception("Worker crashed", pid=os.getpid())
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def serve_prefork(
+    app: FastAPI, host: str, port: int, workers: int, log_level: str = "info"
+) -> None:
+    """
+    Serve `app` from `workers` forked uvicorn processes sharing one
+    listening socket. Preloads in the parent, respawns workers that die,
+    and forwards SIGINT/SIGTERM for a graceful shutdown.
+    """
+    t0 = time.perf_counter()
+    preload(app)
+    sock = socket.create_server((host, port), backlog=2048)
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+    stopping = False
+    children: set[int] = set()
+
+    def stop(signum: int, frame: FrameType | None) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        children.add(_spawn(app, sock, log_level))
+    LOGGER.info(
+        "Serving",
+        host=host,
+        port=port,
+        workers=workers,
+        seconds=round(time.perf_counter() - t0, 3),
+    )
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if multiproc_dir:
+            from prometheus_client import multiprocess
+
+            multiprocess.mark_process_dead(pid)
+        if stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if code == WORKER_BOOT_ERROR:
+            LOGGER.error("Worker failed to start, shutting down", pid=pid)
+            stop(signal.SIGTERM, None)
+            continue
+        LOGGER.warning("Worker exited, respawning", pid=pid, exit_code=code)
+        time.sleep(1.0)
+        children.add(_spawn(app, sock, log_level))
+    sock.close()
@@ -0,0 +1,215 @@
+import cProfile
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs
+
+import anyio
+import structlog
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LOGGER = structlog.get_logger()
+
+# Opt in with either; the value picks the profiler.
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY = "profile"
+PROFILE_MODES = ("sample", "cprofile")
+
+_PROFILE_NAME = re.compile(
+    r"[0-9]{8}T[0-9]{6}-[a-z0-9_-]{1,64}-[0-9a-f]{8}\.(collapsed|pstats)"
+)
+
+
+class ProfileStore:
+    """
+    Stored request profiles, newest kept: at most `keep` files and
+    `max_bytes` in total. Older ones are deleted whenever one is added.
+    """
+
+    def __init__(self, root: str, keep: int = 50, max_bytes: int = 200 << 20) -> None:
+        self.root = Path(root)
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def new_name(self, path: str, mode: str) -> str:
+        slug = re.sub(r"[^a-z0-9_-]+", "-", path.lower()).strip("-")[:64] or "root"
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        extension = "pstats" if mode == "cprofile" else "collapsed"
+        return f"{stamp}-{slug}-{uuid.uuid4().hex[:8]}.{extension}"
+
+    def path(self, name: str) -> Path | None:
+        if not _PROFILE_NAME.fullmatch(name):
+            return None
+        path = self.root / name
+        return path if path.is_file() else None
+
+    def list(self) -> list[dict[str, Any]]:
+        """Stored profiles, newest first."""
+        out = []
+        for path in self.root.iterdir():
+            if not _PROFILE_NAME.fullmatch(path.name):
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            out.append({"name": path.name, "bytes": st.st_size, "mtime": st.st_mtime})
+        out.sort(key=lambda p: p["mtime"], reverse=True)
+        return out
+
+    def save(self, name: str, data: bytes) -> None:
+        path = self.root / name
+        tmp_path = path.with_name(f".{name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        self.prune()
+
+    def prune(self) -> None:
+        total = 0
+        for i, entry in enumerate(self.list()):
+            total += entry["bytes"]
+            if i >= self.keep or total > self.max_bytes:
+                (self.root / entry["name"]).unlink(missing_ok=True)
+
+
+class _Sampler(threading.Thread):
+    """
+    Samples the stacks of every other thread in the process, so work the
+    request hands to thread pools shows up too. Process-pool workers and
+    native code below Python frames are not seen.
+    """
+
+    def __init__(self, interval: float) -> None:
+        super().__init__(name="mlps-profiler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                f = frame
+                while f is not None:
+                    code = f.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                        f":{code.co_firstlineno})"
+                    )
+                    f = f.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> bytes:
+        """Stops sampling; returns the samples as collapsed stacks."""
+        self._stopped.set()
+        self.join()
+        lines = (f"{stack} {count}" for stack, count in self.stacks.most_common())
+        return "\n".join(lines).encode() + b"\n"
+
+
+def _requested_mode(scope: Scope) -> str | None:
+    for key, value in scope["headers"]:
+        if key == PROFILE_HEADER:
+            return value.decode("latin-1").strip().lower() or "sample"
+    query = scope.get("query_string", b"")
+    if PROFILE_QUERY.encode() in query:
+        values = parse_qs(query.decode("latin-1")).get(PROFILE_QUERY)
+        if values:
+            return values[0].lower() or "sample"
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests for admins who ask for it with an X-Profile
+    header or a ?profile= query parameter ("sample", the default, or
+    "cprofile"). The profile covers the whole response, streaming included,
+    and is stored in `store`; the response's X-Profile header names it
+    under /admin/profiles/.
+
+    "sample" records collapsed stacks of all threads every `interval`
+    seconds, for flamegraph tools. "cprofile" writes pstats of the event
+    loop thread only. Both see every request the process serves meanwhile.
+    One request per process is profiled at a time; others get
+    "X-Profile: busy". Requests that do not ask only pay for a header scan.
+
+    Must be added inside SessionMiddleware, which provides the role.
+    """
+
+    def __init__(
+        self, app: ASGIApp, store: ProfileStore, interval: float = 0.005
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.interval = interval
+        self._busy = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode = _requested_mode(scope)
+        if mode is None or scope.get("session", {}).get("role") != "admin":
+            await self.app(scope, receive, send)
+            return
+        if mode not in PROFILE_MODES:
+            mode = "sample"
+
+        if self._busy:
+            await self.app(scope, receive, _with_header(send, b"busy"))
+            return
+        self._busy = True
+        name = self.store.new_name(scope["path"], mode)
+        header = f"/admin/profiles/{name}".encode()
+        try:
+            t0 = time.perf_counter()
+            if mode == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, _with_header(send, header))
+                finally:
+                    profiler.disable()
+                    profiler.create_stats()
+                    data = marshal.dumps(profiler.stats)
+                    await anyio.to_thread.run_sync(self.store.save, name, data)
+            else:
+                sampler = _Sampler(self.interval)
+                sampler.start()
+                try:
+                    await self.app(scope, receive, _with_header(send, header))
+                finally:
+                    data = await anyio.to_thread.run_sync(sampler.stop)
+                    await anyio.to_thread.run_sync(self.store.save, name, data)
+            LOGGER.info(
+                "Request profiled",
+                path=scope["path"],
+                profile=name,
+                seconds=round(time.perf_counter() - t0, 3),
+            )
+        finally:
+            self._busy = False
+
+
+def _with_header(send: Send, value: bytes) -> Send:
+    async def wrapped(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = list(message.get("headers", []))
+            headers.append((b"x-profile", value))
+            message = {**message, "headers": headers}
+        await send(message)
+
+    return wrapped
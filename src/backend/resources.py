@@ -0,0 +1,130 @@
+import os
+import time
+from dataclasses import dataclass
+
+import structlog
+from fastapi import Request
+
+from backend.auth.password import make_password_hasher
+from backend.config import MLServiceConfig
+from backend.database import AsyncUserDatabase, UserDatabase
+from backend.services.admission import AdmissionController
+from backend.services.cache import ResultCache
+from backend.services.denoise.engines import (
+    DenoiseEngine,
+    OnnxEngine,
+    register_engine,
+)
+from backend.services.denoise.tiled import Tiling
+from backend.services.executor import CPUExecutor
+from backend.services.results import ResultStore
+from backend.services.staging import StagingStore
+from backend.utils.memory import memory_usage
+from taskmanager import JobQueue
+
+LOGGER = structlog.get_logger()
+
+
+def load_engines(config: MLServiceConfig) -> list[DenoiseEngine]:
+    """
+    Registers the configured model engines and returns them. Built-in
+    filters need no loading and are always registered.
+    """
+    engines: list[DenoiseEngine] = []
+    if config.onnx_model:
+        engines.append(OnnxEngine(config.onnx_model, config.onnx_threads))
+    for engine in engines:
+        register_engine(engine)
+    return engines
+
+
+@dataclass
+class Resources:
+    """
+    Everything the routers share within one server process. Created by the
+    app lifespan, after any pre-fork, and kept in app.state.resources.
+    """
+
+    config: MLServiceConfig
+    database: AsyncUserDatabase
+    queue: JobQueue
+    tiling: Tiling
+    cpu_executor: CPUExecutor
+    result_cache: ResultCache
+    admission: AdmissionController
+    staging: StagingStore
+    results: ResultStore
+
+    @classmethod
+    def open(cls, config: MLServiceConfig) -> "Resources":
+        t0 = time.perf_counter()
+        hasher = make_password_hasher(
+            config.argon2_time_cost,
+            config.argon2_memory_kib,
+            config.argon2_parallelism,
+        )
+        tiling = Tiling(
+            tile_size=config.tile_size,
+            threshold_pixels=config.tile_threshold_pixels,
+            # Each CPU worker tiles on its own threads; without the split a
+            # process would run cpu_workers * tile_workers of them.
+            workers=max(1, config.tile_workers // config.cpu_workers),
+        )
+        engines = load_engines(config)
+        cpu_executor = CPUExecutor(
+            config.cpu_executor, config.cpu_workers, tiling, engines=engines
+        )
+        if engines:
+            # Load models in every CPU worker before the first request.
+            cpu_executor.warm_up()
+        resources = cls(
+            config=config,
+            database=AsyncUserDatabase(
+                UserDatabase(config.db_path, hasher),
+                hash_workers=config.auth_threads,
+            ),
+            queue=JobQueue(
+                config.jobs_db_path,
+                config.jobs_dir,
+                ttl_seconds=config.job_ttl_hours * 3600,
+            ),
+            tiling=tiling,
+            cpu_executor=cpu_executor,
+            result_cache=ResultCache(
+                memory_bytes=config.cache_memory_mb * 1024 * 1024,
+                disk_dir=config.cache_dir,
+                disk_bytes=config.cache_disk_mb * 1024 * 1024,
+            ),
+            admission=AdmissionController(
+                capacity_pixels=config.admission_megapixels * 1_000_000,
+                max_waiting=config.admission_queue,
+                wait_timeout=config.admission_timeout_seconds,
+                user_pixels=config.user_megapixels * 1_000_000,
+                retry_after=config.retry_after_seconds,
+            ),
+            staging=StagingStore(
+                config.staging_dir, ttl_seconds=config.staging_ttl_hours * 3600
+            ),
+            results=ResultStore(
+                config.result_dir,
+                ttl_seconds=config.result_ttl_hours * 3600,
+                max_bytes=config.result_max_mb * 1024 * 1024,
+            ),
+        )
+        LOGGER.info(
+            "Resources ready",
+            pid=os.getpid(),
+            seconds=round(time.perf_counter() - t0, 3),
+            engines=[engine.name for engine in engines],
+            **memory_usage(),
+        )
+        return resources
+
+    def close(self) -> None:
+        self.cpu_executor.shutdown()
+        self.database.shutdown()
+        self.database.database.close()
+
+
+def get_resources(request: Request) -> Resources:
+    return request.app.state.resources
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from backend.auth.login import require_login
+from backend.profiling import ProfileStore
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def _require_admin(request: Request) -> Response | None:
+    guard = require_login(request, "/")
+    if guard:
+        return guard
+    if request.session.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admins only.")
+    return None
+
+
+def _profiles(request: Request) -> ProfileStore:
+    return request.app.state.profiles
+
+
+@router.get("/profiles")
+async def list_profiles(request: Request) -> Response:
+    guard = _require_admin(request)
+    if guard:
+        return guard
+    return JSONResponse(await run_in_threadpool(_profiles(request).list))
+
+
+@router.get("/profiles/{name}")
+async def get_profile(request: Request, name: str) -> Response:
+    """
+    A stored profile: collapsed stacks (.collapsed, for flamegraph.pl or
+    speedscope) or pstats (.pstats, for `python -m pstats`).
+    """
+    guard = _require_admin(request)
+    if guard:
+        return guard
+    path = _profiles(request).path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    media_type = "text/plain" if name.endswith(".collapsed") else None
+    return FileResponse(path, media_type=media_type, filename=name)
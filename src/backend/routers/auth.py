@@ -2,12 +2,9 @@ from urllib.parse import unquote, urlparse, quote
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 
-from backend.config import MLServiceConfig
-from backend.database import UserDatabase
+from backend.resources import get_resources
 
 router = APIRouter(tags=["auth"])
-config = MLServiceConfig(dotenv=True)
-database = UserDatabase(config.db_path)
 
 
 def safe_next(next_: str) -> str:
@@ -70,7 +67,8 @@ async def login_submit(
     password: str = Form(...),
     next: str = Form("/"),
 ):
-    user = database.verify_user(username=username, password=password)
+    database = get_resources(request).database
+    user = await database.verify_user(username=username, password=password)
     if not user:
         return render_login("Wrong username or password.", next)
 
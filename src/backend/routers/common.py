@@ -0,0 +1,122 @@
+import time
+
+from fastapi import HTTPException, Request, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from backend.resources import Resources, get_resources
+from backend.services.admission import Admission, AdmissionRejected
+from backend.services.cache import ResultCache
+from backend.services.denoise.engines import FAST_VARIANTS, DenoiseEngine, get_engine
+from backend.services.encoding import EncodingProfile, get_profile
+from backend.services.executor import Timings
+from backend.services.metrics import observe_stage, observe_timings
+from backend.utils.uploads import upload_buffer
+
+
+def encoding_profile(encoding: str) -> EncodingProfile:
+    try:
+        return get_profile(encoding)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def denoise_engine(engine: str, quality: str = "exact") -> DenoiseEngine:
+    """
+    quality=fast swaps in the engine's approximate variant, e.g.
+    gaussian-fast, for engines that have one.
+    """
+    try:
+        denoiser = get_engine(engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if quality == "exact":
+        return denoiser
+    if quality != "fast":
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown quality '{quality}', expected exact or fast.",
+        )
+    if engine not in FAST_VARIANTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Engine '{engine}' has no quality=fast mode.",
+        )
+    return get_engine(FAST_VARIANTS[engine])
+
+
+async def admit(request: Request, pixels: int) -> Admission:
+    try:
+        return await get_resources(request).admission.admit(
+            request.session.get("user_id"), pixels
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+async def denoise_upload(
+    resources: Resources,
+    file: UploadFile,
+    strength: float,
+    encoding: str,
+    engine: DenoiseEngine,
+    endpoint: str = "image",
+    preview_side: int = 0,
+) -> bytes:
+    t0 = time.perf_counter()
+    with upload_buffer(file.file) as data:
+        observe_stage(endpoint, strength, "upload_read", time.perf_counter() - t0)
+        return await denoise_data(
+            resources,
+            file.filename,
+            data,
+            strength,
+            encoding,
+            engine,
+            endpoint,
+            preview_side,
+        )
+
+
+async def denoise_data(
+    resources: Resources,
+    filename: str | None,
+    data: bytes | memoryview,
+    strength: float,
+    encoding: str,
+    engine: DenoiseEngine,
+    endpoint: str,
+    preview_side: int = 0,
+) -> bytes:
+    """
+    With preview_side set, returns a preview at most that many pixels on
+    its longer side instead of the full result.
+    """
+    params = {"encoding": encoding, "engine": engine.cache_tag}
+    if preview_side:
+        params["preview"] = str(preview_side)
+    key = await run_in_threadpool(ResultCache.key, data, strength, **params)
+    out = await run_in_threadpool(resources.result_cache.get, key)
+    if out is not None:
+        return out
+
+    timings: Timings = {}
+    try:
+        if preview_side:
+            out = await resources.cpu_executor.preview(
+                data, strength, preview_side, encoding, engine, timings=timings
+            )
+        else:
+            out = await resources.cpu_executor.denoise(
+                data, strength, encoding, engine, timings=timings
+            )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Failed to read image {filename}: {e}"
+        )
+    observe_timings(endpoint, strength, timings)
+    await run_in_threadpool(resources.result_cache.put, key, out)
+    return out
@@ -1,72 +1,865 @@
-import io
-import zipfile
+import asyncio
+import itertools
+import os
+import struct
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from contextlib import ExitStack, aclosing
+from dataclasses import dataclass
 
 from fastapi import APIRouter, File, UploadFile, Query, HTTPException, Request
-from fastapi.responses import Response, HTMLResponse
-from PIL import Image
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+import structlog
 
 from backend.auth.login import require_login
-from backend.services.denoise import denoise_image
+from backend.config import MLServiceConfig
+from backend.resources import Resources, get_resources
+from backend.routers.common import (
+    admit,
+    denoise_data,
+    denoise_engine,
+    denoise_upload,
+    encoding_profile,
+)
+from backend.routers.results import result_url
+from backend.services.admission import Admission
+from backend.services.cache import ResultCache
+from backend.services.denoise.engines import (
+    DEFAULT_ENGINE,
+    DenoiseEngine,
+)
+from backend.services.denoise.tiled import Tiling
+from backend.services.encoding import (
+    DEFAULT_ENCODING,
+    PREVIEW_ENCODING,
+    EncodingProfile,
+)
+from backend.services.executor import Timings
+from backend.services.metrics import (
+    BYTES_IN,
+    BYTES_OUT,
+    in_flight,
+    observe_frame,
+    observe_pipeline,
+    observe_stage,
+    observe_timings,
+)
+from backend.services.pipeline import Pipeline, Stage
+from backend.utils.archive_input import (
+    ArchiveError,
+    ArchiveLimitError,
+    ArchiveLimits,
+    FrameArchive,
+)
+from backend.utils.responses import file_response
+from backend.utils.uploads import (
+    check_upload_bytes,
+    check_upload_pixels,
+    probe_uploads,
+    upload_buffer,
+)
+from backend.utils.zip_archive import denoised_arcname
+from backend.utils.zip_stream import ZipStream
+
+LOGGER = structlog.get_logger()
+
+MAX_TEMPORAL_RADIUS = 4
+
+# Sequence pipeline: threads hashing frames for cache lookups, and batches
+# allowed to queue between stages.
+SEQUENCE_READ_WORKERS = 2
+SEQUENCE_QUEUE_SIZE = 2
+
+# Preview grids: columns (strengths) and rows (sample frames) at most.
+PREVIEW_GRID_MAX_STRENGTHS = 6
+PREVIEW_GRID_MAX_SAMPLES = 8
 
 router = APIRouter(prefix="/denoise", tags=["denoise"])
 
 
+async def _one_chunk(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+async def _store_result(
+    request: Request,
+    chunks: AsyncIterator[bytes],
+    filename: str,
+    media_type: str,
+) -> Response:
+    """
+    For store=true: writes the whole body to the result store and serves
+    it from there. Content-Location names it under /results, where it can
+    be downloaded again or resumed with Range requests until it expires.
+    """
+    results = get_resources(request).results
+    result, f = await run_in_threadpool(
+        results.create, request.session["user_id"], filename, media_type
+    )
+    try:
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        results.discard(result, f)
+        raise
+    await run_in_threadpool(results.finish, result, f)
+    response = await run_in_threadpool(
+        file_response, request, results.data_path(result.id), media_type, filename
+    )
+    response.headers["Content-Location"] = result_url(result)
+    return response
+
+
+def _peak_pixels(
+    resources: Resources,
+    sizes: list[tuple[int, int]],
+    temporal_radius: int,
+    incremental: bool = False,
+) -> int:
+    """
+    Most pixels a sequence request can have in flight: the largest sum over
+    any cpu_executor.workers consecutive batches, context frames included.
+    Incremental batches hold one frame at a time.
+    """
+    plan = _plan_batches(
+        resources.tiling,
+        sizes,
+        _batch_frames(resources, sizes, incremental),
+        temporal_radius,
+        incremental,
+    )
+    if incremental:
+        costs = [sizes[start][0] * sizes[start][1] for _, start, _, _ in plan]
+    else:
+        costs = [sum(w * h for w, h in sizes[a:d]) for a, _, _, d in plan]
+    window = resources.cpu_executor.workers
+    return max(sum(costs[i : i + window]) for i in range(len(costs)))
+
+
+def _batch_frames(
+    resources: Resources, sizes: list[tuple[int, int]], incremental: bool
+) -> int:
+    """
+    Incremental batches start with a full denoise, so they are made as long
+    as possible while still giving every CPU worker one.
+    """
+    if not incremental:
+        return resources.config.batch_frames
+    workers = resources.cpu_executor.workers
+    return max(resources.config.batch_frames, -(-len(sizes) // workers))
+
+
+def _plan_batches(
+    tiling: Tiling,
+    sizes: list[tuple[int, int]],
+    batch_frames: int,
+    temporal_radius: int,
+    incremental: bool = False,
+) -> list[tuple[int, int, int, int]]:
+    """
+    Splits runs of consecutive same-sized frames into batches. Returns
+    (context_start, start, stop, context_stop) per batch, where the context
+    adds up to temporal_radius neighbours from the same run on each side.
+    Frames large enough to be tiled are sent one at a time, except to
+    incremental batches, which never stack their frames.
+    """
+    plan = []
+    run_start = 0
+    for i in range(1, len(sizes) + 1):
+        if i < len(sizes) and sizes[i] == sizes[run_start]:
+            continue
+        tiled = tiling.applies_to(sizes[run_start]) and not incremental
+        step = 1 if tiled else batch_frames
+        for start in range(run_start, i, step):
+            stop = min(start + step, i)
+            plan.append(
+                (
+                    max(run_start, start - temporal_radius),
+                    start,
+                    stop,
+                    min(i, stop + temporal_radius),
+                )
+            )
+        run_start = i
+    return plan
+
+
+@dataclass
+class _SequenceBatch:
+    """One planned batch on its way through the sequence pipeline."""
+
+    files: list[UploadFile]
+    # files[keep[0]:keep[1]] are returned; the rest are temporal context.
+    keep: tuple[int, int]
+    sizes: list[tuple[int, int]]
+    keys: list[str | None]
+    outputs: list[bytes | None]
+
+
+def _read_batch(
+    resources: Resources,
+    batch: _SequenceBatch,
+    strength: float,
+    encoding: str,
+    engine: DenoiseEngine,
+) -> _SequenceBatch:
+    """
+    Looks kept frames up in the result cache. Temporal results depend on
+    neighbouring frames, so they bypass the cache.
+    """
+    start, stop = batch.keep
+    for i, f in enumerate(batch.files[start:stop]):
+        with upload_buffer(f.file) as data:
+            key = ResultCache.key(
+                data, strength, encoding=encoding, engine=engine.cache_tag
+            )
+        batch.keys[i] = key
+        batch.outputs[i] = resources.result_cache.get(key)
+    return batch
+
+
+async def _denoise_batch(
+    resources: Resources,
+    batch: _SequenceBatch,
+    strength: float,
+    temporal_radius: int,
+    incremental: bool,
+    encoding: str,
+    engine: DenoiseEngine,
+) -> _SequenceBatch:
+    """
+    Denoises the frames _read_batch found no cached output for. Incremental
+    batches recompute each frame only where it differs from the one before.
+    """
+    start, _ = batch.keep
+    missing = [start + i for i, out in enumerate(batch.outputs) if out is None]
+    if not missing:
+        return batch
+    # Context frames only matter to temporal batches.
+    inputs = range(len(batch.files)) if temporal_radius > 0 else missing
+    timings: Timings = {}
+    with ExitStack() as stack:
+        datas = []
+        for i in inputs:
+            t0 = time.perf_counter()
+            datas.append(stack.enter_context(upload_buffer(batch.files[i].file)))
+            observe_stage("sequence", strength, "upload_read", time.perf_counter() - t0)
+        try:
+            if incremental:
+                outputs = await resources.cpu_executor.denoise_incremental(
+                    datas, strength, encoding, engine, timings=timings
+                )
+            else:
+                outputs = await resources.cpu_executor.denoise_batch(
+                    datas,
+                    strength,
+                    temporal_radius,
+                    batch.keep if temporal_radius > 0 else None,
+                    encoding,
+                    engine,
+                    timings=timings,
+                )
+        except ValueError as e:
+            names = ", ".join(batch.files[i].filename or "?" for i in missing)
+            raise HTTPException(
+                status_code=400, detail=f"Failed to read images {names}: {e}"
+            )
+    observe_timings("sequence", strength, timings)
+    for i, png in zip(missing, outputs):
+        batch.outputs[i - start] = png
+        key = batch.keys[i - start]
+        if key is not None:
+            await run_in_threadpool(resources.result_cache.put, key, png)
+    return batch
+
+
+def _zip_batch(
+    stream: ZipStream,
+    batch: _SequenceBatch,
+    strength: float,
+    profile: EncodingProfile,
+) -> bytes:
+    start, stop = batch.keep
+    chunks = []
+    for f, out, size in zip(batch.files[start:stop], batch.outputs, batch.sizes):
+        assert out is not None
+        chunks.append(_zip_add(stream, strength, f.filename, out, profile, "sequence"))
+        observe_frame("sequence", strength, size)
+    return b"".join(chunks)
+
+
+def _sequence_pipeline(
+    resources: Resources,
+    stream: ZipStream,
+    strength: float,
+    temporal_radius: int,
+    incremental: bool,
+    profile: EncodingProfile,
+    engine: DenoiseEngine,
+) -> Pipeline:
+    """
+    Cache lookups, denoising and archiving of sequence batches as separate
+    stages. Decode, denoise and encode stay together in one CPU executor
+    call, so decoded frames never have to cross between processes; the
+    executor's workers are that stage's parallelism. Archiving is ordered.
+    """
+
+    async def read(batch: _SequenceBatch) -> _SequenceBatch:
+        if temporal_radius > 0:
+            return batch
+        return await run_in_threadpool(
+            _read_batch, resources, batch, strength, profile.name, engine
+        )
+
+    async def denoise(batch: _SequenceBatch) -> _SequenceBatch:
+        return await _denoise_batch(
+            resources,
+            batch,
+            strength,
+            temporal_radius,
+            incremental,
+            profile.name,
+            engine,
+        )
+
+    async def archive(batch: _SequenceBatch) -> bytes:
+        return await run_in_threadpool(_zip_batch, stream, batch, strength, profile)
+
+    return Pipeline(
+        [
+            Stage("read", read, workers=SEQUENCE_READ_WORKERS),
+            Stage("denoise", denoise, workers=resources.cpu_executor.workers),
+            Stage("archive", archive, ordered=True),
+        ],
+        queue_size=SEQUENCE_QUEUE_SIZE,
+    )
+
+
+def _sequence_batches(
+    resources: Resources,
+    files: list[UploadFile],
+    sizes: list[tuple[int, int]],
+    temporal_radius: int,
+    incremental: bool,
+) -> Iterator[_SequenceBatch]:
+    for ctx_start, start, stop, ctx_stop in _plan_batches(
+        resources.tiling,
+        sizes,
+        _batch_frames(resources, sizes, incremental),
+        temporal_radius,
+        incremental,
+    ):
+        yield _SequenceBatch(
+            files=files[ctx_start:ctx_stop],
+            keep=(start - ctx_start, stop - ctx_start),
+            sizes=sizes[start:stop],
+            keys=[None] * (stop - start),
+            outputs=[None] * (stop - start),
+        )
+
+
 @router.post("/image")
 async def denoise_single(
     request: Request,
     file: UploadFile = File(...),
     strength: float = Query(1.0, ge=0.0, le=5.0),
+    preview: bool = Query(False),
+    store: bool = Query(False),
+    encoding: str | None = Query(None),
+    engine: str = Query(DEFAULT_ENGINE),
+    quality: str = Query("exact"),
+) -> Response:
+    """
+    With preview=true the result is a quick low-resolution look, at most
+    MLPS_PREVIEW_MAX_SIDE pixels on its longer side, for trying strengths.
+    It is decoded at reduced scale where the format allows (JPEG) and
+    encoded with png-fast unless another encoding is asked for.
+
+    With store=true the result is also kept in the result store; see
+    _store_result().
+    """
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    resources = get_resources(request)
+    if encoding is None:
+        encoding = PREVIEW_ENCODING if preview else DEFAULT_ENCODING
+    profile = encoding_profile(encoding)
+    denoiser = denoise_engine(engine, quality)
+    endpoint = "preview" if preview else "image"
+    preview_side = resources.config.preview_max_side if preview else 0
+    check_upload_bytes(resources.config, [file])
+    sizes = await run_in_threadpool(probe_uploads, [file])
+    check_upload_pixels(resources.config, sizes)
+    granted = await admit(request, sizes[0][0] * sizes[0][1])
+    try:
+        with in_flight(endpoint, strength).track_inprogress():
+            BYTES_IN.labels(endpoint).inc(file.size or 0)
+            out = await denoise_upload(
+                resources,
+                file,
+                strength,
+                profile.name,
+                denoiser,
+                endpoint,
+                preview_side,
+            )
+    finally:
+        granted.release()
+    observe_frame(endpoint, strength, sizes[0])
+    BYTES_OUT.labels(endpoint).inc(len(out))
+    if store:
+        stem = os.path.splitext(os.path.basename(file.filename or "frame"))[0]
+        filename = f"denoised_{stem}{profile.extension}"
+        return await _store_result(
+            request, _one_chunk(out), filename, profile.media_type
+        )
+    return Response(content=out, media_type=profile.media_type)
+
+
+@router.post("/preview-grid")
+async def denoise_preview_grid(
+    request: Request,
+    strengths: list[float] = Query(...),
+    samples: int = Query(4, ge=1, le=PREVIEW_GRID_MAX_SAMPLES),
+    cell: int = Query(320, ge=64, le=1024),
+    engine: str = Query(DEFAULT_ENGINE),
+    files: list[UploadFile] = File(...),
 ) -> Response:
+    """
+    Previews of a few evenly spaced frames of a sequence at several
+    strengths, as one PNG with a row per frame and a column per strength.
+    Cells are at most `cell` pixels on their longer side.
+    """
     guard = require_login(request, "/denoise")
     if guard:
         return guard
-    data = await file.read()
-    img = Image.open(io.BytesIO(data)).convert("RGB")
-    out = denoise_image(img, strength=strength)
+    resources = get_resources(request)
+    denoiser = denoise_engine(engine)
+    if not 1 <= len(strengths) <= PREVIEW_GRID_MAX_STRENGTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Give 1 to {PREVIEW_GRID_MAX_STRENGTHS} strengths.",
+        )
+    if any(not 0.0 <= s <= 5.0 for s in strengths):
+        raise HTTPException(status_code=400, detail="Strengths must be 0 to 5.")
+
+    png_files = [f for f in files if (f.filename or "").lower().endswith(".png")]
+    if not png_files:
+        raise HTTPException(status_code=400, detail="No PNG files in upload.")
+    count = min(samples, len(png_files))
+    step = (len(png_files) - 1) / max(count - 1, 1)
+    indices = [round(i * step) for i in range(count)]
+    picked = [png_files[i] for i in indices]
+    check_upload_bytes(resources.config, picked)
+    sizes = await run_in_threadpool(probe_uploads, picked)
+    check_upload_pixels(resources.config, sizes)
+    granted = await admit(request, sum(w * h for w, h in sizes))
 
-    buf = io.BytesIO()
-    out.save(buf, format="PNG")
-    return Response(content=buf.getvalue(), media_type="image/png")
+    timings: Timings = {}
+    try:
+        # Counted under the strongest strength, the most expensive column.
+        with (
+            in_flight("preview_grid", max(strengths)).track_inprogress(),
+            ExitStack() as stack,
+        ):
+            BYTES_IN.labels("preview_grid").inc(sum(f.size or 0 for f in picked))
+            datas = [stack.enter_context(upload_buffer(f.file)) for f in picked]
+            try:
+                out = await resources.cpu_executor.preview_grid(
+                    datas, strengths, cell, engine=denoiser, timings=timings
+                )
+            except ValueError as e:
+                names = ", ".join(f.filename or "?" for f in picked)
+                raise HTTPException(
+                    status_code=400, detail=f"Failed to read images {names}: {e}"
+                )
+    finally:
+        granted.release()
+    observe_timings("preview_grid", max(strengths), timings)
+    BYTES_OUT.labels("preview_grid").inc(len(out))
+    # Which of the uploaded PNGs the rows show, by position.
+    headers = {"X-Preview-Frames": ",".join(map(str, indices))}
+    return Response(content=out, media_type="image/png", headers=headers)
+
+
+@router.get("/cache/stats")
+async def cache_stats(request: Request) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    return JSONResponse(get_resources(request).result_cache.stats())
+
+
+@router.get("/admission/stats")
+async def admission_stats(request: Request) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    return JSONResponse(get_resources(request).admission.stats())
 
 
 @router.post("/sequence.zip")
 async def denoise_sequence_zip(
     request: Request,
     strength: float = Query(1.0, ge=0.0, le=5.0),
+    temporal: int = Query(0, ge=0, le=MAX_TEMPORAL_RADIUS),
+    incremental: bool = Query(False),
+    store: bool = Query(False),
+    encoding: str = Query(DEFAULT_ENCODING),
+    engine: str = Query(DEFAULT_ENGINE),
+    quality: str = Query("exact"),
     files: list[UploadFile] = File(...),
 ) -> Response:
+    """
+    With incremental=true each frame is only recomputed where it differs
+    from the previous one, which makes held frames and small moving
+    sprites cheap; output is the same as without it.
+
+    With store=true the archive is written to the result store before it
+    is sent, so an interrupted download can be resumed from /results
+    instead of denoised again; see _store_result().
+    """
     guard = require_login(request, "/denoise")
     if guard:
         return guard
+    resources = get_resources(request)
+    profile = encoding_profile(encoding)
+    denoiser = denoise_engine(engine, quality)
+    if incremental and temporal > 0:
+        raise HTTPException(
+            status_code=400,
+            detail="incremental cannot be combined with temporal denoising.",
+        )
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded.")
 
     png_files = [f for f in files if (f.filename or "").lower().endswith(".png")]
     if not png_files:
         raise HTTPException(status_code=400, detail="No PNG files in upload.")
+    check_upload_bytes(resources.config, png_files)
 
-    zip_buf = io.BytesIO()
-    with zipfile.ZipFile(zip_buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for f in png_files:
-            data = await f.read()
-            try:
-                img = Image.open(io.BytesIO(data)).convert("RGB")
-            except Exception as e:
+    # Once streaming starts errors can no longer become a 400, so check
+    # every frame header, and the pixel budget, before the first byte goes
+    # out.
+    sizes = await run_in_threadpool(probe_uploads, png_files)
+    check_upload_pixels(resources.config, sizes)
+    granted = await admit(
+        request, _peak_pixels(resources, sizes, temporal, incremental)
+    )
+
+    chunks = _stream_sequence_zip(
+        resources,
+        png_files,
+        sizes,
+        strength,
+        temporal,
+        incremental,
+        profile,
+        denoiser,
+        granted,
+    )
+    if store:
+        try:
+            return await _store_result(
+                request, chunks, "denoised_sequence.zip", "application/zip"
+            )
+        finally:
+            granted.release()
+    headers = {"Content-Disposition": 'attachment; filename="denoised_sequence.zip"'}
+    return StreamingResponse(
+        chunks,
+        media_type="application/zip",
+        headers=headers,
+        # Also covers a stream that is never started.
+        background=BackgroundTask(granted.release),
+    )
+
+
+async def _stream_sequence_zip(
+    resources: Resources,
+    files: list[UploadFile],
+    sizes: list[tuple[int, int]],
+    strength: float,
+    temporal_radius: int,
+    incremental: bool,
+    profile: EncodingProfile,
+    engine: DenoiseEngine,
+    granted: Admission,
+) -> AsyncIterator[bytes]:
+    stream = ZipStream(workers=resources.config.zip_workers)
+    pipeline = _sequence_pipeline(
+        resources, stream, strength, temporal_radius, incremental, profile, engine
+    )
+    requests = in_flight("sequence", strength)
+    bytes_out = BYTES_OUT.labels("sequence")
+    requests.inc()
+    try:
+        BYTES_IN.labels("sequence").inc(sum(f.size or 0 for f in files))
+        batches = _sequence_batches(
+            resources, files, sizes, temporal_radius, incremental
+        )
+        async with aclosing(pipeline.run(batches)) as chunks:
+            async for chunk in chunks:
+                bytes_out.inc(len(chunk))
+                yield chunk
+        chunk = await run_in_threadpool(stream.close)
+        bytes_out.inc(len(chunk))
+        yield chunk
+    except Exception:
+        LOGGER.exception("Sequence stream aborted", frames=len(files))
+        raise
+    finally:
+        requests.dec()
+        granted.release()
+        observe_pipeline("sequence", pipeline)
+        LOGGER.info(
+            "Sequence pipeline",
+            frames=len(files),
+            seconds=round(pipeline.wall, 3),
+            utilization={
+                name: round(stats.utilization(pipeline.wall), 2)
+                for name, stats in pipeline.stats.items()
+            },
+        )
+
+
+def _zip_add(
+    stream: ZipStream,
+    strength: float,
+    filename: str | None,
+    data: bytes,
+    profile: EncodingProfile,
+    endpoint: str,
+) -> bytes:
+    t0 = time.perf_counter()
+    chunk = stream.add_bytes(
+        denoised_arcname(filename, profile.extension),
+        data,
+        profile.zip_compression,
+    )
+    observe_stage(endpoint, strength, "zip_write", time.perf_counter() - t0)
+    return chunk
+
+
+def _archive_limits(config: MLServiceConfig) -> ArchiveLimits:
+    return ArchiveLimits(
+        max_entries=config.archive_max_entries,
+        max_entry_bytes=config.archive_max_entry_mb * 1024 * 1024,
+        max_total_bytes=config.max_request_mb * 1024 * 1024,
+        max_ratio=config.archive_max_ratio,
+    )
+
+
+def _next_entry(entries: Iterator[tuple[str, bytes]]) -> tuple[str, bytes] | None:
+    try:
+        return next(entries, None)
+    except ArchiveLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _archive_sizes(archive: FrameArchive, pixel_limit: int) -> list[tuple[int, int]]:
+    """
+    Every frame's size, from the IHDR chunk that starts each PNG. Read in
+    a pass of its own so that the pixel budget is enforced before the
+    first byte of the response, when it can still be a 413.
+    """
+    sizes = []
+    pixels = 0
+    try:
+        for name, head in archive.headers(24):
+            if not head.startswith(_PNG_SIGNATURE) or head[12:16] != b"IHDR":
+                raise HTTPException(
+                    status_code=400, detail=f"Failed to read image {name}: not a PNG."
+                )
+            width, height = struct.unpack(">II", head[16:24])
+            pixels += width * height
+            if pixels > pixel_limit:
                 raise HTTPException(
-                    status_code=400, detail=f"Failed to read image {f.filename}: {e}"
+                    status_code=413, detail=f"Archive is over {pixel_limit} pixels."
                 )
+            sizes.append((width, height))
+    except ArchiveLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return sizes
 
-            out = denoise_image(img, strength=strength)
-            out_buf = io.BytesIO()
-            out.save(out_buf, format="PNG")
 
-            name = (f.filename or "frame.png").replace("\\", "/")
-            arcname = "denoised/" + name
-            arcname = arcname.rsplit(".", 1)[0] + ".png"
-            zf.writestr(arcname, out_buf.getvalue())
+def _open_archive(
+    file: UploadFile, limits: ArchiveLimits, pixel_limit: int
+) -> tuple[FrameArchive, Iterator[tuple[str, bytes]], list[tuple[int, int]]]:
+    """
+    Opens the archive, reads every frame header and the first frame, so
+    that unreadable, oversized or frameless archives are refused before
+    streaming starts. A ZIP's central directory is checked as a whole here.
+    """
+    try:
+        archive = FrameArchive(file.file, file.size or 0, limits)
+    except ArchiveLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        sizes = _archive_sizes(archive, pixel_limit)
+        entries = iter(archive)
+        first = _next_entry(entries)
+    except HTTPException:
+        archive.close()
+        raise
+    if first is None:
+        archive.close()
+        raise HTTPException(status_code=400, detail="No PNG files in archive.")
+    return archive, itertools.chain([first], entries), sizes
 
+
+@router.post("/archive.zip")
+async def denoise_archive_zip(
+    request: Request,
+    file: UploadFile = File(...),
+    strength: float = Query(1.0, ge=0.0, le=5.0),
+    store: bool = Query(False),
+    encoding: str = Query(DEFAULT_ENCODING),
+    engine: str = Query(DEFAULT_ENGINE),
+    quality: str = Query("exact"),
+) -> Response:
+    """
+    Denoises the PNG frames of an uploaded ZIP or tar (plain, gz, bz2 or
+    xz) and streams back a ZIP laid out like /denoise/sequence.zip.
+    store=true works as there.
+    """
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    resources = get_resources(request)
+    profile = encoding_profile(encoding)
+    denoiser = denoise_engine(engine, quality)
+    check_upload_bytes(resources.config, [file])
+    archive, entries, sizes = await run_in_threadpool(
+        _open_archive,
+        file,
+        _archive_limits(resources.config),
+        resources.config.max_request_megapixels * 1_000_000,
+    )
+    BYTES_IN.labels("archive").inc(file.size or 0)
+
+    chunks = _stream_archive_zip(
+        request, resources, archive, entries, sizes, strength, profile, denoiser
+    )
+    if store:
+        try:
+            return await _store_result(
+                request, chunks, "denoised_sequence.zip", "application/zip"
+            )
+        finally:
+            await run_in_threadpool(archive.close)
     headers = {"Content-Disposition": 'attachment; filename="denoised_sequence.zip"'}
-    return Response(zip_buf.getvalue(), media_type="application/zip", headers=headers)
+    return StreamingResponse(
+        chunks,
+        media_type="application/zip",
+        headers=headers,
+        # The stream closes the archive itself; this covers one never started.
+        background=BackgroundTask(archive.close),
+    )
+
+
+async def _denoise_entry(
+    request: Request,
+    resources: Resources,
+    name: str,
+    data: bytes,
+    pixels: int,
+    strength: float,
+    encoding: str,
+    engine: DenoiseEngine,
+) -> bytes:
+    granted = await admit(request, pixels)
+    try:
+        return await denoise_data(
+            resources, name, data, strength, encoding, engine, "archive"
+        )
+    finally:
+        granted.release()
+
+
+async def _stream_archive_zip(
+    request: Request,
+    resources: Resources,
+    archive: FrameArchive,
+    entries: Iterator[tuple[str, bytes]],
+    sizes: list[tuple[int, int]],
+    strength: float,
+    profile: EncodingProfile,
+    engine: DenoiseEngine,
+) -> AsyncIterator[bytes]:
+    """
+    Reads, denoises and zips entries in archive order, with up to one
+    frame per CPU worker in flight. Frames are admitted one by one rather
+    than the whole archive at once. The archive is closed when the stream
+    ends, including when the client goes away mid-stream.
+    """
+    stream = ZipStream(workers=resources.config.zip_workers)
+    pending: deque[tuple[str, tuple[int, int], asyncio.Task[bytes]]] = deque()
+    frame_sizes = iter(sizes)
+    requests = in_flight("archive", strength)
+    bytes_out = BYTES_OUT.labels("archive")
+    requests.inc()
+    try:
+        while True:
+            entry = await run_in_threadpool(_next_entry, entries)
+            if entry is not None:
+                name, data = entry
+                size = next(frame_sizes)
+                task = asyncio.create_task(
+                    _denoise_entry(
+                        request,
+                        resources,
+                        name,
+                        data,
+                        size[0] * size[1],
+                        strength,
+                        profile.name,
+                        engine,
+                    )
+                )
+                pending.append((name, size, task))
+                if len(pending) < resources.cpu_executor.workers:
+                    continue
+            if not pending:
+                break
+            name, size, task = pending.popleft()
+            out = await task
+            chunk = await run_in_threadpool(
+                _zip_add, stream, strength, name, out, profile, "archive"
+            )
+            observe_frame("archive", strength, size)
+            bytes_out.inc(len(chunk))
+            yield chunk
+        chunk = await run_in_threadpool(stream.close)
+        bytes_out.inc(len(chunk))
+        yield chunk
+    except Exception:
+        LOGGER.exception("Archive stream aborted")
+        raise
+    finally:
+        requests.dec()
+        for _, _, task in pending:
+            task.cancel()
+        archive.close()
 
 
 # @router.post("/files/")
@@ -110,24 +903,35 @@ async def denoise_page(request: Request):
   <div class="row">
     <label class="muted">Strength:</label>
     <input id="strength" type="number" min="0" max="5" step="0.1" value="1.0" />
+    <label class="muted"><input id="fast" type="checkbox" /> Fast (approximate, for large strengths)</label>
   </div>
 
   <div class="row">
     <button id="scan" type="button">Scan PNGs</button>
     <button id="run" type="button">Denoise + Download ZIP</button>
+    <button id="preview" type="button">Preview grid</button>
   </div>
 
   <pre id="log"></pre>
 
+  <img id="grid" alt="" style="max-width: 100%;" />
+
   <p><a href="/logout">Logout</a></p>
 
   <script>
     window.addEventListener("DOMContentLoaded", () => {
       const input = document.getElementById("folder");
       const strengthEl = document.getElementById("strength");
+      const fastEl = document.getElementById("fast");
       const logEl = document.getElementById("log");
       const scanBtn = document.getElementById("scan");
       const runBtn = document.getElementById("run");
+      const previewBtn = document.getElementById("preview");
+      const gridEl = document.getElementById("grid");
+
+      const PARALLEL_UPLOADS = 4;
+      const MAX_ATTEMPTS = 5;
+      let session = null;
 
       function log(s) { logEl.textContent += s + "\\n"; }
       function clearLog() { logEl.textContent = ""; }
@@ -175,6 +979,45 @@ async def denoise_page(request: Request):
         }
       });
 
+      previewBtn.addEventListener("click", async (e) => {
+        e.preventDefault();
+        try {
+          clearLog();
+          const pngs = collectPNGs(Array.from(input.files || []));
+          if (!pngs.length) return log("No PNG files found.");
+
+          // A few frames spread over the sequence, at strengths around the
+          // current one; only those frames are uploaded.
+          const strength = parseFloat(strengthEl.value || "1.0");
+          const strengths = [...new Set([0.5, 1, 1.5, 2].map(
+            k => Math.min(5, Math.round(strength * k * 10) / 10)))];
+          const count = Math.min(4, pngs.length);
+          const step = (pngs.length - 1) / Math.max(count - 1, 1);
+          const form = new FormData();
+          for (let i = 0; i < count; i++) {
+            const f = pngs[Math.round(i * step)];
+            form.append("files", f, relPath(f));
+          }
+          const query = strengths.map(s => `strengths=${s}`).join("&");
+          log(`Previewing ${count} frames at strengths ${strengths.join(", ")} ...`);
+          const r = await fetch(`/denoise/preview-grid?samples=${count}&${query}`, {
+            method: "POST",
+            body: form,
+          });
+          if (!r.ok) {
+            const txt = await r.text().catch(() => "");
+            log(`ERROR HTTP ${r.status}: ${txt}`);
+            return;
+          }
+          if (gridEl.src) URL.revokeObjectURL(gridEl.src);
+          gridEl.src = URL.createObjectURL(await r.blob());
+          log("Rows are frames, columns strengths.");
+        } catch (err) {
+          console.error(err);
+          log("ERROR in preview: " + (err?.message || err));
+        }
+      });
+
       runBtn.addEventListener("click", async (e) => {
         e.preventDefault();
         try {
@@ -191,18 +1034,67 @@ async def denoise_page(request: Request):
 
           log(`PNG files: ${pngs.length}`);
           log(`Strength: ${strength}`);
-          log(`Uploading ALL to POST /denoise/sequence.zip ...`);
+          // Frames go up one request each, a few at a time; the server
+          // denoises each as it arrives. A failed run resumes where it
+          // stopped when Run is clicked again with the same selection.
+          const quality = fastEl.checked ? "fast" : "exact";
+          const key = `${strength}|${quality}|` + pngs.map(f => `${relPath(f)}:${f.size}`).join("|");
+          let upload = null;
+          if (session && session.key === key) {
+            const r = await fetch(`/denoise/uploads/${session.id}`);
+            if (r.ok) upload = await r.json();
+          }
+          if (upload) {
+            log(`Resuming: ${upload.frames_received}/${upload.frames_total} frames already done`);
+          } else {
+            const r = await fetch(`/denoise/uploads?strength=${encodeURIComponent(strength)}&quality=${quality}`, {
+              method: "POST",
+              headers: { "Content-Type": "application/json" },
+              body: JSON.stringify({ frames: pngs.map(relPath) }),
+            });
+            if (!r.ok) {
+              const txt = await r.text().catch(() => "");
+              log(`ERROR HTTP ${r.status}: ${txt}`);
+              return;
+            }
+            upload = await r.json();
+            session = { key, id: upload.upload_id };
+          }
 
-          const form = new FormData();
-          for (const f of pngs) {
-            const name = relPath(f);
-            form.append("files", f, name);
+          const queue = upload.missing.slice();
+          let done = upload.frames_received;
+
+          async function putFrame(index) {
+            const url = upload.frames_url.replace("{index}", index);
+            for (let attempt = 1; ; attempt++) {
+              let retry = true;
+              try {
+                const r = await fetch(url, { method: "PUT", body: pngs[index] });
+                if (r.ok) return;
+                retry = r.status === 429 || r.status >= 500;
+                const txt = await r.text().catch(() => "");
+                throw new Error(`${relPath(pngs[index])}: HTTP ${r.status} ${txt}`);
+              } catch (err) {
+                if (!retry || attempt >= MAX_ATTEMPTS) throw err;
+              }
+              await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+            }
+          }
+
+          async function uploader() {
+            while (queue.length) {
+              await putFrame(queue.shift());
+              done++;
+              if (done % 10 === 0 || done === upload.frames_total) {
+                log(`Denoised ${done}/${upload.frames_total}`);
+              }
+            }
           }
 
-          const url = `/denoise/sequence.zip?strength=${encodeURIComponent(strength)}`;
-          const headers = {};
+          log(`Uploading ${queue.length} frames, ${PARALLEL_UPLOADS} at a time ...`);
+          await Promise.all(Array.from({ length: PARALLEL_UPLOADS }, uploader));
 
-          const r = await fetch(url, { method: "POST", headers, body: form });
+          const r = await fetch(upload.finalize_url, { method: "POST" });
 
           log(`Response status: ${r.status}`);
 
@@ -216,10 +1108,12 @@ async def denoise_page(request: Request):
           log(`ZIP size: ${zipBlob.size} bytes`);
 
           downloadBlob(zipBlob, "denoised_sequence.zip");
+          session = null;
           log("Done. ZIP downloaded ✅");
         } catch (err) {
           console.error(err);
           log("ERROR in run: " + (err?.message || err));
+          if (session) log("Click Run again to resume.");
         }
       });
     });
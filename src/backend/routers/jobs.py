@@ -0,0 +1,105 @@
+import shutil
+
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from backend.auth.login import require_login
+from backend.resources import get_resources
+from backend.utils.responses import file_response
+from backend.utils.uploads import (
+    check_upload_bytes,
+    check_upload_pixels,
+    probe_uploads,
+)
+from taskmanager import JOB_DONE, Job, JobQueue
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _store_inputs(queue: JobQueue, job_id: str, files: list[UploadFile]) -> None:
+    for index, f in enumerate(files):
+        path = queue.input_path(job_id, index)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f.file.seek(0)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(f.file, out)
+
+
+async def _get_own_job(request: Request, job_id: str) -> Job:
+    job = await run_in_threadpool(get_resources(request).queue.get, job_id)
+    if job is None or job.user_id != request.session.get("user_id"):
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@router.post("/sequence")
+async def enqueue_sequence(
+    request: Request,
+    strength: float = Query(1.0, ge=0.0, le=5.0),
+    files: list[UploadFile] = File(...),
+) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+
+    png_files = [f for f in files if (f.filename or "").lower().endswith(".png")]
+    if not png_files:
+        raise HTTPException(status_code=400, detail="No PNG files in upload.")
+
+    resources = get_resources(request)
+    # The same limits as /denoise/sequence.zip, checked before anything
+    # is written to the jobs directory.
+    check_upload_bytes(resources.config, png_files)
+    sizes = await run_in_threadpool(probe_uploads, png_files)
+    check_upload_pixels(resources.config, sizes)
+
+    queue = resources.queue
+    job_id = queue.new_job_id()
+    await run_in_threadpool(_store_inputs, queue, job_id, png_files)
+    await run_in_threadpool(
+        queue.enqueue,
+        job_id,
+        user_id=request.session["user_id"],
+        strength=strength,
+        frames=[f.filename or "frame.png" for f in png_files],
+    )
+    return JSONResponse(
+        {"job_id": job_id, "status_url": f"/jobs/{job_id}"}, status_code=202
+    )
+
+
+@router.get("/{job_id}")
+async def job_status(request: Request, job_id: str) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    job = await _get_own_job(request, job_id)
+    body = {
+        "job_id": job.id,
+        "status": job.status,
+        "frames_total": job.frames_total,
+        "frames_done": job.frames_done,
+        "attempts": job.attempts,
+        "error": job.error,
+    }
+    if job.status == JOB_DONE:
+        body["result_url"] = f"/jobs/{job.id}/result"
+    return JSONResponse(body)
+
+
+@router.get("/{job_id}/result")
+async def job_result(request: Request, job_id: str) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    job = await _get_own_job(request, job_id)
+    if job.status != JOB_DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+    return await run_in_threadpool(
+        file_response,
+        request,
+        get_resources(request).queue.result_path(job.id),
+        "application/zip",
+        f"denoised_{job.id}.zip",
+    )
@@ -0,0 +1,64 @@
+from dataclasses import asdict
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from backend.auth.login import require_login
+from backend.resources import get_resources
+from backend.services.results import StoredResult
+from backend.utils.responses import file_response
+
+router = APIRouter(prefix="/results", tags=["results"])
+
+
+def result_url(result: StoredResult) -> str:
+    return f"/results/{result.id}"
+
+
+def _get_own_result(request: Request, result_id: str) -> StoredResult:
+    result = get_resources(request).results.get(result_id)
+    if result is None or result.user_id != request.session.get("user_id"):
+        raise HTTPException(status_code=404, detail="Result not found.")
+    return result
+
+
+@router.get("")
+async def list_results(request: Request) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    results = await run_in_threadpool(
+        get_resources(request).results.list, request.session["user_id"]
+    )
+    return JSONResponse([{**asdict(r), "url": result_url(r)} for r in results])
+
+
+@router.api_route("/{result_id}", methods=["GET", "HEAD"])
+async def get_result(request: Request, result_id: str) -> Response:
+    """
+    A stored result, with ETag, conditional GET and Range support so an
+    interrupted download can resume where it stopped.
+    """
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    result = _get_own_result(request, result_id)
+    path = get_resources(request).results.data_path(result.id)
+    try:
+        return await run_in_threadpool(
+            file_response, request, path, result.media_type, result.filename
+        )
+    except FileNotFoundError:
+        # Expired since it was looked up.
+        raise HTTPException(status_code=404, detail="Result not found.")
+
+
+@router.delete("/{result_id}")
+async def delete_result(request: Request, result_id: str) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    result = _get_own_result(request, result_id)
+    await run_in_threadpool(get_resources(request).results.delete, result.id)
+    return Response(status_code=204)
@@ -0,0 +1,243 @@
+import tempfile
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from backend.auth.login import require_login
+from backend.config import MLServiceConfig
+from backend.resources import get_resources
+from backend.routers.common import (
+    admit,
+    denoise_engine,
+    denoise_upload,
+    encoding_profile,
+)
+from backend.services.denoise.engines import DEFAULT_ENGINE
+from backend.services.encoding import DEFAULT_ENCODING, EncodingProfile, get_profile
+from backend.services.metrics import (
+    BYTES_IN,
+    BYTES_OUT,
+    in_flight,
+    observe_frame,
+    observe_stage,
+)
+from backend.services.staging import StagedUpload, StagingStore
+from backend.utils.uploads import check_upload_pixels, probe_uploads
+from backend.utils.zip_archive import denoised_arcname
+from backend.utils.zip_stream import ZipStream
+
+# Staged uploads live under /denoise with the rest of the denoise API.
+router = APIRouter(prefix="/denoise", tags=["uploads"])
+
+
+class StagedUploadRequest(BaseModel):
+    # Frame names in sequence order; they become the archive entry names,
+    # so each must be a relative path that stays inside the archive.
+    frames: list[str] = Field(min_length=1)
+
+    @field_validator("frames")
+    @classmethod
+    def _check_frame_names(cls, frames: list[str]) -> list[str]:
+        for name in frames:
+            parts = name.split("/")
+            if "\\" in name or "\0" in name or any(p in ("", ".", "..") for p in parts):
+                raise ValueError(f"Unsafe frame name {name!r}")
+        return frames
+
+
+def _get_own_upload(request: Request, upload_id: str) -> StagedUpload:
+    upload = get_resources(request).staging.get(upload_id)
+    if upload is None or upload.user_id != request.session.get("user_id"):
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    return upload
+
+
+def _upload_status(staging: StagingStore, upload: StagedUpload) -> dict:
+    received = set(staging.received(upload))
+    return {
+        "upload_id": upload.id,
+        "frames_total": upload.frames_total,
+        "frames_received": len(received),
+        "missing": [i for i in range(upload.frames_total) if i not in received],
+        "frames_url": f"/denoise/uploads/{upload.id}/frames/{{index}}",
+        "finalize_url": f"/denoise/uploads/{upload.id}/finalize",
+    }
+
+
+@asynccontextmanager
+async def _spool_body(
+    request: Request, config: MLServiceConfig, filename: str
+) -> AsyncIterator[UploadFile]:
+    """
+    Reads a raw request body the way multipart parts are read: in memory
+    up to the spool size, then into a temp file, which is closed, and
+    removed, when the block exits.
+    """
+    limit = config.max_request_mb * 1024 * 1024
+    with tempfile.SpooledTemporaryFile(max_size=config.upload_spool_kb * 1024) as spool:
+        file = UploadFile(spool, size=0, filename=filename)
+        async for chunk in request.stream():
+            if (file.size or 0) + len(chunk) > limit:
+                raise HTTPException(
+                    status_code=413, detail=f"Frame is over the {limit} byte limit."
+                )
+            await file.write(chunk)
+        await file.seek(0)
+        yield file
+
+
+@router.post("/uploads")
+async def create_upload(
+    request: Request,
+    body: StagedUploadRequest,
+    strength: float = Query(1.0, ge=0.0, le=5.0),
+    encoding: str = Query(DEFAULT_ENCODING),
+    engine: str = Query(DEFAULT_ENGINE),
+    quality: str = Query("exact"),
+) -> Response:
+    """
+    Starts a frame-by-frame upload. PUT each frame's image bytes to
+    frames_url; they are denoised on arrival, so frames can be sent in
+    parallel and resent after a dropped connection. GET the upload for the
+    frames still missing, then POST finalize_url for the ZIP.
+    """
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    profile = encoding_profile(encoding)
+    # The session keeps the engine that quality resolved to.
+    denoiser = denoise_engine(engine, quality)
+    staging = get_resources(request).staging
+    upload = await run_in_threadpool(
+        staging.create,
+        request.session["user_id"],
+        body.frames,
+        strength,
+        profile.name,
+        denoiser.name,
+    )
+    return JSONResponse(_upload_status(staging, upload), status_code=201)
+
+
+@router.get("/uploads/{upload_id}")
+async def upload_status(request: Request, upload_id: str) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    upload = _get_own_upload(request, upload_id)
+    staging = get_resources(request).staging
+    return JSONResponse(await run_in_threadpool(_upload_status, staging, upload))
+
+
+@router.put("/uploads/{upload_id}/frames/{index}")
+async def put_upload_frame(request: Request, upload_id: str, index: int) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    resources = get_resources(request)
+    upload = _get_own_upload(request, upload_id)
+    if not 0 <= index < upload.frames_total:
+        raise HTTPException(status_code=404, detail="Frame index out of range.")
+    engine = denoise_engine(upload.engine)
+
+    async with _spool_body(request, resources.config, upload.frames[index]) as file:
+        sizes = await run_in_threadpool(probe_uploads, [file])
+        check_upload_pixels(resources.config, sizes)
+        granted = await admit(request, sizes[0][0] * sizes[0][1])
+        try:
+            with in_flight("staged", upload.strength).track_inprogress():
+                BYTES_IN.labels("staged").inc(file.size or 0)
+                out = await denoise_upload(
+                    resources, file, upload.strength, upload.encoding, engine, "staged"
+                )
+        finally:
+            granted.release()
+
+    try:
+        await run_in_threadpool(resources.staging.put_output, upload.id, index, out)
+    except FileNotFoundError:
+        # Deleted or expired while this frame was being denoised.
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    observe_frame("staged", upload.strength, sizes[0])
+    return Response(status_code=204)
+
+
+@router.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(request: Request, upload_id: str) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    upload = _get_own_upload(request, upload_id)
+    resources = get_resources(request)
+    staging = resources.staging
+    status = await run_in_threadpool(_upload_status, staging, upload)
+    if status["missing"]:
+        return JSONResponse(status, status_code=409)
+
+    headers = {"Content-Disposition": 'attachment; filename="denoised_sequence.zip"'}
+    return StreamingResponse(
+        _stream_staged_zip(
+            staging,
+            upload,
+            get_profile(upload.encoding),
+            resources.config.zip_workers,
+        ),
+        media_type="application/zip",
+        headers=headers,
+        # Only runs once the whole archive was sent; an interrupted
+        # download can be finalized again.
+        background=BackgroundTask(staging.delete, upload.id),
+    )
+
+
+@router.delete("/uploads/{upload_id}")
+async def delete_upload(request: Request, upload_id: str) -> Response:
+    guard = require_login(request, "/denoise")
+    if guard:
+        return guard
+    upload = _get_own_upload(request, upload_id)
+    await run_in_threadpool(get_resources(request).staging.delete, upload.id)
+    return Response(status_code=204)
+
+
+async def _stream_staged_zip(
+    staging: StagingStore,
+    upload: StagedUpload,
+    profile: EncodingProfile,
+    zip_workers: int,
+) -> AsyncIterator[bytes]:
+    stream = ZipStream(workers=zip_workers)
+    bytes_out = BYTES_OUT.labels("staged")
+    for index, name in enumerate(upload.frames):
+        chunk = await run_in_threadpool(
+            _staged_zip_add, stream, staging, upload, index, name, profile
+        )
+        bytes_out.inc(len(chunk))
+        yield chunk
+    chunk = await run_in_threadpool(stream.close)
+    bytes_out.inc(len(chunk))
+    yield chunk
+
+
+def _staged_zip_add(
+    stream: ZipStream,
+    staging: StagingStore,
+    upload: StagedUpload,
+    index: int,
+    name: str,
+    profile: EncodingProfile,
+) -> bytes:
+    t0 = time.perf_counter()
+    chunk = stream.add_bytes(
+        denoised_arcname(name, profile.extension),
+        staging.read_output(upload.id, index),
+        profile.zip_compression,
+    )
+    observe_stage("staged", upload.strength, "zip_write", time.perf_counter() - t0)
+    return chunk
@@ -0,0 +1,182 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+
+import structlog
+
+LOGGER = structlog.get_logger()
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Admission:
+    """Capacity granted to one request. release() may be called repeatedly."""
+
+    def __init__(
+        self, controller: "AdmissionController", user_id: object, cost: int
+    ) -> None:
+        self.user_id = user_id
+        self.cost = cost
+        self._controller = controller
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+@dataclass
+class _Waiter:
+    future: "asyncio.Future[Admission]"
+    user_id: object
+    cost: int
+
+
+class AdmissionController:
+    """
+    Bounds the pixels being denoised at once, with a bounded FIFO of
+    requests waiting for capacity.
+
+    A request costs the pixels it can have in flight. Requests larger than
+    the whole capacity are clamped so they can still run, alone. Each user
+    may hold (or wait for) at most `user_pixels` at a time; their first
+    request is always let through. Everything runs on the event loop, so no
+    locking is needed.
+    """
+
+    def __init__(
+        self,
+        capacity_pixels: int,
+        max_waiting: int,
+        wait_timeout: float,
+        user_pixels: int = 0,
+        retry_after: int = 1,
+    ) -> None:
+        self.capacity_pixels = capacity_pixels
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.user_pixels = user_pixels
+        self.retry_after = retry_after
+
+        self._waiters: deque[_Waiter] = deque()
+        self._user_load: dict[object, int] = {}
+        self._in_use = 0
+        self._in_flight = 0
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.rejected_user = 0
+
+    async def admit(self, user_id: object, pixels: int) -> Admission:
+        """
+        Waits for capacity and returns the grant; the caller must release
+        it. Raises AdmissionRejected (429 over the user cap, 503 when the
+        queue is full or the wait times out).
+        """
+        cost = max(1, min(pixels, self.capacity_pixels))
+        load = self._user_load.get(user_id, 0)
+        if self.user_pixels and load and load + cost > self.user_pixels:
+            self.rejected_user += 1
+            raise self._reject(429, "Too much work in flight for this user.")
+
+        if not self._waiters and self._in_use + cost <= self.capacity_pixels:
+            self._user_load[user_id] = load + cost
+            return self._grant(user_id, cost)
+
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected_queue_full += 1
+            raise self._reject(503, "Server is busy, try again later.")
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), user_id, cost)
+        self._waiters.append(waiter)
+        self._user_load[user_id] = load + cost
+        try:
+            # Shielded, so a timeout leaves the future for the check below.
+            return await asyncio.wait_for(
+                asyncio.shield(waiter.future), self.wait_timeout
+            )
+        except asyncio.TimeoutError:
+            if _granted(waiter):
+                # Granted just as the wait timed out.
+                return waiter.future.result()
+            self._abandon(waiter)
+            self.rejected_timeout += 1
+            raise self._reject(503, "Server is busy, try again later.")
+        except asyncio.CancelledError:
+            if _granted(waiter):
+                waiter.future.result().release()
+            else:
+                self._abandon(waiter)
+            raise
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "capacity_pixels": self.capacity_pixels,
+            "in_flight_pixels": self._in_use,
+            "in_flight_requests": self._in_flight,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "rejected_user": self.rejected_user,
+        }
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        LOGGER.warning(
+            "Request rejected",
+            status_code=status_code,
+            reason=reason,
+            in_flight_pixels=self._in_use,
+            waiting=len(self._waiters),
+        )
+        return AdmissionRejected(status_code, reason, self.retry_after)
+
+    def _grant(self, user_id: object, cost: int) -> Admission:
+        self._in_use += cost
+        self._in_flight += 1
+        self.admitted += 1
+        return Admission(self, user_id, cost)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        self._unload_user(waiter.user_id, waiter.cost)
+        # The head of the queue may fit now.
+        self._wake()
+
+    def _release(self, admission: Admission) -> None:
+        self._in_use -= admission.cost
+        self._in_flight -= 1
+        self._unload_user(admission.user_id, admission.cost)
+        self._wake()
+
+    def _unload_user(self, user_id: object, cost: int) -> None:
+        load = self._user_load[user_id] - cost
+        if load:
+            self._user_load[user_id] = load
+        else:
+            del self._user_load[user_id]
+
+    def _wake(self) -> None:
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.future.cancelled():
+                # Its task is about to run _abandon().
+                self._waiters.popleft()
+                continue
+            if self._in_use + waiter.cost > self.capacity_pixels:
+                return
+            self._waiters.popleft()
+            waiter.future.set_result(self._grant(waiter.user_id, waiter.cost))
+
+
+def _granted(waiter: _Waiter) -> bool:
+    return waiter.future.done() and not waiter.future.cancelled()
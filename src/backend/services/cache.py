@@ -0,0 +1,172 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import structlog
+
+from backend.services.denoise import ALGORITHM_VERSION, normalize_strength
+
+LOGGER = structlog.get_logger()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of encoded denoise results.
+
+    Keys hash the uploaded bytes together with the normalized strength and
+    ALGORITHM_VERSION. Values are the encoded output, so a hit skips decode,
+    denoise and encode entirely. A bounded in-memory LRU sits in front of a
+    size-capped directory on disk; disk hits are promoted to memory.
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int,
+        disk_dir: str | None = None,
+        disk_bytes: int = 0,
+    ) -> None:
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes if disk_dir else 0
+        self.disk_dir: Path | None = Path(disk_dir) if disk_dir else None
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_used = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_used = 0
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions_memory = 0
+        self.evictions_disk = 0
+
+        if self.disk_dir is not None and self.disk_bytes > 0:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def key(data: bytes, strength: float, **params: object) -> str:
+        h = hashlib.blake2b(digest_size=32)
+        h.update(data)
+        h.update(f"|{ALGORITHM_VERSION}|{normalize_strength(strength):.4f}".encode())
+        for name in sorted(params):
+            h.update(f"|{name}={params[name]}".encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return value
+            on_disk = key in self._disk
+
+        if on_disk:
+            value = self._read_disk(key)
+            if value is not None:
+                with self._lock:
+                    self.hits_disk += 1
+                    self._put_memory(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._put_memory(key, value)
+        if self.disk_bytes > 0 and len(value) <= self.disk_bytes:
+            self._write_disk(key, value)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "evictions_memory": self.evictions_memory,
+                "evictions_disk": self.evictions_disk,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_used,
+            }
+
+    def _put_memory(self, key: str, value: bytes) -> None:
+        if len(value) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= len(old)
+        self._memory[key] = value
+        self._memory_used += len(value)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+            self.evictions_memory += 1
+
+    def _disk_path(self, key: str) -> Path:
+        assert self.disk_dir is not None
+        return self.disk_dir / key[:2] / key
+
+    def _load_disk_index(self) -> None:
+        assert self.disk_dir is not None
+        entries = []
+        for path in self.disk_dir.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            st = path.stat()
+            entries.append((st.st_mtime, path.name, st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_used += size
+        LOGGER.info(
+            "Result cache loaded", entries=len(self._disk), disk_bytes=self._disk_used
+        )
+        self._evict_disk()
+
+    def _read_disk(self, key: str) -> bytes | None:
+        path = self._disk_path(key)
+        try:
+            value = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory.
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_used -= size
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        return value
+
+    def _write_disk(self, key: str, value: bytes) -> None:
+        path = self._disk_path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(value)
+        os.replace(tmp_path, path)
+        with self._lock:
+            old = self._disk.pop(key, None)
+            if old is not None:
+                self._disk_used -= old
+            self._disk[key] = len(value)
+            self._disk_used += len(value)
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        while True:
+            with self._lock:
+                if self._disk_used <= self.disk_bytes or not self._disk:
+                    return
+                key, size = self._disk.popitem(last=False)
+                self._disk_used -= size
+                self.evictions_disk += 1
+            self._disk_path(key).unlink(missing_ok=True)
@@ -1,3 +1,13 @@
-from backend.services.denoise.denoise import denoise_image
+from backend.services.denoise.denoise import (
+    ALGORITHM_VERSION,
+    denoise_image,
+    denoise_image_fast,
+    normalize_strength,
+)
 
-__all__ = ["denoise_image"]
+__all__ = [
+    "ALGORITHM_VERSION",
+    "denoise_image",
+    "denoise_image_fast",
+    "normalize_strength",
+]
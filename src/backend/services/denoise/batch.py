@@ -0,0 +1,180 @@
+import math
+
+import numpy as np
+
+from backend.services.denoise.denoise import normalize_strength
+
+# Largest per-channel difference from denoise_image() on the same frame.
+# Both run the same three-pass extended box cascade with Pillow's 8.24
+# fixed-point weights, so on current Pillow releases the output is
+# identical; the tolerance leaves room for upstream rounding changes.
+BATCH_TOLERANCE = 1
+
+_PASSES = 3
+
+# Rows blurred together along the width; sized so the uint32 working set
+# stays in L2 across all passes.
+_ROW_BLOCK_BYTES = 512 * 1024
+
+
+def box_radius(sigma: float, passes: int = _PASSES) -> float:
+    """
+    Fractional box radius whose `passes`-fold cascade matches a Gaussian of
+    the given sigma (Gwosdek et al.). Evaluated in float32 like Pillow.
+    """
+    f32 = np.float32
+    sigma2 = f32(sigma) * f32(sigma) / f32(passes)
+    length = f32(math.sqrt(12.0 * float(sigma2) + 1.0))
+    whole = f32(math.floor((float(length) - 1.0) / 2.0))
+    frac = (f32(2) * whole + f32(1)) * (whole * (whole + f32(1)) - f32(3) * sigma2)
+    frac /= f32(6) * (sigma2 - (whole + f32(1)) * (whole + f32(1)))
+    return float(whole + frac)
+
+
+def _weights(radius: float) -> tuple[int, np.uint32, np.uint32]:
+    """
+    Integer part of the radius plus 8.24 fixed-point weights: `ww` for the
+    2*whole+1 samples inside the window, `fw` for the two just outside it.
+    For 8-bit samples every intermediate fits in uint32.
+    """
+    whole = int(radius)
+    ww = int(np.float32(1 << 24) / (np.float32(radius) * np.float32(2) + 1))
+    fw = ((1 << 24) - (2 * whole + 1) * ww) // 2
+    return whole, np.uint32(ww), np.uint32(fw)
+
+
+def _blur_width(rows: np.ndarray, radius: float, passes: int) -> None:
+    """
+    Box passes along axis 1 of a (rows, W, C) uint8 array, in place, using
+    running sums over L2-sized blocks of rows.
+    """
+    whole, ww, fw = _weights(radius)
+    size = rows.shape[1]
+    pad = whole + 1
+    step = max(1, _ROW_BLOCK_BYTES // (rows[0].size * 4))
+
+    for start in range(0, rows.shape[0], step):
+        block = rows[start : start + step]
+        # Edge-clamped copy with a leading zero column for the running sum.
+        padded = np.empty(
+            (block.shape[0], size + 2 * pad + 1, rows.shape[2]), dtype=np.uint32
+        )
+        padded[:, 0] = 0
+        padded[:, 1 + pad : 1 + pad + size] = block
+        for _ in range(passes):
+            padded[:, 1 : 1 + pad] = padded[:, 1 + pad : 2 + pad]
+            padded[:, 1 + pad + size :] = padded[:, pad + size : 1 + pad + size]
+            cumsum = np.cumsum(padded, axis=1, dtype=np.uint32)
+            acc = np.subtract(
+                cumsum[:, 2 * pad : 2 * pad + size], cumsum[:, 1 : 1 + size]
+            )
+            acc *= ww
+            edges = np.add(
+                padded[:, 1 : 1 + size],
+                padded[:, 1 + 2 * pad : 1 + 2 * pad + size],
+                out=cumsum[:, :size],
+            )
+            edges *= fw
+            acc += edges
+            acc += np.uint32(1 << 23)
+            acc >>= np.uint32(24)
+            padded[:, 1 + pad : 1 + pad + size] = acc
+        block[...] = padded[:, 1 + pad : 1 + pad + size]
+
+
+def _box_sliding(src: np.ndarray, dst: np.ndarray, axis: int, radius: float) -> None:
+    """
+    One box pass along an outer axis of uint32 arrays, src -> dst.
+
+    Slides a running sum one slice at a time like Pillow's line blur; every
+    step is vectorised over all remaining axes, which suits large stacks.
+    """
+    whole, ww, fw = _weights(radius)
+    size = src.shape[axis]
+    src_slices = [src[(slice(None),) * axis + (i,)] for i in range(size)]
+    dst_slices = [dst[(slice(None),) * axis + (i,)] for i in range(size)]
+
+    def at(i: int) -> np.ndarray:
+        return src_slices[min(max(i, 0), size - 1)]
+
+    acc = np.zeros_like(src_slices[0])
+    for i in range(-whole, whole + 1):
+        acc += at(i)
+    edges = np.empty_like(acc)
+    for i in range(size):
+        np.add(at(i - whole - 1), at(i + whole + 1), out=edges)
+        edges *= fw
+        row = dst_slices[i]
+        np.multiply(acc, ww, out=row)
+        row += edges
+        row += np.uint32(1 << 23)
+        row >>= np.uint32(24)
+        acc += at(i + whole + 1)
+        acc -= at(i - whole)
+
+
+def _blur_outer(work: np.ndarray, axis: int, radius: float, passes: int) -> None:
+    """Box passes along an outer axis of a uint8 stack, in place."""
+    if work.shape[axis] < 2:
+        return
+    src = work.astype(np.uint32)
+    dst = np.empty_like(src)
+    for _ in range(passes):
+        _box_sliding(src, dst, axis, radius)
+        src, dst = dst, src
+    work[...] = src
+
+
+def temporal_blur(frames: np.ndarray, radius: int) -> None:
+    """
+    Average each frame of a uint8 (N, H, W, C) stack with `radius`
+    neighbours on either side, clamped at the stack ends; in place.
+    """
+    _blur_outer(frames, 0, float(radius), 1)
+
+
+def denoise_batch(
+    frames: np.ndarray,
+    strength: float = 1.0,
+    temporal_radius: int = 0,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Blur a stack of same-sized frames shaped (N, H, W, C).
+
+    Runs the separable three-pass box cascade behind denoise_image() over
+    the whole stack at once; each frame matches the single-frame path within
+    BATCH_TOLERANCE. With temporal_radius > 0 each frame is then averaged
+    with that many neighbours on either side (clamped at the stack ends).
+
+    Results go to `out`, the input stack when omitted. A uint8 stack with
+    a uint8 `out` is blurred in place. Anything else is rounded into a
+    uint8 copy, blurred there, and copied into `out` at the end; there is
+    no floating-point path.
+    """
+    if frames.ndim != 4:
+        raise ValueError(f"Expected (N, H, W, C) frames, got shape {frames.shape}")
+    if out is None:
+        out = frames
+
+    if frames.dtype == np.uint8 and out.dtype == np.uint8:
+        work = out
+        if out is not frames:
+            work[...] = frames
+    else:
+        work = np.clip(np.rint(frames), 0, 255).astype(np.uint8)
+
+    sigma = normalize_strength(strength)
+    if sigma > 0.0:
+        radius = box_radius(sigma)
+        # Width first, then height: Pillow's pass order, which matters
+        # because every pass rounds.
+        n, h, w, c = work.shape
+        _blur_width(work.reshape(n * h, w, c), radius, _PASSES)
+        _blur_outer(work, 1, radius, _PASSES)
+    if temporal_radius > 0:
+        temporal_blur(work, temporal_radius)
+
+    if work is not out:
+        out[...] = work
+    return out
@@ -0,0 +1,255 @@
+import abc
+import hashlib
+import os
+import threading
+from typing import Any
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from backend.services.denoise.batch import denoise_batch
+from backend.services.denoise.denoise import (
+    ALGORITHM_VERSION,
+    FAST_ALGORITHM_VERSION,
+    denoise_image,
+    denoise_image_fast,
+    normalize_strength,
+)
+from backend.services.denoise.tiled import tile_halo
+
+DEFAULT_ENGINE = "gaussian"
+
+
+class DenoiseEngine(abc.ABC):
+    """
+    A denoise backend. Engines are small picklable objects, so they can be
+    handed to worker processes with each call; heavy state such as model
+    sessions is created lazily in the process that uses it.
+    """
+
+    name: str = ""
+
+    @property
+    @abc.abstractmethod
+    def cache_tag(self) -> str:
+        """Identifies the engine's output in result-cache keys."""
+
+    @abc.abstractmethod
+    def denoise(self, img: Image.Image, strength: float) -> Image.Image:
+        """Denoise one RGB image."""
+
+    def denoise_batch(self, frames: np.ndarray, strength: float) -> np.ndarray:
+        """
+        Denoise a uint8 (N, H, W, 3) stack of same-sized frames. May work in
+        place; returns the result.
+        """
+        for i, frame in enumerate(frames):
+            frames[i] = np.asarray(self.denoise(Image.fromarray(frame), strength))
+        return frames
+
+    def halo(self, strength: float) -> int | None:
+        """
+        Context pixels a tile needs for exact output, or None if the engine
+        must see the whole image.
+        """
+        return None
+
+    def scaled_strength(self, strength: float, scale: float) -> float:
+        """
+        Strength that gives an image shrunk by `scale` the look of the full
+        image at `strength`. Only spatial filters shrink with the image.
+        """
+        return strength
+
+    def warm_up(self) -> None:
+        pass
+
+
+class GaussianEngine(DenoiseEngine):
+    """Pillow's GaussianBlur; batches run on the bit-identical NumPy kernel."""
+
+    name = "gaussian"
+
+    @property
+    def cache_tag(self) -> str:
+        return ALGORITHM_VERSION
+
+    def denoise(self, img: Image.Image, strength: float) -> Image.Image:
+        return denoise_image(img, strength=strength)
+
+    def denoise_batch(self, frames: np.ndarray, strength: float) -> np.ndarray:
+        return denoise_batch(frames, strength)
+
+    def halo(self, strength: float) -> int | None:
+        return tile_halo(strength)
+
+    def scaled_strength(self, strength: float, scale: float) -> float:
+        return strength / scale
+
+
+class FastGaussianEngine(DenoiseEngine):
+    """
+    quality=fast for the gaussian engine: denoise_image_fast(), which works
+    at reduced scale for large strengths. Its downscale grid is anchored to
+    the image origin, so tiles would not line up and it is never tiled.
+    """
+
+    name = "gaussian-fast"
+
+    @property
+    def cache_tag(self) -> str:
+        return FAST_ALGORITHM_VERSION
+
+    def denoise(self, img: Image.Image, strength: float) -> Image.Image:
+        return denoise_image_fast(img, strength=strength)
+
+    def scaled_strength(self, strength: float, scale: float) -> float:
+        return strength / scale
+
+
+class MedianEngine(DenoiseEngine):
+    """Median filter; strength s uses a (2 * round(s) + 1)-pixel window."""
+
+    name = "median"
+
+    @property
+    def cache_tag(self) -> str:
+        return "median-1"
+
+    @staticmethod
+    def window(strength: float) -> int:
+        return 2 * round(normalize_strength(strength)) + 1
+
+    def denoise(self, img: Image.Image, strength: float) -> Image.Image:
+        size = self.window(strength)
+        if size <= 1:
+            return img
+        return img.filter(ImageFilter.MedianFilter(size))
+
+    def halo(self, strength: float) -> int | None:
+        # Pillow pads by replicating the edge, so clipped tiles are exact.
+        return self.window(strength) // 2
+
+    def scaled_strength(self, strength: float, scale: float) -> float:
+        return strength / scale
+
+
+# Inference sessions per (model path, threads), shared by every engine
+# instance and thread in this process. Sessions loaded before a fork are
+# inherited copy-on-write, except multi-threaded ones: ONNX Runtime's
+# thread pools do not survive fork(), so children load those again.
+_SESSIONS: dict[tuple[str, int], Any] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _after_fork() -> None:
+    global _SESSIONS_LOCK
+    _SESSIONS_LOCK = threading.Lock()
+    for key in [key for key in _SESSIONS if key[1] > 1]:
+        del _SESSIONS[key]
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+class OnnxEngine(DenoiseEngine):
+    """
+    ONNX Runtime model on the CPU.
+
+    The model takes float32 NCHW RGB in [0, 1] and returns the same shape.
+    If it declares a "strength" input, strength is fed there as float32
+    (N,); otherwise the output is blended with the input by
+    min(strength, 1). Sequences go through the model in one call when its
+    batch dimension is dynamic.
+    Needs the `onnx` extra (onnxruntime).
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, threads: int = 1) -> None:
+        self.model_path = model_path
+        self.threads = threads
+        with open(model_path, "rb") as f:
+            self.model_digest = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+
+    @property
+    def cache_tag(self) -> str:
+        return f"onnx-{self.model_digest}"
+
+    @property
+    def session(self) -> Any:
+        key = (self.model_path, self.threads)
+        session = _SESSIONS.get(key)
+        if session is None:
+            with _SESSIONS_LOCK:
+                session = _SESSIONS.get(key)
+                if session is None:
+                    session = _SESSIONS[key] = self._load()
+        return session
+
+    def _load(self) -> Any:
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        # Parallelism comes from the CPU executor's workers.
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return ort.InferenceSession(
+            self.model_path, options, providers=["CPUExecutionProvider"]
+        )
+
+    def warm_up(self) -> None:
+        self.denoise_batch(np.zeros((1, 16, 16, 3), dtype=np.uint8), 1.0)
+
+    def denoise(self, img: Image.Image, strength: float) -> Image.Image:
+        frames = np.asarray(img)[None].copy()
+        out = Image.fromarray(self.denoise_batch(frames, strength)[0])
+        out.info = img.info
+        return out
+
+    def denoise_batch(self, frames: np.ndarray, strength: float) -> np.ndarray:
+        strength = normalize_strength(strength)
+        if strength <= 0.0:
+            return frames
+        session = self.session
+        inputs = {i.name: i for i in session.get_inputs()}
+        image_input = next(name for name in inputs if name != "strength")
+        # A fixed batch dimension of 1 means frame-by-frame calls.
+        step = 1 if inputs[image_input].shape[0] == 1 else len(frames)
+
+        for start in range(0, len(frames), step):
+            chunk = frames[start : start + step]
+            x = chunk.transpose(0, 3, 1, 2).astype(np.float32) / np.float32(255)
+            feed = {image_input: x}
+            if "strength" in inputs:
+                feed["strength"] = np.full(len(chunk), strength, dtype=np.float32)
+            y = session.run(None, feed)[0]
+            if "strength" not in inputs and strength < 1.0:
+                y = x + (y - x) * np.float32(strength)
+            y = np.clip(np.rint(y * np.float32(255)), 0, 255)
+            chunk[...] = y.transpose(0, 2, 3, 1).astype(np.uint8)
+        return frames
+
+
+ENGINES: dict[str, DenoiseEngine] = {
+    engine.name: engine
+    for engine in (GaussianEngine(), FastGaussianEngine(), MedianEngine())
+}
+
+# Engines serving quality=fast for another engine's requests.
+FAST_VARIANTS = {GaussianEngine.name: FastGaussianEngine.name}
+
+
+def register_engine(engine: DenoiseEngine) -> None:
+    ENGINES[engine.name] = engine
+
+
+def get_engine(name: str) -> DenoiseEngine:
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown engine '{name}', expected one of {', '.join(ENGINES)}"
+        )
@@ -0,0 +1,97 @@
+from collections.abc import Callable
+
+import numpy as np
+
+Box = tuple[int, int, int, int]
+
+# Changes are located on a grid of CELL x CELL pixel cells.
+CELL = 32
+
+# Above this share of the frame, patching costs more than a full denoise.
+MAX_PATCH_FRACTION = 0.5
+
+
+def changed_boxes(prev: np.ndarray, cur: np.ndarray, cell: int = CELL) -> list[Box]:
+    """
+    (x0, y0, x1, y1) boxes covering every pixel that differs between two
+    (H, W, C) frames, built from runs of changed grid cells. Empty when the
+    frames are identical.
+    """
+    diff = np.any(prev != cur, axis=2)
+    if not diff.any():
+        return []
+    h, w = diff.shape
+    rows, cols = -(-h // cell), -(-w // cell)
+    padded = np.zeros((rows * cell, cols * cell), dtype=bool)
+    padded[:h, :w] = diff
+    cells = padded.reshape(rows, cell, cols, cell).any(axis=(1, 3))
+
+    # Column runs per cell row; a run continues the box above it when it
+    # spans the same columns.
+    boxes: list[list[int]] = []
+    open_boxes: dict[tuple[int, int], list[int]] = {}
+    for r in range(rows):
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], cells[r], [0]))))
+        still_open = {}
+        for c0, c1 in zip(edges[::2], edges[1::2]):
+            box = open_boxes.get((c0, c1))
+            if box is None:
+                box = [int(c0), r, int(c1), r + 1]
+                boxes.append(box)
+            box[3] = r + 1
+            still_open[(c0, c1)] = box
+        open_boxes = still_open
+    return [
+        (c0 * cell, r0 * cell, min(c1 * cell, w), min(r1 * cell, h))
+        for c0, r0, c1, r1 in boxes
+    ]
+
+
+def _grow(box: Box, by: int, size: tuple[int, int]) -> Box:
+    x0, y0, x1, y1 = box
+    return (
+        max(0, x0 - by),
+        max(0, y0 - by),
+        min(size[0], x1 + by),
+        min(size[1], y1 + by),
+    )
+
+
+def denoise_changes(
+    prev_in: np.ndarray,
+    prev_out: np.ndarray,
+    cur: np.ndarray,
+    halo: int,
+    denoise: Callable[[np.ndarray], np.ndarray],
+) -> np.ndarray | None:
+    """
+    Output for `cur` given the previous frame and its output, recomputing
+    only what changed: every changed pixel can move outputs up to `halo`
+    pixels away, and those outputs need `halo` more pixels of input.
+    `denoise` maps an (H, W, C) crop to its denoised crop.
+
+    Bit-identical to denoising `cur` whole when the filter's reach is at
+    most `halo`. Returns prev_out itself when nothing changed, and None
+    when so much changed that a full denoise is cheaper.
+    """
+    boxes = changed_boxes(prev_in, cur)
+    if not boxes:
+        return prev_out
+    size = (cur.shape[1], cur.shape[0])
+    patches = []
+    area = 0
+    for box in boxes:
+        dirty = _grow(box, halo, size)
+        outer = _grow(dirty, halo, size)
+        area += (outer[2] - outer[0]) * (outer[3] - outer[1])
+        patches.append((dirty, outer))
+    if area > MAX_PATCH_FRACTION * size[0] * size[1]:
+        return None
+
+    out = prev_out.copy()
+    for (x0, y0, x1, y1), (ox0, oy0, ox1, oy1) in patches:
+        # Clipping at the frame border is exact for the same reason as in
+        # tiled denoising: the full-frame filter clamps at the same edge.
+        patch = denoise(np.ascontiguousarray(cur[oy0:oy1, ox0:ox1]))
+        out[y0:y1, x0:x1] = patch[y0 - oy0 : y1 - oy0, x0 - ox0 : x1 - ox0]
+    return out
@@ -0,0 +1,83 @@
+import io
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any
+
+from PIL import Image
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    name: str
+    format: str
+    media_type: str
+    extension: str
+    # Already-compressed payloads are stored as-is in archives; deflating
+    # them again costs time and saves next to nothing.
+    zip_compression: int
+    save_params: dict[str, Any] = field(default_factory=dict)
+
+
+PROFILES: dict[str, EncodingProfile] = {
+    profile.name: profile
+    for profile in (
+        EncodingProfile(
+            name="png",
+            format="PNG",
+            media_type="image/png",
+            extension=".png",
+            zip_compression=zipfile.ZIP_STORED,
+        ),
+        EncodingProfile(
+            name="png-fast",
+            format="PNG",
+            media_type="image/png",
+            extension=".png",
+            zip_compression=zipfile.ZIP_STORED,
+            save_params={"compress_level": 1},
+        ),
+        EncodingProfile(
+            name="png-archival",
+            format="PNG",
+            media_type="image/png",
+            extension=".png",
+            zip_compression=zipfile.ZIP_STORED,
+            save_params={"compress_level": 9},
+        ),
+        EncodingProfile(
+            name="webp-lossless",
+            format="WEBP",
+            media_type="image/webp",
+            extension=".webp",
+            zip_compression=zipfile.ZIP_STORED,
+            save_params={"lossless": True, "quality": 50, "method": 4},
+        ),
+        EncodingProfile(
+            name="raw",
+            format="PPM",
+            media_type="image/x-portable-pixmap",
+            extension=".ppm",
+            zip_compression=zipfile.ZIP_DEFLATED,
+        ),
+    )
+}
+
+DEFAULT_ENCODING = "png"
+# Previews favour encode speed over size.
+PREVIEW_ENCODING = "png-fast"
+
+
+def get_profile(name: str) -> EncodingProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown encoding '{name}', expected one of {', '.join(PROFILES)}"
+        )
+
+
+def encode_image(img: Image.Image, encoding: str = DEFAULT_ENCODING) -> bytes:
+    profile = get_profile(encoding)
+    buf = io.BytesIO()
+    img.save(buf, format=profile.format, **profile.save_params)
+    return buf.getvalue()
@@ -0,0 +1,605 @@
+import asyncio
+import itertools
+import math
+import os
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from backend.services.denoise.batch import temporal_blur
+from backend.services.denoise.engines import DEFAULT_ENGINE, DenoiseEngine, get_engine
+from backend.services.denoise.incremental import denoise_changes
+from backend.services.denoise.tiled import Tiling, denoise_tiled
+from backend.services.encoding import DEFAULT_ENCODING, PREVIEW_ENCODING, encode_image
+from backend.utils.uploads import BufferReader
+
+
+def _open(data: bytes | memoryview) -> Image.Image:
+    """
+    Decode in the source mode; callers convert to RGB. Reads straight from
+    `data`, so memoryviews over mmaps or shared memory are never copied.
+    """
+    reader = BufferReader(data)
+    try:
+        img = Image.open(reader)
+        img.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(str(e)) from e
+    finally:
+        reader.close()
+    return img
+
+
+def _decode(data: bytes | memoryview) -> Image.Image:
+    return _open(data).convert("RGB")
+
+
+def _decode_reduced(
+    data: bytes | memoryview, max_side: int
+) -> tuple[Image.Image, float]:
+    """
+    Decode to RGB with the longer side at most max_side, and return the
+    image with the factor it was shrunk by. JPEGs are decoded at reduced
+    scale (draft); other formats are decoded whole and then reduced with
+    integer box averaging, which is still much cheaper than resampling.
+    """
+    reader = BufferReader(data)
+    try:
+        img = Image.open(reader)
+        full_width = img.width
+        factor = math.ceil(max(img.size) / max_side)
+        if factor > 1:
+            img.draft("RGB", (img.width // factor, img.height // factor))
+        img.load()
+        factor = math.ceil(max(img.size) / max_side)
+        if factor > 1:
+            img = img.reduce(factor)
+        img = img.convert("RGB")
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(str(e)) from e
+    finally:
+        reader.close()
+    return img, full_width / img.width
+
+
+Timings = dict[str, list[float]]
+
+
+def _record(timings: Timings | None, stage: str, seconds: float) -> None:
+    if timings is not None:
+        timings.setdefault(stage, []).append(seconds)
+
+
+def denoise_encoded(
+    data: bytes | memoryview,
+    strength: float,
+    tiling: Tiling | None = None,
+    encoding: str = DEFAULT_ENCODING,
+    engine: DenoiseEngine | None = None,
+    timings: Timings | None = None,
+) -> bytes:
+    """
+    Decode an image, denoise it with `engine` (gaussian by default) and
+    encode the result with the given encoding profile. Images larger than
+    the tiling threshold are processed tile by tile when the engine allows
+    it. Seconds spent per stage are appended to `timings`.
+    Raises ValueError if the input cannot be decoded.
+    """
+    engine = engine or get_engine(DEFAULT_ENGINE)
+    t0 = time.perf_counter()
+    img = _open(data)
+    tiled = (
+        tiling is not None
+        and tiling.applies_to(img.size)
+        and engine.halo(strength) is not None
+    )
+    if not tiled:
+        img = img.convert("RGB")
+    t1 = time.perf_counter()
+    if tiling is not None and tiled:
+        out = denoise_tiled(img, strength, tiling.tile_size, tiling.workers, engine)
+    else:
+        out = engine.denoise(img, strength)
+    t2 = time.perf_counter()
+    encoded = encode_image(out, encoding)
+    t3 = time.perf_counter()
+
+    _record(timings, "decode", t1 - t0)
+    _record(timings, "denoise", t2 - t1)
+    _record(timings, "encode", t3 - t2)
+    return encoded
+
+
+def denoise_encoded_batch(
+    frames: Sequence[bytes | memoryview],
+    strength: float,
+    temporal_radius: int = 0,
+    keep: tuple[int, int] | None = None,
+    tiling: Tiling | None = None,
+    encoding: str = DEFAULT_ENCODING,
+    engine: DenoiseEngine | None = None,
+    timings: Timings | None = None,
+) -> list[bytes]:
+    """
+    Decode same-sized frames into one (N, H, W, 3) stack, denoise it in one
+    engine call and encode frames[keep[0]:keep[1]]. Frames
+    outside `keep` only serve as temporal context. A lone frame without
+    temporal context takes the (tiled) single-frame path instead.
+    Per-frame stage seconds go to `timings`; the batch denoise time is
+    split evenly across the kept frames.
+    Raises ValueError if a frame cannot be decoded or sizes differ.
+    """
+    if len(frames) == 1 and temporal_radius <= 0:
+        return [denoise_encoded(frames[0], strength, tiling, encoding, engine, timings)]
+
+    engine = engine or get_engine(DEFAULT_ENGINE)
+    stack: np.ndarray | None = None
+    size = (0, 0)
+    infos = []
+    for i, data in enumerate(frames):
+        t0 = time.perf_counter()
+        img = _decode(data)
+        if stack is None:
+            size = img.size
+            stack = np.empty((len(frames), size[1], size[0], 3), dtype=np.uint8)
+        elif img.size != size:
+            raise ValueError(f"Frame size {img.size} differs from {size}")
+        stack[i] = np.asarray(img)
+        infos.append(img.info)
+        _record(timings, "decode", time.perf_counter() - t0)
+
+    assert stack is not None
+    t0 = time.perf_counter()
+    stack = engine.denoise_batch(stack, strength)
+    if temporal_radius > 0:
+        temporal_blur(stack, temporal_radius)
+    start, stop = keep or (0, len(frames))
+    per_frame = (time.perf_counter() - t0) / (stop - start)
+    outputs = []
+    for i in range(start, stop):
+        _record(timings, "denoise", per_frame)
+        t0 = time.perf_counter()
+        out = Image.fromarray(stack[i])
+        # Keep ICC profile and EXIF, as the single-frame path does.
+        out.info = infos[i]
+        outputs.append(encode_image(out, encoding))
+        _record(timings, "encode", time.perf_counter() - t0)
+    return outputs
+
+
+def denoise_encoded_incremental(
+    frames: Sequence[bytes | memoryview],
+    strength: float,
+    tiling: Tiling | None = None,
+    encoding: str = DEFAULT_ENCODING,
+    engine: DenoiseEngine | None = None,
+    timings: Timings | None = None,
+) -> list[bytes]:
+    """
+    Denoise and encode frames in order, each one only where it differs from
+    the frame before it (see denoise_changes()). A frame identical to its
+    predecessor reuses its encoded output, without even being decoded when
+    the input bytes are the same. Engines that cannot be tiled
+    denoise changed frames whole. Outputs are bit-identical to
+    denoise_encoded_batch() without temporal context.
+    Raises ValueError if a frame cannot be decoded.
+    """
+    engine = engine or get_engine(DEFAULT_ENGINE)
+    halo = engine.halo(strength)
+
+    def denoise_crop(crop: np.ndarray) -> np.ndarray:
+        return engine.denoise_batch(crop[np.newaxis].copy(), strength)[0]
+
+    prev_in: np.ndarray | None = None
+    prev_out: np.ndarray | None = None
+    prev_info: dict[str, Any] = {}
+    prev_encoded = b""
+    prev_data: bytes | memoryview = b""
+    outputs = []
+    for data in frames:
+        if outputs and data == prev_data:
+            outputs.append(prev_encoded)
+            continue
+        t0 = time.perf_counter()
+        img = _decode(data)
+        cur = np.asarray(img)
+        t1 = time.perf_counter()
+        out: np.ndarray | None = None
+        if prev_in is not None and prev_out is not None and cur.shape == prev_in.shape:
+            if halo is not None:
+                out = denoise_changes(prev_in, prev_out, cur, halo, denoise_crop)
+            elif np.array_equal(prev_in, cur):
+                out = prev_out
+        if out is None:
+            if tiling is not None and halo is not None and tiling.applies_to(img.size):
+                out = np.asarray(
+                    denoise_tiled(
+                        img, strength, tiling.tile_size, tiling.workers, engine
+                    )
+                )
+            else:
+                out = denoise_crop(cur)
+        t2 = time.perf_counter()
+        if out is prev_out and img.info == prev_info:
+            encoded = prev_encoded
+        else:
+            result = Image.fromarray(out)
+            result.info = img.info
+            encoded = encode_image(result, encoding)
+        t3 = time.perf_counter()
+
+        _record(timings, "decode", t1 - t0)
+        _record(timings, "denoise", t2 - t1)
+        _record(timings, "encode", t3 - t2)
+        outputs.append(encoded)
+        prev_in, prev_out, prev_info, prev_encoded = cur, out, img.info, encoded
+        prev_data = data
+    return outputs
+
+
+def denoise_encoded_preview(
+    data: bytes | memoryview,
+    strength: float,
+    max_side: int,
+    encoding: str = PREVIEW_ENCODING,
+    engine: DenoiseEngine | None = None,
+    timings: Timings | None = None,
+) -> bytes:
+    """
+    Quick look at denoise_encoded(): the image is decoded at reduced scale
+    (longer side at most max_side) and denoised with the strength scaled
+    to match, so the cost barely depends on the source resolution.
+    Raises ValueError if the input cannot be decoded.
+    """
+    engine = engine or get_engine(DEFAULT_ENGINE)
+    t0 = time.perf_counter()
+    img, scale = _decode_reduced(data, max_side)
+    t1 = time.perf_counter()
+    out = engine.denoise(img, engine.scaled_strength(strength, scale))
+    t2 = time.perf_counter()
+    encoded = encode_image(out, encoding)
+    t3 = time.perf_counter()
+
+    _record(timings, "decode", t1 - t0)
+    _record(timings, "denoise", t2 - t1)
+    _record(timings, "encode", t3 - t2)
+    return encoded
+
+
+def preview_grid(
+    frames: Sequence[bytes | memoryview],
+    strengths: Sequence[float],
+    cell_side: int,
+    encoding: str = PREVIEW_ENCODING,
+    engine: DenoiseEngine | None = None,
+    timings: Timings | None = None,
+) -> bytes:
+    """
+    One image with a row per frame and a column per strength, each cell a
+    preview as in denoise_encoded_preview() with its strength in the
+    corner.
+    Raises ValueError if a frame cannot be decoded.
+    """
+    engine = engine or get_engine(DEFAULT_ENGINE)
+    rows = []
+    for data in frames:
+        t0 = time.perf_counter()
+        img, scale = _decode_reduced(data, cell_side)
+        t1 = time.perf_counter()
+        rows.append(
+            [engine.denoise(img, engine.scaled_strength(s, scale)) for s in strengths]
+        )
+        _record(timings, "decode", t1 - t0)
+        _record(timings, "denoise", time.perf_counter() - t1)
+
+    t0 = time.perf_counter()
+    width = max(cell.width for row in rows for cell in row)
+    height = max(cell.height for row in rows for cell in row)
+    grid = Image.new("RGB", (width * len(strengths), height * len(rows)))
+    draw = ImageDraw.Draw(grid)
+    for y, row in enumerate(rows):
+        for x, (cell, strength) in enumerate(zip(row, strengths)):
+            grid.paste(cell, (x * width, y * height))
+            label = f"{strength:g}"
+            box = draw.textbbox((x * width + 4, y * height + 4), label)
+            draw.rectangle((box[0] - 2, box[1] - 2, box[2] + 2, box[3] + 2), "black")
+            draw.text((x * width + 4, y * height + 4), label, "white")
+    encoded = encode_image(grid, encoding)
+    _record(timings, "encode", time.perf_counter() - t0)
+    return encoded
+
+
+def _preview_one(
+    frames: Sequence[memoryview],
+    strength: float,
+    max_side: int,
+    encoding: str,
+    engine: DenoiseEngine | None,
+    timings: Timings | None = None,
+) -> list[bytes]:
+    return [
+        denoise_encoded_preview(
+            frames[0], strength, max_side, encoding, engine, timings
+        )
+    ]
+
+
+def _preview_grid(
+    frames: Sequence[memoryview],
+    strengths: Sequence[float],
+    cell_side: int,
+    encoding: str,
+    engine: DenoiseEngine | None,
+    timings: Timings | None = None,
+) -> list[bytes]:
+    return [preview_grid(frames, strengths, cell_side, encoding, engine, timings)]
+
+
+def _to_shared(
+    chunks: Sequence[bytes | memoryview],
+) -> tuple[shared_memory.SharedMemory, list[int]]:
+    """Pack buffers back to back into one block; returns it and the offsets."""
+    offsets = [0]
+    for chunk in chunks:
+        offsets.append(offsets[-1] + len(chunk))
+    shm = shared_memory.SharedMemory(create=True, size=max(offsets[-1], 1))
+    for chunk, (start, stop) in zip(chunks, itertools.pairwise(offsets)):
+        shm.buf[start:stop] = chunk
+    return shm, offsets
+
+
+def _take_shared(name: str, offsets: list[int]) -> list[bytes]:
+    """Copy buffers out of a shared block and free it."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return [bytes(shm.buf[a:b]) for a, b in itertools.pairwise(offsets)]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _run_shared(
+    fn: Callable[..., list[bytes]], name: str, offsets: list[int], *args: Any
+) -> tuple[str, list[int], Timings]:
+    """
+    Worker entry point: reads input frames from a shared block, calls
+    fn(frames, *args, timings) and returns its outputs in a new shared
+    block, along with the stage timings.
+    """
+    shm_in = shared_memory.SharedMemory(name=name)
+    views = [shm_in.buf[a:b] for a, b in itertools.pairwise(offsets)]
+    timings: Timings = {}
+    try:
+        outputs = fn(views, *args, timings)
+    finally:
+        for view in views:
+            view.release()
+        shm_in.close()
+
+    shm_out, out_offsets = _to_shared(outputs)
+    shm_out.close()
+    return shm_out.name, out_offsets, timings
+
+
+def _denoise_one(
+    frames: Sequence[memoryview],
+    strength: float,
+    tiling: Tiling | None,
+    encoding: str,
+    engine: DenoiseEngine | None,
+    timings: Timings | None = None,
+) -> list[bytes]:
+    return [denoise_encoded(frames[0], strength, tiling, encoding, engine, timings)]
+
+
+def _warm_up(engines: Sequence[DenoiseEngine]) -> None:
+    for engine in engines:
+        engine.warm_up()
+
+
+def _ready() -> None:
+    pass
+
+
+def _discard_shared(future: Future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    name, offsets, _ = future.result()
+    _take_shared(name, offsets)
+
+
+class CPUExecutor:
+    """
+    Runs decode -> denoise -> encode outside the event loop.
+
+    In "process" mode frames are handed to a process pool through
+    multiprocessing.shared_memory, so only block names cross the pipe.
+    "thread" mode keeps everything in-process.
+
+    `engines` are warmed up (models loaded, a first inference run) once per
+    worker process when it starts, or once up front in thread mode.
+    """
+
+    def __init__(
+        self,
+        mode: str = "process",
+        workers: int | None = None,
+        tiling: Tiling | None = None,
+        engines: Sequence[DenoiseEngine] = (),
+    ) -> None:
+        self.mode = mode
+        self.workers: int = workers or os.cpu_count() or 1
+        self.tiling = tiling
+        self.engines = tuple(engines)
+        self._pool: Executor
+
+        if mode == "process":
+            # Workers must share the parent's tracker, otherwise each worker
+            # would unlink the output blocks it created when it exits.
+            resource_tracker.ensure_running()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_warm_up,
+                initargs=(self.engines,),
+            )
+        elif mode == "thread":
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="mlps-cpu"
+            )
+        else:
+            raise ValueError(f"Unknown CPU executor mode '{mode}'")
+
+    def warm_up(self) -> None:
+        """
+        Start the workers now, so model loading happens at startup rather
+        than on the first request.
+        """
+        if self.mode == "thread":
+            _warm_up(self.engines)
+            return
+        futures = [self._pool.submit(_ready) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    async def denoise(
+        self,
+        data: bytes | memoryview,
+        strength: float,
+        encoding: str = DEFAULT_ENCODING,
+        engine: DenoiseEngine | None = None,
+        timings: Timings | None = None,
+    ) -> bytes:
+        """
+        Denoise one encoded image. Per-stage seconds are appended to
+        `timings` when given.
+        """
+        outputs = await self._run(
+            _denoise_one,
+            [data],
+            strength,
+            self.tiling,
+            encoding,
+            engine,
+            timings=timings,
+        )
+        return outputs[0]
+
+    async def denoise_batch(
+        self,
+        frames: Sequence[bytes | memoryview],
+        strength: float,
+        temporal_radius: int = 0,
+        keep: tuple[int, int] | None = None,
+        encoding: str = DEFAULT_ENCODING,
+        engine: DenoiseEngine | None = None,
+        timings: Timings | None = None,
+    ) -> list[bytes]:
+        """See denoise_encoded_batch()."""
+        return await self._run(
+            denoise_encoded_batch,
+            frames,
+            strength,
+            temporal_radius,
+            keep,
+            self.tiling,
+            encoding,
+            engine,
+            timings=timings,
+        )
+
+    async def denoise_incremental(
+        self,
+        frames: Sequence[bytes | memoryview],
+        strength: float,
+        encoding: str = DEFAULT_ENCODING,
+        engine: DenoiseEngine | None = None,
+        timings: Timings | None = None,
+    ) -> list[bytes]:
+        """See denoise_encoded_incremental()."""
+        return await self._run(
+            denoise_encoded_incremental,
+            frames,
+            strength,
+            self.tiling,
+            encoding,
+            engine,
+            timings=timings,
+        )
+
+    async def preview(
+        self,
+        data: bytes | memoryview,
+        strength: float,
+        max_side: int,
+        encoding: str = PREVIEW_ENCODING,
+        engine: DenoiseEngine | None = None,
+        timings: Timings | None = None,
+    ) -> bytes:
+        """See denoise_encoded_preview()."""
+        outputs = await self._run(
+            _preview_one,
+            [data],
+            strength,
+            max_side,
+            encoding,
+            engine,
+            timings=timings,
+        )
+        return outputs[0]
+
+    async def preview_grid(
+        self,
+        frames: Sequence[bytes | memoryview],
+        strengths: Sequence[float],
+        cell_side: int,
+        encoding: str = PREVIEW_ENCODING,
+        engine: DenoiseEngine | None = None,
+        timings: Timings | None = None,
+    ) -> bytes:
+        """See preview_grid()."""
+        outputs = await self._run(
+            _preview_grid,
+            frames,
+            list(strengths),
+            cell_side,
+            encoding,
+            engine,
+            timings=timings,
+        )
+        return outputs[0]
+
+    async def _run(
+        self,
+        fn: Callable[..., list[bytes]],
+        frames: Sequence[bytes | memoryview],
+        *args: Any,
+        timings: Timings | None = None,
+    ) -> list[bytes]:
+        loop = asyncio.get_running_loop()
+        if self.mode == "thread":
+            return await loop.run_in_executor(self._pool, fn, frames, *args, timings)
+
+        shm_in, offsets = _to_shared(frames)
+        try:
+            future = self._pool.submit(_run_shared, fn, shm_in.name, offsets, *args)
+            try:
+                name, out_offsets, worker_timings = await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                # The worker may still finish; free its output when it does.
+                future.add_done_callback(_discard_shared)
+                raise
+        finally:
+            shm_in.close()
+            shm_in.unlink()
+        if timings is not None:
+            for stage, seconds in worker_timings.items():
+                timings.setdefault(stage, []).extend(seconds)
+        return _take_shared(name, out_offsets)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
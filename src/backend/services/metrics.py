@@ -0,0 +1,105 @@
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from backend.services.executor import Timings
+from backend.services.pipeline import Pipeline
+
+# Stage histograms are per frame: upload_read, decode, denoise, encode and
+# zip_write. Throughput is a counter; rate(mlps_megapixels_total[1m]) gives
+# megapixels per second.
+
+# Pipeline counters add up worker seconds per stage and state: busy, idle
+# (starved by the stage before) and blocked (held up by the stage after).
+# The stage with the highest busy share is the bottleneck.
+
+# Strength labels are the upper bound of the bucket a request falls in, so
+# label cardinality stays fixed whatever strengths clients send.
+
+# With several server workers (mlp-service --workers N) every worker writes
+# its samples under PROMETHEUS_MULTIPROC_DIR and /metrics merges them.
+_STRENGTH_BOUNDS = (0.0, 0.5, 1.0, 2.0, 3.0, 5.0)
+
+STAGE_SECONDS = Histogram(
+    "mlps_stage_seconds",
+    "Seconds spent per frame in each denoise stage.",
+    ["endpoint", "stage", "strength"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+FRAMES = Counter(
+    "mlps_frames_total",
+    "Frames returned, including result-cache hits.",
+    ["endpoint", "strength"],
+)
+MEGAPIXELS = Counter(
+    "mlps_megapixels_total",
+    "Megapixels returned; rate() gives throughput.",
+    ["endpoint", "strength"],
+)
+BYTES_IN = Counter("mlps_bytes_in_total", "Uploaded image bytes.", ["endpoint"])
+BYTES_OUT = Counter("mlps_bytes_out_total", "Response body bytes.", ["endpoint"])
+PIPELINE_SECONDS = Counter(
+    "mlps_pipeline_seconds",
+    "Worker seconds spent per pipeline stage, by state.",
+    ["endpoint", "stage", "state"],
+)
+IN_FLIGHT = Gauge(
+    "mlps_requests_in_flight",
+    "Denoise requests being served.",
+    ["endpoint", "strength"],
+    multiprocess_mode="livesum",
+)
+
+
+def render_metrics() -> bytes:
+    """Exposition text for this process, or for all workers when pre-forked."""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def strength_bucket(strength: float) -> str:
+    for bound in _STRENGTH_BOUNDS:
+        if strength <= bound:
+            return f"{bound:g}"
+    return "+Inf"
+
+
+def in_flight(endpoint: str, strength: float) -> Gauge:
+    """The in-flight gauge for one endpoint and strength bucket."""
+    return IN_FLIGHT.labels(endpoint, strength_bucket(strength))
+
+
+def observe_stage(endpoint: str, strength: float, stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(endpoint, stage, strength_bucket(strength)).observe(seconds)
+
+
+def observe_timings(endpoint: str, strength: float, timings: Timings) -> None:
+    bucket = strength_bucket(strength)
+    for stage, values in timings.items():
+        histogram = STAGE_SECONDS.labels(endpoint, stage, bucket)
+        for seconds in values:
+            histogram.observe(seconds)
+
+
+def observe_frame(endpoint: str, strength: float, size: tuple[int, int]) -> None:
+    bucket = strength_bucket(strength)
+    FRAMES.labels(endpoint, bucket).inc()
+    MEGAPIXELS.labels(endpoint, bucket).inc(size[0] * size[1] / 1_000_000)
+
+
+def observe_pipeline(endpoint: str, pipeline: Pipeline) -> None:
+    for stage, stats in pipeline.stats.items():
+        PIPELINE_SECONDS.labels(endpoint, stage, "busy").inc(stats.busy)
+        PIPELINE_SECONDS.labels(endpoint, stage, "idle").inc(stats.idle)
+        PIPELINE_SECONDS.labels(endpoint, stage, "blocked").inc(stats.blocked)
@@ -0,0 +1,187 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of a Pipeline. `workers` items go through `fn` at once. An
+    ordered stage sees items in source order and runs a single worker, for
+    steps such as appending to an archive.
+    """
+
+    name: str
+    fn: Callable[[Any], Awaitable[Any]]
+    workers: int = 1
+    ordered: bool = False
+
+
+@dataclass
+class StageStats:
+    """Seconds summed over a stage's workers."""
+
+    workers: int
+    items: int = 0
+    busy: float = 0.0
+    # Waiting for the previous stage.
+    idle: float = 0.0
+    # Waiting for room in the next stage's queue.
+    blocked: float = 0.0
+
+    def utilization(self, wall: float) -> float:
+        return self.busy / (self.workers * wall) if wall > 0 else 0.0
+
+
+class _Failure:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+_DONE = object()
+
+
+class Pipeline:
+    """
+    Runs items through stages connected by bounded queues, each stage with
+    its own number of workers, and yields results in source order.
+
+    At most `window` items are between the source and the consumer at any
+    time, which bounds memory whatever order stages finish items in. When a
+    stage raises, later stages skip that item and the consumer gets the
+    exception when it reaches the item's position; results before it are
+    still yielded. Closing the iterator early cancels all stages.
+
+    `stats` and `wall` are filled in while running, so the slowest stage
+    shows up as the one with the highest utilization and the rest as idle.
+    """
+
+    def __init__(
+        self, stages: list[Stage], queue_size: int = 2, window: int | None = None
+    ) -> None:
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        for stage in stages:
+            if stage.workers < 1:
+                raise ValueError(f"Stage '{stage.name}' needs at least one worker")
+            if stage.ordered and stage.workers != 1:
+                raise ValueError(f"Ordered stage '{stage.name}' must have one worker")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.window = window or sum(s.workers for s in stages) + queue_size * len(
+            stages
+        )
+        self.stats = {s.name: StageStats(s.workers) for s in stages}
+        self.wall = 0.0
+
+    async def run(self, items: Iterable[Any]) -> AsyncIterator[Any]:
+        queues: list[asyncio.Queue[Any]] = [
+            asyncio.Queue(self.queue_size) for _ in range(len(self.stages) + 1)
+        ]
+        window = asyncio.Semaphore(self.window)
+        tasks = [asyncio.create_task(self._feed(items, queues[0], window))]
+        for i, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            for _ in range(stage.workers):
+                tasks.append(
+                    asyncio.create_task(
+                        self._work(stage, queues[i], queues[i + 1], remaining)
+                    )
+                )
+
+        t0 = time.perf_counter()
+        held: dict[int, Any] = {}
+        next_seq = 0
+        try:
+            while True:
+                entry = await queues[-1].get()
+                if entry is _DONE:
+                    break
+                seq, result = entry
+                held[seq] = result
+                while next_seq in held:
+                    result = held.pop(next_seq)
+                    next_seq += 1
+                    if isinstance(result, _Failure):
+                        raise result.error
+                    yield result
+                    window.release()
+        finally:
+            self.wall = time.perf_counter() - t0
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _feed(
+        self,
+        items: Iterable[Any],
+        queue: "asyncio.Queue[Any]",
+        window: asyncio.Semaphore,
+    ) -> None:
+        seq = 0
+        try:
+            for item in items:
+                await window.acquire()
+                await queue.put((seq, item))
+                seq += 1
+        except Exception as e:  # noqa: BLE001 - re-raised by run(), in order
+            await window.acquire()
+            await queue.put((seq, _Failure(e)))
+        for _ in range(self.stages[0].workers):
+            await queue.put(_DONE)
+
+    async def _work(
+        self,
+        stage: Stage,
+        inbox: "asyncio.Queue[Any]",
+        outbox: "asyncio.Queue[Any]",
+        remaining: list[int],
+    ) -> None:
+        stats = self.stats[stage.name]
+        held: dict[int, Any] = {}
+        next_seq = 0
+        while True:
+            t0 = time.perf_counter()
+            entry = await inbox.get()
+            stats.idle += time.perf_counter() - t0
+            if entry is _DONE:
+                break
+            if not stage.ordered:
+                await self._process(stage, stats, *entry, outbox)
+                continue
+            held[entry[0]] = entry[1]
+            while next_seq in held:
+                await self._process(stage, stats, next_seq, held.pop(next_seq), outbox)
+                next_seq += 1
+
+        # The last worker of a stage to finish tells the next stage.
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            index = self.stages.index(stage)
+            followers = (
+                self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            )
+            for _ in range(followers):
+                await outbox.put(_DONE)
+
+    async def _process(
+        self,
+        stage: Stage,
+        stats: StageStats,
+        seq: int,
+        item: Any,
+        outbox: "asyncio.Queue[Any]",
+    ) -> None:
+        if not isinstance(item, _Failure):
+            t0 = time.perf_counter()
+            try:
+                item = await stage.fn(item)
+            except Exception as e:  # noqa: BLE001 - re-raised by run(), in order
+                item = _Failure(e)
+            stats.busy += time.perf_counter() - t0
+            stats.items += 1
+        t0 = time.perf_counter()
+        await outbox.put((seq, item))
+        stats.blocked += time.perf_counter() - t0
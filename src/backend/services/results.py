@@ -0,0 +1,142 @@
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO
+
+import structlog
+
+LOGGER = structlog.get_logger()
+
+_RESULT_ID = re.compile(r"[0-9a-f]{32}")
+
+
+@dataclass
+class StoredResult:
+    id: str
+    user_id: int
+    filename: str
+    media_type: str
+    bytes: int
+    created_at: float
+
+
+class ResultStore:
+    """
+    Finished outputs kept on local disk so they can be downloaded again,
+    or resumed with Range requests, without denoising anything.
+
+    Each result is <root>/<id>/data plus a result.json written once the
+    data is complete; a directory without one is still being written.
+    Results older than `ttl_seconds`, by created_at, are no longer
+    returned by get(). They are removed, and then the oldest until the
+    rest fit in `max_bytes`, whenever one is added.
+    """
+
+    def __init__(
+        self, root: str, ttl_seconds: float = 24 * 3600, max_bytes: int = 10 << 30
+    ) -> None:
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, result_id: str) -> Path:
+        return self.root / result_id
+
+    def data_path(self, result_id: str) -> Path:
+        return self._dir(result_id) / "data"
+
+    def create(
+        self, user_id: int, filename: str, media_type: str
+    ) -> tuple[StoredResult, IO[bytes]]:
+        """
+        A new result and the file to write its data to. It becomes visible
+        to get() once passed to finish(); discard() drops it instead.
+        """
+        result = StoredResult(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            filename=filename,
+            media_type=media_type,
+            bytes=0,
+            created_at=time.time(),
+        )
+        self._dir(result.id).mkdir()
+        return result, open(self.data_path(result.id), "wb")
+
+    def finish(self, result: StoredResult, f: IO[bytes]) -> None:
+        result.bytes = f.tell()
+        f.close()
+        path = self._dir(result.id)
+        tmp_path = path / "result.json.tmp"
+        tmp_path.write_text(json.dumps(asdict(result)))
+        os.replace(tmp_path, path / "result.json")
+        LOGGER.info("Result stored", result_id=result.id, bytes=result.bytes)
+        self.expire()
+
+    def discard(self, result: StoredResult, f: IO[bytes]) -> None:
+        f.close()
+        self.delete(result.id)
+
+    def get(self, result_id: str) -> StoredResult | None:
+        result = self._read(result_id)
+        if result is None or result.created_at < time.time() - self.ttl_seconds:
+            return None
+        return result
+
+    def _read(self, result_id: str) -> StoredResult | None:
+        """A finished result, expired or not."""
+        if not _RESULT_ID.fullmatch(result_id):
+            return None
+        try:
+            raw = (self._dir(result_id) / "result.json").read_text()
+        except FileNotFoundError:
+            return None
+        return StoredResult(**json.loads(raw))
+
+    def list(self, user_id: int) -> list[StoredResult]:
+        """A user's results, newest first."""
+        results = []
+        for path in self.root.iterdir():
+            result = self.get(path.name)
+            if result is not None and result.user_id == user_id:
+                results.append(result)
+        results.sort(key=lambda r: r.created_at, reverse=True)
+        return results
+
+    def delete(self, result_id: str) -> None:
+        shutil.rmtree(self._dir(result_id), ignore_errors=True)
+
+    def expire(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        stored = []
+        for path in self.root.iterdir():
+            result = self._read(path.name)
+            if result is not None:
+                created_at = result.created_at
+            else:
+                # Still being written, or abandoned mid-write.
+                try:
+                    created_at = path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+            if created_at < cutoff:
+                LOGGER.info("Result expired", result_id=path.name)
+                shutil.rmtree(path, ignore_errors=True)
+            elif result is not None:
+                stored.append(result)
+
+        # Results still being written are not counted, and the newest is
+        # kept even when it alone is over the limit.
+        total = sum(r.bytes for r in stored)
+        for result in sorted(stored, key=lambda r: r.created_at)[:-1]:
+            if total <= self.max_bytes:
+                break
+            LOGGER.info("Result evicted", result_id=result.id, bytes=result.bytes)
+            self.delete(result.id)
+            total -= result.bytes
@@ -0,0 +1,120 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import structlog
+
+LOGGER = structlog.get_logger()
+
+_UPLOAD_ID = re.compile(r"[0-9a-f]{32}")
+
+
+@dataclass
+class StagedUpload:
+    id: str
+    user_id: int
+    strength: float
+    encoding: str
+    engine: str
+    frames: list[str]
+    created_at: float
+
+    @property
+    def frames_total(self) -> int:
+        return len(self.frames)
+
+
+class StagingStore:
+    """
+    Upload sessions for sequences sent one frame per request.
+
+    Each frame is denoised when it arrives and only its encoded output is
+    kept, under <root>/<upload id>/<index>. Everything lives on disk, so
+    any server worker can take any request of a session, and a frame
+    counts as received once its output file exists. Sessions older than
+    `ttl_seconds` are removed when a new one is created.
+    """
+
+    def __init__(self, root: str, ttl_seconds: float = 24 * 3600) -> None:
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, upload_id: str) -> Path:
+        return self.root / upload_id
+
+    def output_path(self, upload_id: str, index: int) -> Path:
+        return self._dir(upload_id) / f"{index:06d}"
+
+    def create(
+        self,
+        user_id: int,
+        frames: list[str],
+        strength: float,
+        encoding: str,
+        engine: str,
+    ) -> StagedUpload:
+        self.expire()
+        upload = StagedUpload(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            strength=strength,
+            encoding=encoding,
+            engine=engine,
+            frames=frames,
+            created_at=time.time(),
+        )
+        path = self._dir(upload.id)
+        path.mkdir()
+        (path / "upload.json").write_text(json.dumps(asdict(upload)))
+        LOGGER.info("Upload session created", upload_id=upload.id, frames=len(frames))
+        return upload
+
+    def get(self, upload_id: str) -> StagedUpload | None:
+        if not _UPLOAD_ID.fullmatch(upload_id):
+            return None
+        try:
+            raw = (self._dir(upload_id) / "upload.json").read_text()
+        except FileNotFoundError:
+            return None
+        return StagedUpload(**json.loads(raw))
+
+    def put_output(self, upload_id: str, index: int, data: bytes) -> None:
+        path = self.output_path(upload_id, index)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def read_output(self, upload_id: str, index: int) -> bytes:
+        return self.output_path(upload_id, index).read_bytes()
+
+    def received(self, upload: StagedUpload) -> list[int]:
+        """Indices whose output is stored, ascending."""
+        try:
+            names = os.listdir(self._dir(upload.id))
+        except FileNotFoundError:
+            return []
+        return sorted(
+            int(name)
+            for name in names
+            if name.isdigit() and int(name) < upload.frames_total
+        )
+
+    def delete(self, upload_id: str) -> None:
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def expire(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for path in self.root.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    LOGGER.info("Upload session expired", upload_id=path.name)
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
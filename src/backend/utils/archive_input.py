@@ -0,0 +1,203 @@
+import posixpath
+import tarfile
+import zipfile
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import IO
+
+FRAME_EXTENSIONS = (".png",)
+
+# Entries smaller than this pass the ratio check whatever their compressed
+# size; tiny frames of flat colour legitimately deflate very well.
+_RATIO_FLOOR_BYTES = 1024 * 1024
+
+
+class ArchiveError(ValueError):
+    """The upload is not a readable ZIP or tar of frames."""
+
+
+class ArchiveLimitError(ArchiveError):
+    """An entry, or the archive as a whole, exceeds the configured limits."""
+
+
+@dataclass(frozen=True)
+class ArchiveLimits:
+    max_entries: int = 100_000
+    max_entry_bytes: int = 512 * 1024 * 1024
+    max_total_bytes: int = 8 * 1024 * 1024 * 1024
+    # Uncompressed bytes allowed per compressed byte.
+    max_ratio: int = 100
+
+
+def _frame_name(name: str) -> str | None:
+    """
+    Normalized entry name if the entry is a frame, None for entries to skip
+    (folders, other files, macOS metadata). Raises ArchiveError for names
+    that escape the archive root.
+    """
+    name = name.replace("\\", "/")
+    if name.endswith("/") or not name.lower().endswith(FRAME_EXTENSIONS):
+        return None
+    parts = name.split("/")
+    if parts[0] == "__MACOSX" or parts[-1].startswith("._"):
+        return None
+    if name.startswith("/") or ".." in parts:
+        raise ArchiveError(f"Unsafe entry name '{name}'")
+    return posixpath.normpath(name)
+
+
+def _read_entry(f: IO[bytes], name: str, limit: int) -> bytes:
+    """Reads at most limit bytes, whatever the entry header claims."""
+    data = f.read(limit + 1)
+    if len(data) > limit:
+        raise ArchiveLimitError(f"Entry '{name}' expands past {limit} bytes")
+    return data
+
+
+class FrameArchive:
+    """
+    Frames of an uploaded ZIP or tar (optionally gzip/bz2/xz compressed),
+    yielded one at a time as (name, bytes) in archive order.
+
+    Entries are decompressed lazily from the upload, so only the current
+    frame is held in memory. Entry sizes are enforced on the bytes actually
+    read, not on sizes declared in headers.
+    """
+
+    def __init__(self, fileobj: IO[bytes], size: int, limits: ArchiveLimits) -> None:
+        self.limits = limits
+        self._fileobj = fileobj
+        self._size = size
+        self._zip: zipfile.ZipFile | None = None
+        self._tar: tarfile.TarFile | None = None
+        self._zip_entries: list[tuple[zipfile.ZipInfo, str]] = []
+
+        fileobj.seek(0)
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            try:
+                self._zip = zipfile.ZipFile(fileobj)
+            except zipfile.BadZipFile as e:
+                raise ArchiveError(str(e)) from e
+            self._check_zip()
+            return
+        self._tar = self._open_tar()
+
+    def _open_tar(self) -> tarfile.TarFile:
+        # Stream mode can only be read through once; headers() reopens it.
+        self._fileobj.seek(0)
+        try:
+            return tarfile.open(fileobj=self._fileobj, mode="r|*")
+        except tarfile.TarError as e:
+            raise ArchiveError("Upload is not a ZIP or tar archive") from e
+
+    def _check_zip(self) -> None:
+        """Rejects what the central directory already gives away."""
+        assert self._zip is not None
+        total = 0
+        for info in self._zip.infolist():
+            name = _frame_name(info.filename)
+            if name is None:
+                continue
+            self._check_entry(name, info.file_size, len(self._zip_entries))
+            total += info.file_size
+            if total > self.limits.max_total_bytes:
+                raise ArchiveLimitError(
+                    f"Archive expands past {self.limits.max_total_bytes} bytes"
+                )
+            if (
+                info.file_size > _RATIO_FLOOR_BYTES
+                and info.file_size > self.limits.max_ratio * info.compress_size
+            ):
+                raise ArchiveLimitError(
+                    f"Entry '{name}' has a compression ratio above "
+                    f"{self.limits.max_ratio}"
+                )
+            self._zip_entries.append((info, name))
+
+    def _check_entry(self, name: str, size: int, count: int) -> None:
+        """count is the number of frames before this one."""
+        if count >= self.limits.max_entries:
+            raise ArchiveLimitError(
+                f"Archive has more than {self.limits.max_entries} frames"
+            )
+        if size > self.limits.max_entry_bytes:
+            raise ArchiveLimitError(
+                f"Entry '{name}' is {size} bytes, limit is "
+                f"{self.limits.max_entry_bytes} bytes"
+            )
+
+    def __iter__(self) -> Iterator[tuple[str, bytes]]:
+        if self._zip is not None:
+            return self._iter_zip()
+        return self._iter_tar()
+
+    def headers(self, size: int) -> Iterator[tuple[str, bytes]]:
+        """
+        The first `size` bytes of every frame, in archive order and under
+        the same limits as iteration, without holding whole frames. Used to
+        check frames before any output is produced; must be exhausted
+        before the archive is iterated.
+        """
+        if self._zip is not None:
+            yield from self._iter_zip(size)
+            return
+        try:
+            yield from self._iter_tar(size)
+        finally:
+            assert self._tar is not None
+            self._tar.close()
+            self._tar = self._open_tar()
+
+    def _iter_zip(self, head: int | None = None) -> Iterator[tuple[str, bytes]]:
+        assert self._zip is not None
+        for info, name in self._zip_entries:
+            limit = min(
+                self.limits.max_entry_bytes,
+                max(_RATIO_FLOOR_BYTES, self.limits.max_ratio * info.compress_size),
+            )
+            try:
+                with self._zip.open(info) as f:
+                    if head is not None:
+                        data = f.read(head)
+                    else:
+                        data = _read_entry(f, name, limit)
+            except (zipfile.BadZipFile, zlib.error, EOFError, OSError) as e:
+                raise ArchiveError(f"Failed to read entry '{name}': {e}") from e
+            yield name, data
+
+    def _iter_tar(self, head: int | None = None) -> Iterator[tuple[str, bytes]]:
+        # Compressed tars carry no per-entry sizes, so the ratio applies to
+        # the whole archive.
+        assert self._tar is not None
+        budget = min(
+            self.limits.max_total_bytes,
+            max(_RATIO_FLOOR_BYTES, self.limits.max_ratio * self._size),
+        )
+        total = 0
+        count = 0
+        try:
+            for member in self._tar:
+                total += member.size
+                if total > budget:
+                    raise ArchiveLimitError(f"Archive expands past {budget} bytes")
+                name = _frame_name(member.name) if member.isfile() else None
+                if name is None:
+                    continue
+                self._check_entry(name, member.size, count)
+                f = self._tar.extractfile(member)
+                assert f is not None
+                count += 1
+                if head is not None:
+                    yield name, f.read(head)
+                else:
+                    yield name, _read_entry(f, name, member.size)
+        except (tarfile.TarError, zlib.error, EOFError, OSError) as e:
+            raise ArchiveError(f"Failed to read archive: {e}") from e
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
@@ -0,0 +1,29 @@
+_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_mb",
+    "Shared_Dirty": "shared_mb",
+    "Private_Clean": "private_mb",
+    "Private_Dirty": "private_mb",
+}
+
+
+def memory_usage(pid: int | str = "self") -> dict[str, float]:
+    """
+    Resident memory of a process in MB: rss, pss (shared pages split
+    between the processes mapping them), shared and private. After a
+    pre-fork, pages still shared with the parent count under shared_mb.
+    Empty where /proc/<pid>/smaps_rollup is unavailable (non-Linux).
+    """
+    usage: dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return usage
+    for line in lines:
+        field, _, rest = line.partition(":")
+        name = _FIELDS.get(field)
+        if name is not None:
+            usage[name] = usage.get(name, 0.0) + int(rest.split()[0]) / 1024
+    return {name: round(value, 1) for name, value in usage.items()}
@@ -0,0 +1,59 @@
+import os
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+# Headers a 304 repeats from the full response.
+_NOT_MODIFIED_HEADERS = ("etag", "last-modified", "cache-control")
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 asks for If-None-Match.
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def _not_modified(request: Request, response: FileResponse, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, response.headers["etag"])
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+def file_response(
+    request: Request,
+    path: str | Path,
+    media_type: str | None = None,
+    filename: str | None = None,
+) -> Response:
+    """
+    FileResponse that also answers conditional GETs with 304. Range and
+    If-Range requests are handled by FileResponse itself, and the body is
+    sent with sendfile when the server supports it, otherwise streamed in
+    chunks; the file is never read into memory whole.
+    """
+    stat_result = os.stat(path)
+    response = FileResponse(
+        path, media_type=media_type, filename=filename, stat_result=stat_result
+    )
+    if request.method in ("GET", "HEAD") and _not_modified(
+        request, response, stat_result.st_mtime
+    ):
+        headers = {
+            key: response.headers[key]
+            for key in _NOT_MODIFIED_HEADERS
+            if key in response.headers
+        }
+        return Response(status_code=304, headers=headers)
+    return response
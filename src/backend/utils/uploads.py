@@ -0,0 +1,164 @@
+import io
+import mmap
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import IO, Any
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from PIL import Image
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.config import MLServiceConfig
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only, seekable file over a bytes-like object. Unlike io.BytesIO it
+    never copies the whole buffer, which matters for memoryviews over
+    mmaps and shared memory. close() releases the underlying view.
+    """
+
+    def __init__(self, data: bytes | memoryview) -> None:
+        super().__init__()
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+@contextmanager
+def upload_buffer(file: IO[bytes]) -> Iterator[bytes | memoryview]:
+    """
+    Contents of a spooled upload without an extra copy where possible.
+
+    Uploads that rolled over to disk are memory-mapped; small ones still in
+    memory are read out, which costs at most the spool threshold. The
+    buffer must not be used after the block exits.
+    """
+    fd = None
+    if getattr(file, "_rolled", True):
+        try:
+            fd = file.fileno()
+        except OSError:
+            pass
+    if fd is None:
+        file.seek(0)
+        yield file.read()
+        return
+
+    file.flush()
+    try:
+        mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files cannot be mapped.
+        yield b""
+        return
+    view = memoryview(mm)
+    try:
+        yield view
+    finally:
+        view.release()
+        try:
+            mm.close()
+        except BufferError:
+            # Still referenced by a decode that outlived a cancelled
+            # request; the map is closed once that finishes.
+            pass
+
+
+# Room for multipart boundaries and part headers on top of the file bytes.
+_MULTIPART_SLACK = 1024 * 1024
+
+
+class RequestSizeMiddleware:
+    """
+    Answers 413 to requests whose Content-Length is over the request
+    budget before any of the body is read, so that an oversized upload is
+    not spooled to disk first. Chunked bodies carry no length; they are
+    caught by check_upload_bytes() once parsed, or while being read.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if length.isdigit() and int(length) > self.max_bytes + _MULTIPART_SLACK:
+                response = JSONResponse(
+                    {
+                        "detail": f"Request is {int(length)} bytes, "
+                        f"limit is {self.max_bytes} bytes."
+                    },
+                    status_code=413,
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def check_upload_bytes(config: MLServiceConfig, files: list[UploadFile]) -> None:
+    total = sum(f.size or 0 for f in files)
+    limit = config.max_request_mb * 1024 * 1024
+    if total > limit:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload is {total} bytes, limit is {limit} bytes.",
+        )
+
+
+def check_upload_pixels(config: MLServiceConfig, sizes: list[tuple[int, int]]) -> None:
+    total = sum(w * h for w, h in sizes)
+    limit = config.max_request_megapixels * 1_000_000
+    if total > limit:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload is {total} pixels, limit is {limit} pixels.",
+        )
+
+
+def probe_uploads(files: list[UploadFile]) -> list[tuple[int, int]]:
+    """Reads only image headers; returns each frame's size."""
+    sizes = []
+    for f in files:
+        f.file.seek(0)
+        try:
+            with Image.open(f.file) as img:
+                sizes.append(img.size)
+        except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+            raise HTTPException(
+                status_code=400, detail=f"Failed to read image {f.filename}: {e}"
+            )
+        finally:
+            f.file.seek(0)
+    return sizes
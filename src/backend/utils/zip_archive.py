@@ -1,27 +1,172 @@
+import time
 import zipfile
-from zipfile import ZipFile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import IO, Any
+from zipfile import ZipFile, ZipInfo
+
+import structlog
+
+LOGGER = structlog.get_logger()
+
+# Compression types the parallel mode can produce itself.
+PARALLEL_COMPRESSION = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+
+# Undocumented ZipFile attributes that _write_compressed() relies on. They
+# are unchanged from 3.10 to 3.13; tests/test_zip_archive.py fails on a
+# Python without them, and ZipArchive falls back to serial mode there.
+_ZIPFILE_INTERNALS = ("fp", "start_dir", "_seekable", "_writecheck", "_didModify")
+
+
+def denoised_arcname(filename: str | None, extension: str = ".png") -> str:
+    """Archive name for a denoised frame: denoised/<path><extension>"""
+    name = (filename or "frame.png").replace("\\", "/")
+    arcname = "denoised/" + name
+    return arcname.rsplit(".", 1)[0] + extension
+
+
+def _has_zipfile_internals(zf: ZipFile) -> bool:
+    return all(hasattr(zf, name) for name in _ZIPFILE_INTERNALS)
+
+
+def _needs_zip64(zinfo: ZipInfo) -> bool:
+    """ZipFile._open_to_write's choice, which allows 5% for compression."""
+    return (
+        zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+        or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    )
+
+
+def _compress(data: bytes, compress_type: int) -> tuple[bytes, int]:
+    """Entry payload and CRC; zlib releases the GIL for both."""
+    crc = zlib.crc32(data)
+    if compress_type == zipfile.ZIP_STORED:
+        return data, crc
+    # Raw deflate stream, no zlib header, as ZIP expects.
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), crc
 
 
 class ZipArchive:
     def __init__(
-        self, out_zip_path: str, compression: Any = zipfile.ZIP_DEFLATED
+        self,
+        out_zip_path: str | None = None,
+        compression: Any = zipfile.ZIP_DEFLATED,
+        fileobj: IO[bytes] | None = None,
+        workers: int = 0,
+        max_pending: int | None = None,
     ) -> None:
-        self.out_zip_path: Path = Path(out_zip_path)
-        self.out_zip_path.parent.mkdir(parents=True, exist_ok=True)
+        """
+        Writes to out_zip_path, or to fileobj when given. fileobj does not
+        need to be seekable: entries then carry data descriptors.
+
+        With workers > 0, entries are compressed on that many threads and
+        written in the order they were added, once their compression is
+        done. At most max_pending entries (default 2 * workers) wait for
+        compression; adding another blocks until the oldest is written.
+        Only ZIP_STORED and ZIP_DEFLATED are supported in this mode.
+        """
+        if (out_zip_path is None) == (fileobj is None):
+            raise ValueError("Pass exactly one of out_zip_path or fileobj")
+        if workers < 0:
+            raise ValueError(f"workers must be >= 0, got {workers}")
+        if workers and compression not in PARALLEL_COMPRESSION:
+            raise ValueError("Parallel mode supports ZIP_STORED and ZIP_DEFLATED")
+
+        self.out_zip_path: Path | None = None
         self.compression: Any = compression
+        if out_zip_path is not None:
+            self.out_zip_path = Path(out_zip_path)
+            self.out_zip_path.parent.mkdir(parents=True, exist_ok=True)
+            target: Any = self.out_zip_path
+        else:
+            target = fileobj
         self._zip: ZipFile = zipfile.ZipFile(
-            file=self.out_zip_path, mode="w", compression=self.compression
+            file=target, mode="w", compression=self.compression
         )
 
+        if workers and not _has_zipfile_internals(self._zip):
+            LOGGER.warning("zipfile internals changed, compressing serially")
+            workers = 0
+
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending: deque[tuple[ZipInfo, Future[tuple[bytes, int]]]] = deque()
+        self._max_pending = max(1, max_pending or 2 * workers)
+        if workers:
+            self._pool = ThreadPoolExecutor(workers, thread_name_prefix="zip")
+
     def add_file(self, filename: str, arcname: str | None = None) -> None:
         arcname = arcname or Path(filename).name
-        self._zip.write(filename, arcname)
+        if self._pool is None:
+            self._zip.write(filename, arcname)
+            return
+        zinfo = ZipInfo.from_file(filename, arcname)
+        zinfo.compress_type = self.compression
+        self._submit(zinfo, Path(filename).read_bytes())
+
+    def add_bytes(
+        self, arcname: str, data: bytes, compress_type: int | None = None
+    ) -> None:
+        """compress_type overrides the archive's default for this entry."""
+        if self._pool is None:
+            self._zip.writestr(arcname, data, compress_type=compress_type)
+            return
+        zinfo = ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+        zinfo.compress_type = (
+            self.compression if compress_type is None else compress_type
+        )
+        zinfo.external_attr = 0o600 << 16
+        self._submit(zinfo, data)
+
+    def _submit(self, zinfo: ZipInfo, data: bytes) -> None:
+        if zinfo.compress_type not in PARALLEL_COMPRESSION:
+            raise ValueError("Parallel mode supports ZIP_STORED and ZIP_DEFLATED")
+        assert self._pool is not None
+        zinfo.file_size = len(data)
+        self._pending.append(
+            (zinfo, self._pool.submit(_compress, data, zinfo.compress_type))
+        )
+        while len(self._pending) > self._max_pending:
+            self._write_oldest()
+
+    def flush(self) -> None:
+        """Writes every entry added so far to the output."""
+        while self._pending:
+            self._write_oldest()
+
+    def _write_oldest(self) -> None:
+        zinfo, future = self._pending.popleft()
+        payload, zinfo.CRC = future.result()
+        zinfo.compress_size = len(payload)
+        self._write_compressed(zinfo, payload)
 
-    def add_bytes(self, arcname: str, data: bytes) -> None:
-        self._zip.writestr(arcname, data)
+    def _write_compressed(self, zinfo: ZipInfo, payload: bytes) -> None:
+        # ZipFile has no public call for adding an already compressed entry;
+        # this mirrors ZipFile._open_to_write and _ZipWriteFile.close. With
+        # sizes and CRC known up front the local header is final, so no
+        # data descriptor or seek is needed, even on non-seekable outputs.
+        zf = self._zip
+        zip64 = _needs_zip64(zinfo)
+        if zf._seekable:  # type: ignore[attr-defined]
+            zf.fp.seek(zf.start_dir)  # type: ignore[union-attr]
+        zinfo.header_offset = zf.fp.tell()  # type: ignore[union-attr]
+        zf._writecheck(zinfo)  # type: ignore[attr-defined]
+        zf._didModify = True  # type: ignore[attr-defined]
+        zf.fp.write(zinfo.FileHeader(zip64))  # type: ignore[union-attr]
+        zf.fp.write(payload)  # type: ignore[union-attr]
+        zf.start_dir = zf.fp.tell()  # type: ignore[union-attr]
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
 
-    def close(self) -> Path:
-        self._zip.close()
+    def close(self) -> Path | None:
+        try:
+            self.flush()
+            self._zip.close()
+        finally:
+            if self._pool is not None:
+                for _, future in self._pending:
+                    future.cancel()
+                self._pool.shutdown()
         return self.out_zip_path
@@ -0,0 +1,61 @@
+import zipfile
+from typing import Any
+
+from backend.utils.zip_archive import ZipArchive
+
+
+class _ChunkSink:
+    """Write-only, non-seekable target that hands back what was written."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+class ZipStream:
+    """
+    Builds a ZIP archive incrementally for streaming responses.
+
+    Each call returns the bytes produced so far, so only the current entry
+    is ever held in memory. Entries are written with data descriptors and
+    the output never has to be seekable.
+
+    With workers > 0 entries are compressed in parallel (see ZipArchive),
+    and a call returns the entries that have finished by then; up to
+    max_pending entries are held until later calls or close().
+    """
+
+    def __init__(
+        self,
+        compression: Any = zipfile.ZIP_DEFLATED,
+        workers: int = 0,
+        max_pending: int | None = None,
+    ) -> None:
+        self._sink = _ChunkSink()
+        self._archive = ZipArchive(
+            compression=compression,
+            fileobj=self._sink,
+            workers=workers,
+            max_pending=max_pending,
+        )
+
+    def add_bytes(
+        self, arcname: str, data: bytes, compress_type: int | None = None
+    ) -> bytes:
+        self._archive.add_bytes(arcname, data, compress_type)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._archive.close()
+        return self._sink.drain()
@@ -0,0 +1,257 @@
+import json
+import shutil
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import structlog
+
+LOGGER = structlog.get_logger()
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    user_id: int
+    status: str
+    strength: float
+    frames: list[str]
+    frames_done: int
+    attempts: int
+    error: str | None
+    created_at: float
+    updated_at: float
+
+    @property
+    def frames_total(self) -> int:
+        return len(self.frames)
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by the web app and worker processes.
+
+    Workers claim jobs with a lease. A job whose lease expired (the worker
+    died or hung) is handed to the next worker, which resumes from
+    frames_done. Finished jobs older than `ttl_seconds` are removed, with
+    their files, whenever a job is enqueued.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(
+        self, db_path: str, jobs_dir: str, ttl_seconds: float = 24 * 3600
+    ) -> None:
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        with self._sql_connect() as connect:
+            connect.execute("PRAGMA journal_mode=WAL")
+            connect.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    strength REAL NOT NULL,
+                    frames TEXT NOT NULL,
+                    frames_done INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            connect.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at)"
+            )
+
+    def _sql_connect(self) -> sqlite3.Connection:
+        # Autocommit mode; claim() opens its own write transaction.
+        return sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def input_path(self, job_id: str, index: int) -> Path:
+        return self.job_dir(job_id) / "input" / f"{index:06d}"
+
+    def output_path(self, job_id: str, index: int) -> Path:
+        return self.job_dir(job_id) / "output" / f"{index:06d}.png"
+
+    def result_path(self, job_id: str) -> Path:
+        return self.job_dir(job_id) / "result.zip"
+
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def enqueue(
+        self, job_id: str, user_id: int, strength: float, frames: list[str]
+    ) -> None:
+        """Frame inputs must already be stored at input_path()."""
+        self.expire()
+        now = time.time()
+        with self._sql_connect() as connect:
+            connect.execute(
+                "INSERT INTO jobs(id, user_id, status, strength, frames, created_at, "
+                "updated_at) VALUES(?,?,?,?,?,?,?)",
+                (job_id, user_id, JOB_QUEUED, strength, json.dumps(frames), now, now),
+            )
+        LOGGER.info("Job enqueued", job_id=job_id, user_id=user_id, frames=len(frames))
+
+    def get(self, job_id: str) -> Job | None:
+        with self._sql_connect() as connect:
+            row = connect.execute(
+                "SELECT id, user_id, status, strength, frames, frames_done, attempts, "
+                "error, created_at, updated_at FROM jobs WHERE id=?",
+                (job_id,),
+            ).fetchone()
+        if not row:
+            return None
+        return _row_to_job(row)
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Job | None:
+        """
+        Take the oldest queued job, or a running job whose lease expired.
+        Returns None when there is nothing to do.
+        """
+        now = time.time()
+        connect = self._sql_connect()
+        try:
+            connect.execute("BEGIN IMMEDIATE")
+            row = connect.execute(
+                "SELECT id, user_id, status, strength, frames, frames_done, attempts, "
+                "error, created_at, updated_at FROM jobs "
+                "WHERE status=? OR (status=? AND lease_expires_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (JOB_QUEUED, JOB_RUNNING, now),
+            ).fetchone()
+            if not row:
+                connect.execute("COMMIT")
+                return None
+
+            job = _row_to_job(row)
+            if job.attempts >= self.MAX_ATTEMPTS:
+                connect.execute(
+                    "UPDATE jobs SET status=?, error=?, lease_owner=NULL, "
+                    "updated_at=? WHERE id=?",
+                    (JOB_FAILED, "Too many attempts", now, job.id),
+                )
+                connect.execute("COMMIT")
+                LOGGER.warning("Job abandoned", job_id=job.id, attempts=job.attempts)
+                return self.claim(worker_id, lease_seconds)
+
+            connect.execute(
+                "UPDATE jobs SET status=?, attempts=attempts+1, lease_owner=?, "
+                "lease_expires_at=?, updated_at=? WHERE id=?",
+                (JOB_RUNNING, worker_id, now + lease_seconds, now, job.id),
+            )
+            connect.execute("COMMIT")
+        except BaseException:
+            if connect.in_transaction:
+                connect.execute("ROLLBACK")
+            raise
+        finally:
+            connect.close()
+
+        job.status = JOB_RUNNING
+        job.attempts += 1
+        LOGGER.info(
+            "Job claimed",
+            job_id=job.id,
+            worker_id=worker_id,
+            frames_done=job.frames_done,
+            attempts=job.attempts,
+        )
+        return job
+
+    def record_progress(
+        self, job_id: str, worker_id: str, frames_done: int, lease_seconds: float
+    ) -> bool:
+        """
+        Persist progress and extend the lease. Returns False if the lease
+        was lost to another worker.
+        """
+        now = time.time()
+        with self._sql_connect() as connect:
+            cursor = connect.execute(
+                "UPDATE jobs SET frames_done=?, lease_expires_at=?, updated_at=? "
+                "WHERE id=? AND lease_owner=? AND status=?",
+                (frames_done, now + lease_seconds, now, job_id, worker_id, JOB_RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def renew_lease(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extend the lease only. Returns False if it was lost."""
+        now = time.time()
+        with self._sql_connect() as connect:
+            cursor = connect.execute(
+                "UPDATE jobs SET lease_expires_at=?, updated_at=? "
+                "WHERE id=? AND lease_owner=? AND status=?",
+                (now + lease_seconds, now, job_id, worker_id, JOB_RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str) -> bool:
+        return self._finish(job_id, worker_id, JOB_DONE, None)
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        return self._finish(job_id, worker_id, JOB_FAILED, error)
+
+    def _finish(
+        self, job_id: str, worker_id: str, status: str, error: str | None
+    ) -> bool:
+        with self._sql_connect() as connect:
+            cursor = connect.execute(
+                "UPDATE jobs SET status=?, error=?, lease_owner=NULL, "
+                "lease_expires_at=NULL, updated_at=? "
+                "WHERE id=? AND lease_owner=? AND status=?",
+                (status, error, time.time(), job_id, worker_id, JOB_RUNNING),
+            )
+        LOGGER.info("Job finished", job_id=job_id, status=status, error=error)
+        return cursor.rowcount == 1
+
+    def expire(self) -> None:
+        """Remove done and failed jobs not updated for ttl_seconds."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._sql_connect() as connect:
+            job_ids = [
+                str(row[0])
+                for row in connect.execute(
+                    "SELECT id FROM jobs WHERE status IN (?,?) AND updated_at < ?",
+                    (JOB_DONE, JOB_FAILED, cutoff),
+                )
+            ]
+            connect.executemany(
+                "DELETE FROM jobs WHERE id=?", [(job_id,) for job_id in job_ids]
+            )
+        for job_id in job_ids:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        if job_ids:
+            LOGGER.info("Jobs expired", jobs=len(job_ids))
+
+
+def _row_to_job(row: tuple) -> Job:
+    return Job(
+        id=str(row[0]),
+        user_id=int(row[1]),
+        status=str(row[2]),
+        strength=float(row[3]),
+        frames=list(json.loads(row[4])),
+        frames_done=int(row[5]),
+        attempts=int(row[6]),
+        error=row[7],
+        created_at=float(row[8]),
+        updated_at=float(row[9]),
+    )
@@ -0,0 +1,202 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import structlog
+
+from backend.config import MLServiceConfig
+from backend.services.denoise.tiled import Tiling
+from backend.services.encoding import DEFAULT_ENCODING, get_profile
+from backend.services.executor import denoise_encoded
+from backend.utils.zip_archive import ZipArchive, denoised_arcname
+from taskmanager.job_queue import Job, JobQueue
+
+LOGGER = structlog.get_logger()
+
+
+@contextmanager
+def _lease_heartbeat(
+    queue: JobQueue, job_id: str, worker_id: str, lease_seconds: float
+) -> Iterator[threading.Event]:
+    """
+    Renews a job's lease from a background thread, three times per lease,
+    so a slow chunk or a single huge frame does not let it run out while
+    the job is still being worked on. The event yielded is set once
+    another worker has taken the job over.
+    """
+    lost = threading.Event()
+    stop = threading.Event()
+
+    def beat() -> None:
+        while not stop.wait(lease_seconds / 3):
+            try:
+                renewed = queue.renew_lease(job_id, worker_id, lease_seconds)
+            except sqlite3.Error:
+                # Retried on the next beat, well before the lease runs out.
+                LOGGER.warning("Lease renewal failed", job_id=job_id, exc_info=True)
+                continue
+            if not renewed:
+                lost.set()
+                return
+
+    thread = threading.Thread(target=beat, name=f"lease-{job_id[:8]}", daemon=True)
+    if lease_seconds > 0:
+        thread.start()
+    try:
+        yield lost
+    finally:
+        stop.set()
+        if thread.is_alive():
+            thread.join()
+
+
+class Worker:
+    """
+    Pulls sequence jobs from the queue and denoises them chunk by chunk.
+
+    Every finished frame is written to disk before progress is recorded, so
+    a job picked up after a crash continues from the last recorded chunk.
+    The lease is kept alive by a heartbeat while the job is processed, not
+    only at chunk boundaries.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        lease_seconds: float = 60.0,
+        chunk_frames: int = 16,
+        poll_interval: float = 1.0,
+        tiling: Tiling | None = None,
+        zip_workers: int = 0,
+    ) -> None:
+        self.queue = queue
+        self.tiling = tiling
+        self.zip_workers = zip_workers
+        self.lease_seconds = lease_seconds
+        self.chunk_frames = chunk_frames
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def run_forever(self) -> None:
+        LOGGER.info("Worker started", worker_id=self.worker_id)
+        while True:
+            if not self.run_once():
+                time.sleep(self.poll_interval)
+
+    def run_once(self) -> bool:
+        """Process one job if there is one. Returns False when idle."""
+        job = self.queue.claim(self.worker_id, self.lease_seconds)
+        if job is None:
+            return False
+        try:
+            self.process(job)
+        except Exception as e:
+            LOGGER.exception("Job failed", job_id=job.id)
+            self.queue.fail(job.id, self.worker_id, str(e))
+        return True
+
+    def process(self, job: Job) -> None:
+        with _lease_heartbeat(
+            self.queue, job.id, self.worker_id, self.lease_seconds
+        ) as lease_lost:
+            done = job.frames_done
+            while done < job.frames_total:
+                chunk_end = min(done + self.chunk_frames, job.frames_total)
+                for index in range(done, chunk_end):
+                    if lease_lost.is_set():
+                        break
+                    self._process_frame(job, index)
+                done = chunk_end
+                if lease_lost.is_set() or not self.queue.record_progress(
+                    job.id, self.worker_id, done, self.lease_seconds
+                ):
+                    LOGGER.warning(
+                        "Lease lost", job_id=job.id, worker_id=self.worker_id
+                    )
+                    return
+
+            self._write_result(job)
+        if self.queue.complete(job.id, self.worker_id):
+            # result.zip holds every output; the frames are not needed again.
+            for path in (
+                self.queue.input_path(job.id, 0),
+                self.queue.output_path(job.id, 0),
+            ):
+                shutil.rmtree(path.parent, ignore_errors=True)
+
+    def _process_frame(self, job: Job, index: int) -> None:
+        out_path = self.queue.output_path(job.id, index)
+        if out_path.exists():
+            return
+        data = self.queue.input_path(job.id, index).read_bytes()
+        png = denoise_encoded(data, job.strength, self.tiling)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = out_path.with_suffix(".tmp")
+        tmp_path.write_bytes(png)
+        os.replace(tmp_path, out_path)
+
+    def _write_result(self, job: Job) -> None:
+        result_path = self.queue.result_path(job.id)
+        tmp_path = result_path.with_suffix(".tmp")
+        archive = ZipArchive(
+            str(tmp_path),
+            compression=get_profile(DEFAULT_ENCODING).zip_compression,
+            workers=self.zip_workers,
+        )
+        for index, name in enumerate(job.frames):
+            archive.add_file(
+                str(self.queue.output_path(job.id, index)), denoised_arcname(name)
+            )
+        archive.close()
+        os.replace(tmp_path, result_path)
+
+
+def _worker_main(config: MLServiceConfig, poll_interval: float) -> None:
+    queue = JobQueue(config.jobs_db_path, config.jobs_dir)
+    Worker(
+        queue,
+        lease_seconds=config.job_lease_seconds,
+        chunk_frames=config.job_chunk_frames,
+        poll_interval=poll_interval,
+        tiling=Tiling(
+            tile_size=config.tile_size,
+            threshold_pixels=config.tile_threshold_pixels,
+            workers=config.tile_workers,
+        ),
+        zip_workers=config.zip_workers,
+    ).run_forever()
+
+
+def run_worker() -> None:
+    p = argparse.ArgumentParser(description="Process queued denoise jobs.")
+    p.add_argument("--processes", type=int, default=1)
+    p.add_argument("--poll-interval", type=float, default=1.0)
+    args = p.parse_args()
+
+    config = MLServiceConfig(dotenv=True)
+    if args.processes <= 1:
+        _worker_main(config, args.poll_interval)
+        return
+
+    procs = [
+        multiprocessing.Process(
+            target=_worker_main, args=(config, args.poll_interval), daemon=False
+        )
+        for _ in range(args.processes)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+
+
+if __name__ == "__main__":
+    run_worker()
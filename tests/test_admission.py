@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from backend.services.admission import AdmissionController, AdmissionRejected
+
+
+def test_waiters_are_admitted_in_order() -> None:
+    async def run() -> list[str]:
+        controller = AdmissionController(100, max_waiting=2, wait_timeout=5)
+        first = await controller.admit("a", 80)
+        order = []
+
+        async def wait(user: str, pixels: int) -> None:
+            granted = await controller.admit(user, pixels)
+            order.append(user)
+            granted.release()
+
+        tasks = [
+            asyncio.create_task(wait("b", 50)),
+            asyncio.create_task(wait("c", 10)),
+        ]
+        await asyncio.sleep(0)
+        assert controller.stats()["waiting"] == 2
+        with pytest.raises(AdmissionRejected) as e:
+            await controller.admit("d", 10)
+        assert e.value.status_code == 503
+
+        first.release()
+        await asyncio.gather(*tasks)
+        assert controller.stats()["in_flight_pixels"] == 0
+        return order
+
+    assert asyncio.run(run()) == ["b", "c"]
+
+
+def test_wait_timeout_and_user_cap() -> None:
+    async def run() -> None:
+        controller = AdmissionController(
+            100, max_waiting=4, wait_timeout=0.01, user_pixels=60, retry_after=7
+        )
+        # Oversized requests are clamped to the capacity and run alone.
+        big = await controller.admit("a", 1_000)
+        with pytest.raises(AdmissionRejected) as e:
+            await controller.admit("b", 10)
+        assert (e.value.status_code, e.value.retry_after) == (503, 7)
+
+        with pytest.raises(AdmissionRejected) as e:
+            await controller.admit("a", 10)
+        assert e.value.status_code == 429
+        big.release()
+
+        stats = controller.stats()
+        assert stats["rejected_timeout"] == 1
+        assert stats["rejected_user"] == 1
+        assert stats["waiting"] == stats["in_flight_pixels"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.formparsers import MultiPartParser
+
+from backend.app import create_app
+from backend.config import MLServiceConfig
+from backend.resources import Resources
+
+
+def test_lifespan_opens_and_closes_resources(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("MLPS_AUTH_SESSION_SECRET", "secret")
+    monkeypatch.setenv("MLPS_DB_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setenv("MLPS_CPU_EXECUTOR", "thread")
+    monkeypatch.setenv("MLPS_UPLOAD_SPOOL_KB", "64")
+    monkeypatch.setenv("MLPS_CPU_WORKERS", "4")
+    monkeypatch.setenv("MLPS_TILE_WORKERS", "6")
+    monkeypatch.setattr(MultiPartParser, "spool_max_size", 1024 * 1024)
+    app = create_app(MLServiceConfig())
+    # Nothing is opened, or set process-wide, until the server starts.
+    assert not (tmp_path / "users.db").exists()
+    assert MultiPartParser.spool_max_size == 1024 * 1024
+
+    with TestClient(app) as client:
+        resources = app.state.resources
+        assert isinstance(resources, Resources)
+        assert resources.config is app.state.config
+        # The tile threads are split between the CPU workers.
+        assert resources.tiling.workers == 1
+        assert (tmp_path / "users.db").exists()
+        assert MultiPartParser.spool_max_size == 64 * 1024
+        assert client.get("/health").json() == {"ok": True}
+
+    with pytest.raises(RuntimeError):
+        resources.cpu_executor._pool.submit(print)
+
+
+def test_module_app_is_built_on_first_access(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("MLPS_AUTH_SESSION_SECRET", "secret")
+    monkeypatch.setenv("MLPS_DB_PATH", str(tmp_path / "users.db"))
+    monkeypatch.chdir(tmp_path)
+    import backend.app
+
+    monkeypatch.delitem(vars(backend.app), "app", raising=False)
+    app = backend.app.app
+    assert app.state.config.session_secret == "secret"
+    assert backend.app.app is app
+    assert not hasattr(backend.app, "missing")
+
+
+def test_worker_defaults_are_split_between_server_workers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("MLPS_AUTH_SESSION_SECRET", "secret")
+    monkeypatch.setenv("MLPS_DB_PATH", "users.db")
+    monkeypatch.delenv("MLPS_CPU_WORKERS", raising=False)
+    monkeypatch.delenv("MLPS_TILE_WORKERS", raising=False)
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    assert MLServiceConfig().cpu_workers == 8
+    assert MLServiceConfig().tile_workers == 8
+    assert MLServiceConfig(server_workers=3).cpu_workers == 2
+    assert MLServiceConfig(server_workers=3).tile_workers == 2
+    assert MLServiceConfig(server_workers=16).cpu_workers == 1
+    monkeypatch.setenv("MLPS_CPU_WORKERS", "5")
+    assert MLServiceConfig(server_workers=3).cpu_workers == 5
@@ -0,0 +1,140 @@
+import io
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from backend.app import create_app
+from backend.config import MLServiceConfig
+from backend.database import UserDatabase
+from backend.utils.archive_input import (
+    ArchiveError,
+    ArchiveLimitError,
+    ArchiveLimits,
+    FrameArchive,
+)
+
+ENTRIES = [
+    ("shot/f0.png", b"frame 0"),
+    ("shot/notes.txt", b"skipped"),
+    ("__MACOSX/shot/._f0.png", b"skipped"),
+    ("shot/f1.PNG", b"frame 1"),
+]
+
+
+def _zip(
+    entries: list[tuple[str, bytes]], compression: int = zipfile.ZIP_STORED
+) -> io.BytesIO:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression) as z:
+        for name, data in entries:
+            z.writestr(name, data)
+    buf.seek(0)
+    return buf
+
+
+def _tar(entries: list[tuple[str, bytes]], mode: str = "w:gz") -> io.BytesIO:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode=mode) as t:
+        for name, data in entries:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            t.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    return buf
+
+
+def _frames(
+    buf: io.BytesIO, limits: ArchiveLimits | None = None
+) -> list[tuple[str, bytes]]:
+    if limits is None:
+        limits = ArchiveLimits()
+    archive = FrameArchive(buf, len(buf.getvalue()), limits)
+    try:
+        return list(archive)
+    finally:
+        archive.close()
+
+
+@pytest.mark.parametrize(
+    "make", [_zip, _tar, lambda e: _tar(e, "w"), lambda e: _tar(e, "w:xz")]
+)
+def test_yields_frames_in_archive_order(make) -> None:
+    assert _frames(make(ENTRIES)) == [
+        ("shot/f0.png", b"frame 0"),
+        ("shot/f1.PNG", b"frame 1"),
+    ]
+
+
+def test_rejects_non_archives() -> None:
+    with pytest.raises(ArchiveError, match="not a ZIP or tar"):
+        _frames(io.BytesIO(b"\x89PNG not an archive"))
+
+
+@pytest.mark.parametrize("make", [_zip, _tar])
+def test_rejects_unsafe_names(make) -> None:
+    with pytest.raises(ArchiveError, match="Unsafe"):
+        _frames(make([("../etc/f.png", b"x")]))
+
+
+def test_zip_bomb_is_refused_from_the_directory() -> None:
+    buf = _zip([("bomb.png", bytes(8 << 20))], zipfile.ZIP_DEFLATED)
+    with pytest.raises(ArchiveLimitError, match="ratio"):
+        FrameArchive(buf, len(buf.getvalue()), ArchiveLimits(max_ratio=100))
+
+
+def test_tar_bomb_stops_at_the_budget() -> None:
+    buf = _tar([("a.png", b"x"), ("bomb.png", bytes(8 << 20))])
+    archive = FrameArchive(buf, len(buf.getvalue()), ArchiveLimits(max_ratio=100))
+    entries = iter(archive)
+    assert next(entries) == ("a.png", b"x")
+    with pytest.raises(ArchiveLimitError, match="expands"):
+        next(entries)
+
+
+@pytest.mark.parametrize("make", [_zip, _tar])
+def test_entry_and_count_limits(make) -> None:
+    entries = [(f"f{i}.png", b"0123456789") for i in range(3)]
+    with pytest.raises(ArchiveLimitError, match="more than 2 frames"):
+        _frames(make(entries), ArchiveLimits(max_entries=2))
+    with pytest.raises(ArchiveLimitError, match="limit is 5 bytes"):
+        _frames(make(entries), ArchiveLimits(max_entry_bytes=5))
+
+
+@pytest.mark.parametrize("make", [_zip, _tar])
+def test_headers_pass_leaves_the_archive_readable(make) -> None:
+    buf = make(ENTRIES)
+    archive = FrameArchive(buf, len(buf.getvalue()), ArchiveLimits())
+    try:
+        assert list(archive.headers(5)) == [
+            ("shot/f0.png", b"frame"),
+            ("shot/f1.PNG", b"frame"),
+        ]
+        assert [name for name, _ in archive] == ["shot/f0.png", "shot/f1.PNG"]
+    finally:
+        archive.close()
+
+
+def test_pixel_budget_is_checked_before_streaming(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("MLPS_AUTH_SESSION_SECRET", "secret")
+    monkeypatch.setenv("MLPS_DB_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setenv("MLPS_CPU_EXECUTOR", "thread")
+    monkeypatch.setenv("MLPS_MAX_REQUEST_MEGAPIXELS", "1")
+    UserDatabase(str(tmp_path / "users.db")).create_user("user", "pw")
+    png = io.BytesIO()
+    Image.new("RGB", (800, 800)).save(png, "PNG")
+    # The second frame takes the archive over 1 megapixel.
+    buf = _tar([("f0.png", png.getvalue()), ("f1.png", png.getvalue())])
+    with TestClient(create_app(MLServiceConfig())) as client:
+        client.post("/login", data={"username": "user", "password": "pw"})
+        r = client.post(
+            "/denoise/archive.zip",
+            files={"file": ("frames.tar.gz", buf.getvalue(), "application/gzip")},
+        )
+        assert r.status_code == 413
+        assert "pixels" in r.json()["detail"]
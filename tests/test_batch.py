@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.services.denoise import denoise_image
+from backend.services.denoise.batch import BATCH_TOLERANCE, denoise_batch
+
+
+def _frames() -> list[Image.Image]:
+    rng = np.random.default_rng(7)
+    noise = rng.integers(0, 256, (37, 53, 3), dtype=np.uint8)
+    palm = Image.open("examples/palm_pixel_art.png").convert("RGB").resize((53, 37))
+    return [Image.fromarray(noise), palm]
+
+
+@pytest.mark.parametrize("strength", [0.0, 0.4, 1.0, 1.7, 3.0, 5.0])
+def test_batch_matches_single_frame(strength: float) -> None:
+    frames = _frames()
+    stack = np.stack([np.asarray(f) for f in frames])
+    denoise_batch(stack, strength)
+    for out, frame in zip(stack, frames):
+        ref = np.asarray(denoise_image(frame, strength)).astype(int)
+        assert np.abs(out.astype(int) - ref).max() <= BATCH_TOLERANCE
+
+
+def test_batch_float_output_and_temporal() -> None:
+    frame = np.asarray(_frames()[0])
+    stack = np.stack([frame, frame, frame])
+    out = np.empty(stack.shape, dtype=np.float32)
+    denoise_batch(stack, 1.0, temporal_radius=1, out=out)
+    # Identical neighbours leave the temporal average unchanged.
+    assert (out == denoise_batch(stack[:1].copy(), 1.0)[0]).all()
+
+    flicker = np.stack([frame, 255 - frame, frame])
+    denoise_batch(flicker, 0.0, temporal_radius=1)
+    expected = (255 + frame.astype(int)) / 3  # mean of f, 255 - f, f
+    assert np.abs(flicker[1] - expected).max() <= 1
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from backend.services.cache import ResultCache
+
+
+def test_key_normalizes_strength() -> None:
+    assert ResultCache.key(b"x", 1) == ResultCache.key(b"x", 1.0)
+    assert ResultCache.key(b"x", 9.0) == ResultCache.key(b"x", 5.0)
+    assert ResultCache.key(b"x", 1.0) != ResultCache.key(b"x", 1.5)
+    assert ResultCache.key(b"x", 1.0) != ResultCache.key(b"y", 1.0)
+
+
+def test_memory_lru_and_disk_tier(tmp_path: Path) -> None:
+    cache = ResultCache(memory_bytes=20, disk_dir=str(tmp_path), disk_bytes=25)
+    cache.put("a", b"a" * 10)
+    cache.put("b", b"b" * 10)
+    assert cache.get("a") == b"a" * 10
+    cache.put("c", b"c" * 10)  # evicts "b" from memory, "a" from disk
+
+    stats = cache.stats()
+    assert stats["evictions_memory"] == 1
+    assert stats["evictions_disk"] == 1
+    assert stats["disk_bytes"] <= 25
+
+    assert cache.get("b") == b"b" * 10  # promoted back from disk
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert stats["hits_memory"] == 1
+    assert stats["hits_disk"] == 1
+    assert stats["misses"] == 1
+
+    # A fresh instance picks up what is already on disk.
+    reloaded = ResultCache(memory_bytes=20, disk_dir=str(tmp_path), disk_bytes=25)
+    assert reloaded.get("c") == b"c" * 10
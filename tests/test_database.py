@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from pathlib import Path
+
+from backend.auth.password import make_password_hasher
+from backend.database import AsyncUserDatabase, UserDatabase
+
+
+def test_connections_are_reused_per_thread(tmp_path: Path) -> None:
+    database = UserDatabase(str(tmp_path / "users.db"))
+    try:
+        connect = database._sql_connect()
+        assert database._sql_connect() is connect
+        assert connect.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(database._sql_connect()))
+        thread.start()
+        thread.join()
+        assert other[0] is not connect
+    finally:
+        database.close()
+
+
+def test_async_facade(tmp_path: Path) -> None:
+    database = AsyncUserDatabase(UserDatabase(str(tmp_path / "users.db")))
+
+    async def run() -> None:
+        await database.create_user("alice", "secret", role="admin")
+        user = await database.verify_user("alice", "secret")
+        assert user is not None and user[1:] == ("alice", "admin")
+        assert await database.verify_user("alice", "wrong") is None
+        assert [u[1] for u in await database.list_users()] == ["alice"]
+
+    try:
+        asyncio.run(run())
+    finally:
+        database.shutdown()
+        database.database.close()
+
+
+def test_login_rehashes_outdated_hash(tmp_path: Path) -> None:
+    path = str(tmp_path / "users.db")
+    old = UserDatabase(path, make_password_hasher(1, 8, 1))
+    old.create_user("bob", "secret")
+    old_hash = old._sql_connect().execute("SELECT password_hash FROM users").fetchone()
+    old.close()
+
+    database = UserDatabase(path, make_password_hasher(2, 16, 1))
+    try:
+        assert database.verify_user("bob", "secret") is not None
+        (new_hash,) = (
+            database._sql_connect()
+            .execute("SELECT password_hash FROM users")
+            .fetchone()
+        )
+        assert (new_hash,) != old_hash
+        assert "m=16,t=2,p=1" in new_hash
+        assert database.verify_user("bob", "secret") is not None
+    finally:
+        database.close()
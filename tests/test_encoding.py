@@ -0,0 +1,33 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.services.encoding import PROFILES, encode_image, get_profile
+from backend.services.executor import denoise_encoded, denoise_encoded_batch
+
+
+def _png_bytes() -> bytes:
+    with open("examples/palm_pixel_art.png", "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name", sorted(PROFILES))
+def test_profiles_are_lossless(name: str) -> None:
+    img = Image.open("examples/palm_pixel_art.png").convert("RGB")
+    out = Image.open(io.BytesIO(encode_image(img, name)))
+    assert out.format == get_profile(name).format
+    assert np.array_equal(np.asarray(out.convert("RGB")), np.asarray(img))
+
+
+def test_unknown_profile() -> None:
+    with pytest.raises(ValueError, match="png-fast"):
+        get_profile("jpeg")
+
+
+def test_batch_matches_single_frame_bytes() -> None:
+    data = _png_bytes()
+    for name in ("png", "webp-lossless"):
+        single = denoise_encoded(data, 1.5, encoding=name)
+        assert denoise_encoded_batch([data, data], 1.5, encoding=name) == [single] * 2
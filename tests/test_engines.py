@@ -0,0 +1,134 @@
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.services.denoise.engines import (
+    ENGINES,
+    DenoiseEngine,
+    MedianEngine,
+    get_engine,
+)
+from backend.services.denoise.tiled import denoise_tiled
+from backend.services.executor import denoise_encoded, denoise_encoded_batch
+
+
+def _frames(n: int = 3, size: tuple[int, int] = (40, 32)) -> np.ndarray:
+    rng = np.random.default_rng(7)
+    return rng.integers(0, 256, (n, size[1], size[0], 3), dtype=np.uint8)
+
+
+def _png(frame: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(frame).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_unknown_engine() -> None:
+    with pytest.raises(ValueError, match="gaussian"):
+        get_engine("bilateral")
+
+
+def test_incomplete_engine_cannot_be_created() -> None:
+    class NoCacheTag(DenoiseEngine):
+        name = "no-cache-tag"
+
+        def denoise(self, img: Image.Image, strength: float) -> Image.Image:
+            return img
+
+    with pytest.raises(TypeError, match="cache_tag"):
+        NoCacheTag()
+
+
+@pytest.mark.parametrize("name", sorted(ENGINES))
+def test_batch_matches_single_frame(name: str) -> None:
+    frames = [_png(frame) for frame in _frames()]
+    engine = get_engine(name)
+    single = [denoise_encoded(f, 1.0, engine=engine) for f in frames]
+    assert denoise_encoded_batch(frames, 1.0, engine=engine) == single
+
+
+def test_median_tiles_are_exact() -> None:
+    img = Image.fromarray(_frames(1, (53, 47))[0])
+    engine = MedianEngine()
+    whole = engine.denoise(img, 2.0)
+    tiled = denoise_tiled(img, 2.0, tile_size=16, workers=2, engine=engine)
+    assert np.array_equal(np.asarray(tiled), np.asarray(whole))
+
+
+def _mean_model(path: Path, strength_input: bool = False) -> None:
+    """Depthwise 3x3 box filter with a dynamic batch dimension."""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper
+
+    weight = np.full((3, 1, 3, 3), 1 / 9, dtype=np.float32)
+    nodes = [
+        helper.make_node(
+            "Conv", ["x", "w"], ["y"], group=3, pads=[1, 1, 1, 1], kernel_shape=[3, 3]
+        )
+    ]
+    inputs = [helper.make_tensor_value_info("x", TensorProto.FLOAT, ["n", 3, "h", "w"])]
+    if strength_input:
+        # Ignores the strength it is fed; only checks that it is accepted.
+        nodes.append(helper.make_node("Identity", ["strength"], ["s"]))
+        inputs.append(
+            helper.make_tensor_value_info("strength", TensorProto.FLOAT, ["n"])
+        )
+    graph = helper.make_graph(
+        nodes,
+        "mean",
+        inputs,
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, ["n", 3, "h", "w"])],
+        initializer=[onnx.numpy_helper.from_array(weight, "w")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+
+
+@pytest.fixture
+def onnx_engine(tmp_path: Path):
+    pytest.importorskip("onnxruntime")
+    from backend.services.denoise.engines import OnnxEngine
+
+    path = tmp_path / "mean.onnx"
+    _mean_model(path)
+    engine = OnnxEngine(str(path))
+    engine.warm_up()
+    return engine
+
+
+def test_onnx_batches_in_one_call(onnx_engine) -> None:
+    frames = _frames()
+    single = [onnx_engine.denoise_batch(frame[None].copy(), 1.0)[0] for frame in frames]
+    batch = onnx_engine.denoise_batch(frames.copy(), 1.0)
+    assert np.array_equal(batch, np.stack(single))
+
+    # Interior pixels are the 3x3 mean.
+    x = frames[0].astype(np.float64)
+    expected = sum(x[i : i + 30, j : j + 38] for i in range(3) for j in range(3)) / 9
+    assert np.abs(batch[0, 1:31, 1:39] - expected).max() <= 0.5 + 1e-6
+
+
+def test_onnx_strength_blends_with_input(onnx_engine) -> None:
+    frames = _frames(1)
+    assert np.array_equal(onnx_engine.denoise_batch(frames.copy(), 0.0), frames)
+    full = onnx_engine.denoise_batch(frames.copy(), 1.0).astype(np.int16)
+    half = onnx_engine.denoise_batch(frames.copy(), 0.5).astype(np.int16)
+    assert np.abs(half - (frames.astype(np.int16) + full) / 2).max() <= 1
+
+
+def test_onnx_strength_input(tmp_path: Path) -> None:
+    pytest.importorskip("onnxruntime")
+    from backend.services.denoise.engines import OnnxEngine
+
+    path = tmp_path / "mean_strength.onnx"
+    _mean_model(path, strength_input=True)
+    engine = OnnxEngine(str(path))
+    frames = _frames(2)
+    # The model applies its filter in full whatever strength it is given.
+    half = engine.denoise_batch(frames.copy(), 0.5)
+    assert np.array_equal(half, engine.denoise_batch(frames.copy(), 1.0))
+    assert engine.cache_tag.startswith("onnx-")
@@ -0,0 +1,46 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from backend.services.executor import CPUExecutor, denoise_encoded
+
+
+def _png_bytes() -> bytes:
+    with open("examples/palm_pixel_art.png", "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("mode", ["process", "thread"])
+def test_executor_matches_inline(mode: str) -> None:
+    data = _png_bytes()
+    executor = CPUExecutor(mode, workers=2)
+    try:
+        out = asyncio.run(executor.denoise(data, 2.0))
+    finally:
+        executor.shutdown()
+    assert out == denoise_encoded(data, 2.0)
+    assert Image.open(io.BytesIO(out)).format == "PNG"
+
+
+def test_executor_rejects_garbage() -> None:
+    executor = CPUExecutor("process", workers=1)
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(executor.denoise(b"not an image", 1.0))
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.parametrize("mode", ["process", "thread"])
+def test_executor_reports_stage_timings(mode: str) -> None:
+    data = _png_bytes()
+    executor = CPUExecutor(mode, workers=1)
+    timings: dict[str, list[float]] = {}
+    try:
+        asyncio.run(executor.denoise_batch([data, data], 1.0, timings=timings))
+    finally:
+        executor.shutdown()
+    assert sorted(timings) == ["decode", "denoise", "encode"]
+    assert all(len(v) == 2 and min(v) >= 0.0 for v in timings.values())
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from backend.routers.common import denoise_engine
+from backend.services.denoise import denoise_image, denoise_image_fast
+from backend.services.denoise.denoise import (
+    FAST_MAX_ERROR,
+    FAST_MEAN_ERROR,
+    fast_factor,
+)
+
+
+def _images(size: tuple[int, int] = (241, 163)) -> dict[str, Image.Image]:
+    """Uniform noise (the worst case), a noisy gradient and pixel art."""
+    rng = np.random.default_rng(11)
+    w, h = size
+    x = np.linspace(0, 255, w)[None, :, None]
+    y = np.linspace(0, 255, h)[:, None, None]
+    gradient = (x + y) / 2 + rng.normal(0, 20, (h, w, 3))
+    palm = Image.open("examples/palm_pixel_art.png").convert("RGB")
+    return {
+        "noise": Image.fromarray(rng.integers(0, 256, (h, w, 3), dtype=np.uint8)),
+        "gradient": Image.fromarray(np.clip(gradient, 0, 255).astype(np.uint8)),
+        "palm": palm.resize(size, Image.Resampling.NEAREST),
+    }
+
+
+@pytest.mark.parametrize("strength", [2.25, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0])
+def test_fast_stays_within_documented_error(strength: float) -> None:
+    assert fast_factor(strength) > 1
+    for name, img in _images().items():
+        exact = np.asarray(denoise_image(img, strength), dtype=np.int16)
+        fast = denoise_image_fast(img, strength)
+        assert fast.size == img.size
+        error = np.abs(np.asarray(fast, dtype=np.int16) - exact)
+        assert error.mean() <= FAST_MEAN_ERROR, name
+        assert error.max() <= FAST_MAX_ERROR, name
+        if name != "noise":
+            assert error.mean() < 1.0, name
+
+
+@pytest.mark.parametrize("strength", [0.0, 0.5, 1.0, 2.0])
+def test_fast_is_exact_for_small_strengths(strength: float) -> None:
+    img = _images()["noise"]
+    assert fast_factor(strength) == 1
+    assert np.array_equal(
+        np.asarray(denoise_image_fast(img, strength)),
+        np.asarray(denoise_image(img, strength)),
+    )
+
+
+def test_quality_picks_the_fast_engine() -> None:
+    assert denoise_engine("gaussian", "fast").name == "gaussian-fast"
+    assert denoise_engine("gaussian").name == "gaussian"
+    for engine, quality in (("median", "fast"), ("gaussian", "draft")):
+        with pytest.raises(HTTPException) as e:
+            denoise_engine(engine, quality)
+        assert e.value.status_code == 400
@@ -0,0 +1,71 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.services.denoise.engines import get_engine
+from backend.services.denoise.incremental import changed_boxes
+from backend.services.denoise.tiled import Tiling
+from backend.services.executor import (
+    denoise_encoded_batch,
+    denoise_encoded_incremental,
+)
+
+
+def _png(frame: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(frame).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _sequence() -> list[bytes]:
+    """Held frames, a moving sprite, edge changes and a cut."""
+    rng = np.random.default_rng(5)
+    base = rng.integers(0, 256, (90, 150, 3), dtype=np.uint8)
+    frames = []
+    for i in range(10):
+        frame = base.copy()
+        if i in (2, 3, 4):
+            frame[20 + 4 * i : 30 + 4 * i, 10 * i : 10 * i + 12] = 255
+        if i == 5:
+            frame[:3, -4:] = 0
+            frame[-2:, :5] = 7
+        if i == 7:
+            frame = rng.integers(0, 256, base.shape, dtype=np.uint8)
+        frames.append(_png(frame))
+    return frames
+
+
+def test_changed_boxes() -> None:
+    prev = np.zeros((100, 70, 3), dtype=np.uint8)
+    cur = prev.copy()
+    assert changed_boxes(prev, cur) == []
+    cur[5, 5] = 1
+    cur[40:70, 40:45] = 1
+    assert changed_boxes(prev, cur, cell=32) == [(0, 0, 32, 32), (32, 32, 64, 96)]
+
+
+@pytest.mark.parametrize("engine", ["gaussian", "median"])
+@pytest.mark.parametrize("strength", [0.0, 0.8, 3.0])
+def test_incremental_is_bit_identical(engine: str, strength: float) -> None:
+    frames = _sequence()
+    denoiser = get_engine(engine)
+    full = denoise_encoded_batch(frames, strength, engine=denoiser)
+    assert denoise_encoded_incremental(frames, strength, engine=denoiser) == full
+    tiling = Tiling(tile_size=32, threshold_pixels=1000, workers=2)
+    assert (
+        denoise_encoded_incremental(frames, strength, tiling, engine=denoiser) == full
+    )
+
+
+def test_held_frames_reuse_the_encoded_output() -> None:
+    frames = _sequence()
+    # Same pixels, different bytes.
+    buf = io.BytesIO()
+    Image.open(io.BytesIO(frames[1])).save(buf, "PNG", compress_level=1)
+    assert buf.getvalue() != frames[1]
+    frames[1] = buf.getvalue()
+    outputs = denoise_encoded_incremental(frames, 1.0)
+    assert outputs[1] is outputs[0]
+    assert outputs[2] is not outputs[1]
@@ -0,0 +1,93 @@
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+from taskmanager import JOB_DONE, JOB_RUNNING, Job, JobQueue
+from taskmanager.worker import Worker
+
+
+def _enqueue(queue: JobQueue, frames: int) -> str:
+    data = Path("examples/palm_pixel_art.png").read_bytes()
+    job_id = queue.new_job_id()
+    for index in range(frames):
+        path = queue.input_path(job_id, index)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    queue.enqueue(job_id, 1, 1.0, [f"shot/f{i}.png" for i in range(frames)])
+    return job_id
+
+
+def test_claim_and_lease_expiry(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "jobs"))
+    job_id = _enqueue(queue, 1)
+
+    job = queue.claim("a", lease_seconds=60)
+    assert job is not None and job.id == job_id
+    assert queue.claim("b", lease_seconds=60) is None
+
+    # An expired lease is handed to the next worker; the old one loses it.
+    queue.record_progress(job_id, "a", 0, lease_seconds=-1)
+    job = queue.claim("b", lease_seconds=60)
+    assert job is not None and job.attempts == 2
+    assert not queue.record_progress(job_id, "a", 1, lease_seconds=60)
+
+
+def test_worker_resumes_from_progress(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "jobs"))
+    job_id = _enqueue(queue, 3)
+
+    # First worker finishes one chunk and then "crashes".
+    crashed = Worker(queue, lease_seconds=-1, chunk_frames=2)
+    job = queue.claim(crashed.worker_id, crashed.lease_seconds)
+    assert job is not None
+    crashed._process_frame(job, 0)
+    crashed._process_frame(job, 1)
+    queue.record_progress(job_id, crashed.worker_id, 2, crashed.lease_seconds)
+    assert queue.get(job_id).status == JOB_RUNNING
+
+    worker = Worker(queue, chunk_frames=2)
+    assert worker.run_once()
+    job = queue.get(job_id)
+    assert job.status == JOB_DONE and job.frames_done == 3
+
+    with zipfile.ZipFile(queue.result_path(job_id)) as zf:
+        assert zf.namelist() == [f"denoised/shot/f{i}.png" for i in range(3)]
+
+
+class _SlowWorker(Worker):
+    def _process_frame(self, job: Job, index: int) -> None:
+        time.sleep(0.2)
+        super()._process_frame(job, index)
+
+
+def test_lease_outlives_a_slow_chunk(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "jobs"))
+    job_id = _enqueue(queue, 4)
+
+    # One chunk of four frames takes about 0.8s against a 0.3s lease.
+    worker = _SlowWorker(queue, lease_seconds=0.3, chunk_frames=4)
+    job = queue.claim(worker.worker_id, worker.lease_seconds)
+    thread = threading.Thread(target=worker.process, args=(job,))
+    thread.start()
+    while thread.is_alive():
+        assert queue.claim("other", lease_seconds=60) is None
+        time.sleep(0.05)
+    thread.join()
+
+    job = queue.get(job_id)
+    assert job.status == JOB_DONE and job.attempts == 1
+    assert queue.result_path(job_id).exists()
+    assert not queue.input_path(job_id, 0).parent.exists()
+
+
+def test_finished_jobs_expire(tmp_path: Path) -> None:
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "jobs"), ttl_seconds=0)
+    old = _enqueue(queue, 1)
+    assert Worker(queue).run_once()
+    pending = _enqueue(queue, 1)
+
+    assert queue.get(old) is None
+    assert not queue.job_dir(old).exists()
+    assert queue.get(pending) is not None
+    assert queue.input_path(pending, 0).exists()
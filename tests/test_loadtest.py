@@ -0,0 +1,37 @@
+import argparse
+
+import pytest
+
+from backend.cli.loadtest import Report, Sample, _parse_mix, summarize
+
+
+def test_parse_mix() -> None:
+    assert _parse_mix("image=3, login") == {"image": 3.0, "login": 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        _parse_mix("upload=1")
+    with pytest.raises(argparse.ArgumentTypeError):
+        _parse_mix("image=0")
+
+
+def test_summarize() -> None:
+    samples = [Sample("image", 0.0, (i + 1) / 100, 200) for i in range(100)]
+    samples += [
+        Sample("sequence", 0.0, 5.0, 429),
+        Sample("sequence", 0.0, 1.0, "ReadTimeout"),
+        Sample("sequence", 0.0, 2.0, 200),
+    ]
+    report = Report(wall=10.0, samples=samples, memory=[(0.0, 10.0, 20.0, 2)])
+    summary = summarize(report)
+
+    image = summary["kinds"]["image"]
+    assert image["requests"] == 100
+    assert image["per_second"] == 10.0
+    assert image["p50_ms"] == pytest.approx(505.0)
+    assert image["p99_ms"] == pytest.approx(990.1)
+    sequence = summary["kinds"]["sequence"]
+    assert sequence["errors"] == {"429": 1, "ReadTimeout": 1}
+    assert sequence["error_rate"] == pytest.approx(0.6667)
+    assert sequence["p99_ms"] == 2000.0
+    assert "login" not in summary["kinds"]
+    assert summary["kinds"]["all"]["requests"] == 103
+    assert summary["server_rss_mb_peak"] == 20.0
@@ -0,0 +1,93 @@
+import asyncio
+import random
+
+import pytest
+
+from backend.services.pipeline import Pipeline, Stage
+
+
+def _collect(pipeline: Pipeline, items: list[int]) -> list[int]:
+    async def run() -> list[int]:
+        return [result async for result in pipeline.run(items)]
+
+    return asyncio.run(run())
+
+
+def test_results_keep_source_order() -> None:
+    rng = random.Random(0)
+    archived: list[int] = []
+    in_flight = 0
+    most_in_flight = 0
+
+    async def slow(x: int) -> int:
+        nonlocal in_flight, most_in_flight
+        in_flight += 1
+        most_in_flight = max(most_in_flight, in_flight)
+        await asyncio.sleep(rng.random() / 1000)
+        in_flight -= 1
+        return x * 10
+
+    async def archive(x: int) -> int:
+        archived.append(x)
+        return x + 1
+
+    pipeline = Pipeline(
+        [
+            Stage("slow", slow, workers=4),
+            Stage("archive", archive, ordered=True),
+        ],
+        queue_size=1,
+    )
+    assert _collect(pipeline, list(range(50))) == [x * 10 + 1 for x in range(50)]
+    assert archived == [x * 10 for x in range(50)]
+    assert most_in_flight == 4
+    assert pipeline.stats["slow"].items == 50
+    assert pipeline.stats["slow"].busy > 0
+    assert 0 < pipeline.stats["slow"].utilization(pipeline.wall) <= 1
+
+
+def test_window_bounds_items_in_flight() -> None:
+    started: list[int] = []
+
+    async def record(x: int) -> int:
+        started.append(x)
+        return x
+
+    async def run() -> None:
+        pipeline = Pipeline([Stage("record", record, workers=4)], window=3)
+        results = pipeline.run(range(100))
+        assert await results.__anext__() == 0
+        await asyncio.sleep(0.01)
+        # Item 0 counts until the consumer asks for the next one.
+        assert started == [0, 1, 2]
+        assert await results.__anext__() == 1
+        await asyncio.sleep(0.01)
+        assert started == [0, 1, 2, 3]
+        await results.aclose()
+
+    asyncio.run(run())
+
+
+def test_failure_surfaces_in_order() -> None:
+    async def check(x: int) -> int:
+        if x == 3:
+            raise ValueError("bad frame")
+        return x
+
+    async def run() -> list[int]:
+        seen = []
+        pipeline = Pipeline([Stage("check", check, workers=3)])
+        with pytest.raises(ValueError, match="bad frame"):
+            async for x in pipeline.run(range(10)):
+                seen.append(x)
+        return seen
+
+    assert asyncio.run(run()) == [0, 1, 2]
+
+
+def test_ordered_stage_needs_one_worker() -> None:
+    async def noop(x: int) -> int:
+        return x
+
+    with pytest.raises(ValueError):
+        Pipeline([Stage("archive", noop, workers=2, ordered=True)])
@@ -0,0 +1,82 @@
+import asyncio
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from backend.app import create_app
+from backend.config import MLServiceConfig
+from backend.database import UserDatabase
+from backend.services.executor import (
+    CPUExecutor,
+    denoise_encoded,
+    denoise_encoded_preview,
+)
+
+
+def _encoded(size: tuple[int, int], fmt: str = "PNG") -> bytes:
+    """Smooth gradient with noise on top."""
+    rng = np.random.default_rng(3)
+    x = np.linspace(0, 255, size[0])[None, :, None]
+    y = np.linspace(0, 255, size[1])[:, None, None]
+    base = (x + y) / 2 + np.array([0, 40, -40])
+    noisy = base + rng.normal(0, 20, (size[1], size[0], 3))
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8)).save(buf, fmt)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "JPEG"])
+def test_preview_looks_like_a_downscaled_result(fmt: str) -> None:
+    data = _encoded((1200, 800), fmt)
+    preview = Image.open(io.BytesIO(denoise_encoded_preview(data, 3.0, 300)))
+    assert max(preview.size) <= 300
+
+    full = Image.open(io.BytesIO(denoise_encoded(data, 3.0)))
+    expected = np.asarray(full.resize(preview.size, Image.BOX), dtype=float)
+    error = np.abs(np.asarray(preview, dtype=float) - expected).mean()
+    # Without scaling the strength the preview stays visibly noisy.
+    assert error < 3.0
+
+
+def test_preview_grid_has_a_cell_per_frame_and_strength() -> None:
+    frames = [_encoded((400, 200)), _encoded((200, 400)), _encoded((100, 50))]
+    executor = CPUExecutor("process", workers=1)
+    try:
+        out = asyncio.run(executor.preview_grid(frames, [0.5, 1.0, 2.0, 4.0], 100))
+    finally:
+        executor.shutdown()
+    assert Image.open(io.BytesIO(out)).size == (4 * 100, 3 * 100)
+
+
+def test_preview_routes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("MLPS_AUTH_SESSION_SECRET", "secret")
+    monkeypatch.setenv("MLPS_DB_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setenv("MLPS_CPU_EXECUTOR", "thread")
+    monkeypatch.setenv("MLPS_PREVIEW_MAX_SIDE", "256")
+    UserDatabase(str(tmp_path / "users.db")).create_user("user", "pw")
+    frames = [_encoded((640, 480)) for _ in range(5)]
+    with TestClient(create_app(MLServiceConfig())) as client:
+        client.post("/login", data={"username": "user", "password": "pw"})
+        r = client.post(
+            "/denoise/image?preview=true&strength=2",
+            files={"file": ("a.png", frames[0], "image/png")},
+        )
+        assert r.status_code == 200
+        # Reduced by a whole factor, 3 here.
+        assert Image.open(io.BytesIO(r.content)).size == (214, 160)
+
+        files = [("files", (f"{i}.png", f, "image/png")) for i, f in enumerate(frames)]
+        r = client.post(
+            "/denoise/preview-grid?samples=3&cell=128&strengths=1&strengths=2",
+            files=files,
+        )
+        assert r.status_code == 200
+        assert r.headers["x-preview-frames"] == "0,2,4"
+        assert Image.open(io.BytesIO(r.content)).size == (2 * 128, 3 * 96)
+
+        r = client.post("/denoise/preview-grid?strengths=9", files=files)
+        assert r.status_code == 400
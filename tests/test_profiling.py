@@ -0,0 +1,52 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import create_app
+from backend.config import MLServiceConfig
+from backend.database import UserDatabase
+from backend.profiling import ProfileStore
+
+
+def test_store_keeps_the_newest(tmp_path: Path) -> None:
+    store = ProfileStore(str(tmp_path), keep=2, max_bytes=1000)
+    names = []
+    for i in range(3):
+        name = store.new_name("/denoise/image", "sample")
+        store.save(name, b"x" * 100)
+        past = time.time() - 10 + i
+        os.utime(tmp_path / name, (past, past))
+        names.append(name)
+    store.prune()
+    assert [p["name"] for p in store.list()] == names[:0:-1]
+
+    big = store.new_name("/denoise/image", "cprofile")
+    store.save(big, b"x" * 950)
+    assert [p["name"] for p in store.list()] == [big]
+    assert store.path("../users.db") is None
+
+
+def test_only_admins_get_profiled(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("MLPS_AUTH_SESSION_SECRET", "secret")
+    monkeypatch.setenv("MLPS_DB_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setenv("MLPS_CPU_EXECUTOR", "thread")
+    database = UserDatabase(str(tmp_path / "users.db"))
+    database.create_user("admin", "pw", role="admin")
+    database.create_user("user", "pw")
+    with TestClient(create_app(MLServiceConfig())) as client:
+        client.post("/login", data={"username": "user", "password": "pw"})
+        r = client.get("/health", headers={"X-Profile": "sample"})
+        assert "x-profile" not in r.headers
+        assert client.get("/admin/profiles").status_code == 403
+
+        client.post("/login", data={"username": "admin", "password": "pw"})
+        for mode in ("sample", "cprofile"):
+            r = client.get(f"/health?profile={mode}")
+            assert r.json() == {"ok": True}
+            assert client.get(r.headers["x-profile"]).status_code == 200
+        assert len(client.get("/admin/profiles").json()) == 2
@@ -0,0 +1,104 @@
+import io
+import os
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import create_app
+from backend.config import MLServiceConfig
+from backend.database import UserDatabase
+from backend.services.results import ResultStore
+
+
+def _png_bytes() -> bytes:
+    with open("examples/palm_pixel_art.png", "rb") as f:
+        return f.read()
+
+
+def _add(store: ResultStore, data: bytes, age: float = 0.0) -> str:
+    result, f = store.create(1, "out.bin", "application/octet-stream")
+    f.write(data)
+    result.created_at -= age
+    store.finish(result, f)
+    return result.id
+
+
+def test_store_expires_and_evicts(tmp_path: Path) -> None:
+    store = ResultStore(str(tmp_path), ttl_seconds=3600, max_bytes=250)
+    # The age comes from created_at, not from the directory's mtime.
+    old = _add(store, b"x" * 10, age=3000)
+    abandoned, f = store.create(1, "out.bin", "application/octet-stream")
+    f.close()
+    past = time.time() - 7200
+    os.utime(tmp_path / abandoned.id, (past, past))
+    assert store.get(old) is not None
+    store.ttl_seconds = 2000
+    assert store.get(old) is None
+    assert (tmp_path / old).exists()
+
+    first = _add(store, b"x" * 100, age=2)
+    second = _add(store, b"x" * 100, age=1)
+    assert not (tmp_path / old).exists()
+    assert not (tmp_path / abandoned.id).exists()
+    assert store.get(first) is not None
+
+    third = _add(store, b"x" * 100)
+    assert store.get(first) is None
+    assert [r.id for r in store.list(1)] == [third, second]
+    assert store.list(2) == []
+
+    # The newest result stays even when it alone is over the limit.
+    big = _add(store, b"x" * 1000)
+    assert [r.id for r in store.list(1)] == [big]
+
+    result, f = store.create(1, "out.bin", "application/octet-stream")
+    store.discard(result, f)
+    assert not (tmp_path / result.id).exists()
+
+
+def test_stored_results_resume(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("MLPS_AUTH_SESSION_SECRET", "secret")
+    monkeypatch.setenv("MLPS_DB_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setenv("MLPS_CPU_EXECUTOR", "thread")
+    database = UserDatabase(str(tmp_path / "users.db"))
+    database.create_user("user", "pw")
+    database.create_user("other", "pw")
+    data = _png_bytes()
+    with TestClient(create_app(MLServiceConfig())) as client:
+        client.post("/login", data={"username": "user", "password": "pw"})
+        r = client.post(
+            "/denoise/sequence.zip?store=true",
+            files=[("files", (name, data, "image/png")) for name in ("a.png", "b.png")],
+        )
+        assert r.status_code == 200
+        url = r.headers["content-location"]
+        archive = r.content
+        assert len(zipfile.ZipFile(io.BytesIO(archive)).namelist()) == 2
+        assert client.get("/results").json()[0]["url"] == url
+
+        r = client.get(url, headers={"Range": "bytes=100-"})
+        assert r.status_code == 206
+        assert r.content == archive[100:]
+        etag = r.headers["etag"]
+        r = client.get(url, headers={"Range": "bytes=100-", "If-Range": '"stale"'})
+        assert r.status_code == 200
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+        assert client.head(url).headers["content-length"] == str(len(archive))
+
+        r = client.post(
+            "/denoise/image?store=true",
+            files={"file": ("palm.png", data, "image/png")},
+        )
+        assert r.headers["content-location"] != url
+        assert client.get(r.headers["content-location"]).content == r.content
+
+        client.post("/login", data={"username": "other", "password": "pw"})
+        assert client.get(url).status_code == 404
+        assert client.delete(url).status_code == 404
+
+        client.post("/login", data={"username": "user", "password": "pw"})
+        assert client.delete(url).status_code == 204
+        assert client.get(url).status_code == 404
@@ -0,0 +1,61 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from backend.routers.uploads import StagedUploadRequest
+from backend.services.staging import StagingStore
+
+
+def test_frames_are_received_once_stored(tmp_path: Path) -> None:
+    store = StagingStore(str(tmp_path))
+    upload = store.create(1, ["a.png", "b.png", "c.png"], 1.0, "png", "gaussian")
+    assert store.get(upload.id) == upload
+    assert store.received(upload) == []
+
+    store.put_output(upload.id, 2, b"two")
+    store.put_output(upload.id, 0, b"zero")
+    store.put_output(upload.id, 0, b"zero again")
+    assert store.received(upload) == [0, 2]
+    assert store.read_output(upload.id, 0) == b"zero again"
+
+    store.delete(upload.id)
+    assert store.get(upload.id) is None
+    assert store.received(upload) == []
+
+
+def test_rejects_malformed_ids(tmp_path: Path) -> None:
+    store = StagingStore(str(tmp_path / "staging"))
+    (tmp_path / "upload.json").write_text("{}")
+    assert store.get("..") is None
+    assert store.get("0" * 32) is None
+
+
+def test_idle_sessions_expire(tmp_path: Path) -> None:
+    store = StagingStore(str(tmp_path), ttl_seconds=60)
+    old = store.create(1, ["a.png"], 1.0, "png", "gaussian")
+    past = time.time() - 120
+    os.utime(tmp_path / old.id, (past, past))
+
+    new = store.create(1, ["a.png"], 1.0, "png", "gaussian")
+    assert store.get(old.id) is None
+    assert store.get(new.id) == new
+
+
+def test_frame_names_stay_inside_the_archive() -> None:
+    frames = ["f0.png", "shot/sub/f1.png"]
+    assert StagedUploadRequest(frames=frames).frames == frames
+    for name in (
+        "",
+        "../f.png",
+        "shot/../../f.png",
+        "/etc/f.png",
+        "shot//f.png",
+        "./f.png",
+        "..\\f.png",
+        "f\0.png",
+    ):
+        with pytest.raises(ValidationError, match="Unsafe frame name"):
+            StagedUploadRequest(frames=["ok.png", name])
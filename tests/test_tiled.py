@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.services.denoise import denoise_image
+from backend.services.denoise.tiled import denoise_tiled, tile_halo
+
+
+@pytest.mark.parametrize("strength", [0.0, 0.3, 1.0, 2.2, 5.0])
+@pytest.mark.parametrize("tile_size", [7, 64, 1024])
+def test_tiled_is_bit_identical(strength: float, tile_size: int) -> None:
+    rng = np.random.default_rng(3)
+    img = Image.fromarray(rng.integers(0, 256, (101, 157, 4), dtype=np.uint8))
+    ref = denoise_image(img.convert("RGB"), strength)
+    out = denoise_tiled(img, strength, tile_size=tile_size, workers=3)
+    assert out.mode == "RGB"
+    assert out.tobytes() == ref.tobytes()
+
+
+def test_tile_halo_grows_with_strength() -> None:
+    assert tile_halo(0.0) == 0
+    assert 0 < tile_halo(1.0) < tile_halo(5.0)
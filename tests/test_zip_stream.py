@@ -0,0 +1,37 @@
+import io
+import zipfile
+
+from backend.utils.zip_stream import ZipStream
+
+
+def test_zip_stream_roundtrip() -> None:
+    image_path = "examples/palm_pixel_art.png"
+    with open(image_path, "rb") as f:
+        data = f.read()
+
+    stream = ZipStream()
+    chunks = [stream.add_bytes(f"denoised/frame_{i:04d}.png", data) for i in range(3)]
+    chunks.append(stream.close())
+    assert all(chunks)
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [f"denoised/frame_{i:04d}.png" for i in range(3)]
+        for info in zf.infolist():
+            assert info.flag_bits & 0x08  # data descriptor
+            assert zf.read(info) == data
+
+
+def test_zip_stream_per_entry_compression() -> None:
+    stream = ZipStream()
+    chunks = [
+        stream.add_bytes("a.png", b"png" * 100, zipfile.ZIP_STORED),
+        stream.add_bytes("b.ppm", b"ppm" * 100),
+        stream.close(),
+    ]
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert [i.compress_type for i in zf.infolist()] == [
+            zipfile.ZIP_STORED,
+            zipfile.ZIP_DEFLATED,
+        ]
+        assert zf.read("a.png") == b"png" * 100